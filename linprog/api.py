@@ -1,4 +1,5 @@
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
@@ -11,8 +12,11 @@ import os
 from datetime import datetime
 import requests
 import uuid
-from process_dnf import BoardProcessor, CHANNEL_COUNT_FIELDS, process_dnf_requirements_core
-from optimize import optimize_card_selection_core
+from process_dnf import (BoardProcessor, CHANNEL_COUNT_FIELDS, process_dnf_requirements_core,
+                         iter_dnf_requirements, decode_cursor, requirement_cache, scoring_pool)
+from optimize import (optimize_card_selection_core, optimize_card_selection_two_phase, optimize_cache,
+                      optimize_jobs)
+from board_catalog import bump_catalog_version, get_catalog_snapshot
 import sys
 import mimetypes
 
@@ -44,6 +48,12 @@ app = FastAPI(
     version="1.0.0"
 )
 
+@app.on_event("shutdown")
+def stop_scoring_pool():
+    """关闭 /process-dnf 并行模式的进程池（首次 parallel 请求时才创建）：等待已提交的评分任务完成后回收工作进程"""
+    scoring_pool.shutdown()
+
+
 # 配置 CORS
 app.add_middleware(
     CORSMiddleware,
@@ -78,6 +88,12 @@ class OptimizationRequest(BaseModel):
         ..., description="process_dnf输出的板卡数据（包含id, matrix_channel_count, model, price_cny, original）")
     linprog_requiremnets: List[int] = Field(
         ..., description=f"process_dnf输出的需求数组（{CHANNEL_COUNT}个元素）")
+    time_limit: Optional[float] = Field(
+        None, description="求解时间上限（秒），达到上限时返回当前最优可行解；不传时使用 OPTIMIZE_TIME_LIMIT_SECONDS")
+    mip_rel_gap: Optional[float] = Field(
+        None, description="相对 MIP 间隙，当前解与下界的相对差距不超过该值即停止；不传时使用 OPTIMIZE_MIP_REL_GAP")
+    two_phase: bool = Field(
+        False, description="两阶段模式：立即返回线性松弛取整的可行方案及下界，精确解在后台求解，通过 job_id 查询")
 
 # 响应模型
 
@@ -117,6 +133,21 @@ class OptimizationResponse(BaseModel):
     total_cost: Optional[int] = None
     channel_satisfaction: Optional[List[ChannelSatisfaction]] = None
     unsatisfied_requirements: List[dict] = []
+    presolve: Optional[Dict[str, Any]] = Field(
+        None, description="求解前支配剔除的统计（剔除前后板卡数，aliases 为保留板卡 id -> 由它代替的板卡 id 列表）")
+    from_cache: bool = Field(False, description="是否复用了优化结果缓存中的最优解（未调用求解器）")
+    solver: Optional[Dict[str, Any]] = Field(
+        None, description="求解状态（status 为 optimal / time_limit / relaxation / failed）、时间上限、MIP 间隙及下界")
+    job_id: Optional[str] = Field(
+        None, description="两阶段模式下后台精确求解任务的 id（GET /optimize/jobs/{job_id} 查询），为空表示结果已是精确解")
+
+
+class OptimizationJobResponse(BaseModel):
+    job_id: str
+    status: str = Field(..., description="running（求解中）、done（result 为精确求解结果）或 error")
+    submitted_at: str
+    result: Optional[OptimizationResponse] = None
+    error: Optional[str] = None
 
 
 @app.get("/")
@@ -148,45 +179,19 @@ async def optimize_card_selection(request: OptimizationRequest):
     - **linprog_requiremnets**: process_dnf输出的需求数组（{CHANNEL_COUNT}个元素）
 
     返回最优采购方案，包括总成本和每种板卡的采购数量
+    - **two_phase=true**: 立即返回线性松弛取整的可行方案（solver.status 为 relaxation）及下界，
+      精确解在后台求解，通过 GET /optimize/jobs/{job_id} 查询
     """
     try:
         # 调用核心优化函数
-        result = optimize_card_selection_core(
+        optimize_func = optimize_card_selection_two_phase if request.two_phase else optimize_card_selection_core
+        result = optimize_func(
             linprog_input_data=request.linprog_input_data,
-            linprog_requiremnets=request.linprog_requiremnets
-        )
-
-        # 将字典结果转换为 Pydantic 模型
-        # 转换 feasibility_checks
-        feasibility_checks = [
-            FeasibilityCheck(**fc) for fc in result.get('feasibility_checks', [])
-        ]
-
-        # 转换 optimized_solution
-        optimized_solution = None
-        if result.get('optimized_solution'):
-            optimized_solution = [
-                OptimizedCard(**card) for card in result['optimized_solution']
-            ]
-
-        # 转换 channel_satisfaction
-        channel_satisfaction = None
-        if result.get('channel_satisfaction'):
-            channel_satisfaction = [
-                ChannelSatisfaction(**cs) for cs in result['channel_satisfaction']
-            ]
-
-        return OptimizationResponse(
-            success=result['success'],
-            message=result['message'],
-            total_cards=result['total_cards'],
-            requirements_summary=result['requirements_summary'],
-            feasibility_checks=feasibility_checks,
-            optimized_solution=optimized_solution,
-            total_cost=result.get('total_cost'),
-            channel_satisfaction=channel_satisfaction,
-            unsatisfied_requirements=result.get('unsatisfied_requirements', [])
+            linprog_requiremnets=request.linprog_requiremnets,
+            time_limit=request.time_limit,
+            mip_rel_gap=request.mip_rel_gap
         )
+        return build_optimization_response(result)
 
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -196,6 +201,55 @@ async def optimize_card_selection(request: OptimizationRequest):
         raise HTTPException(status_code=500, detail=f"服务器错误: {str(e)}")
 
 
+@app.get("/optimize/jobs/{job_id}", response_model=OptimizationJobResponse)
+async def get_optimization_job(job_id: str):
+    """查询两阶段模式的后台精确求解任务（任务只保留在当前进程内，最多 OPTIMIZE_JOB_LIMIT 个）"""
+    job = optimize_jobs.status(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"任务不存在: {job_id}")
+    if job['result'] is not None:
+        job['result'] = build_optimization_response(job['result'])
+    return OptimizationJobResponse(**job)
+
+
+def build_optimization_response(result: Dict[str, Any]) -> OptimizationResponse:
+    """将优化结果字典转换为 Pydantic 模型"""
+    # 转换 feasibility_checks
+    feasibility_checks = [
+        FeasibilityCheck(**fc) for fc in result.get('feasibility_checks', [])
+    ]
+
+    # 转换 optimized_solution
+    optimized_solution = None
+    if result.get('optimized_solution'):
+        optimized_solution = [
+            OptimizedCard(**card) for card in result['optimized_solution']
+        ]
+
+    # 转换 channel_satisfaction
+    channel_satisfaction = None
+    if result.get('channel_satisfaction'):
+        channel_satisfaction = [
+            ChannelSatisfaction(**cs) for cs in result['channel_satisfaction']
+        ]
+
+    return OptimizationResponse(
+        success=result['success'],
+        message=result['message'],
+        total_cards=result['total_cards'],
+        requirements_summary=result['requirements_summary'],
+        feasibility_checks=feasibility_checks,
+        optimized_solution=optimized_solution,
+        total_cost=result.get('total_cost'),
+        channel_satisfaction=channel_satisfaction,
+        unsatisfied_requirements=result.get('unsatisfied_requirements', []),
+        presolve=result.get('presolve'),
+        from_cache=result.get('from_cache', False),
+        solver=result.get('solver'),
+        job_id=result.get('job_id')
+    )
+
+
 # ================= process_dnf 接口 =================
 
 class RequirementItem(BaseModel):
@@ -209,6 +263,23 @@ class ProcessDNFRequest(BaseModel):
     """process_dnf 请求模型"""
     require: List[RequirementItem] = Field(...,
                                            description="需求列表，每个需求包含 original 和 DNF 字段")
+    pushdown: bool = Field(
+        False, description="是否将过滤下推到数据库（只查询候选行和所需列，适合板卡数量较多时使用）")
+    trace: bool = Field(
+        False, description="是否返回结构化追踪信息（每个需求的解析结果、候选数、各条件满足数、耗时）")
+    top_k: Optional[int] = Field(
+        None, ge=1, description="每个需求最多返回的 matched_boards 条数（按匹配度降序、价格升序），不填则全部返回")
+    cursor: Optional[str] = Field(
+        None, description="分页游标（上一页响应中的 next_cursor），需与 top_k 一起使用")
+    parallel: bool = Field(
+        False, description="是否用多进程并行评分需求（适合需求条目很多的标书，结果与逐个处理一致；下推模式不支持）")
+
+
+class ProcessDNFStreamRequest(ProcessDNFRequest):
+    """process_dnf 流式请求模型"""
+    format: str = Field(
+        "ndjson", pattern="^(ndjson|sse)$",
+        description="输出格式：ndjson（每行一个 JSON 记录）或 sse（Server-Sent Events）")
 
 
 class ProcessDNFResponse(BaseModel):
@@ -224,6 +295,10 @@ class ProcessDNFResponse(BaseModel):
     processing_info: Dict[str, Any]
     unsatisfied_requirements: List[Dict[str, Any]] = Field(
         default_factory=list, description="无法处理的需求（DNF为空或没有百分百匹配的板卡）")
+    trace: Optional[List[Dict[str, Any]]] = Field(
+        None, description="结构化追踪信息（仅在请求 trace=true 时返回）")
+    next_cursor: Optional[str] = Field(
+        None, description="下一页游标（指定 top_k 且仍有未返回的候选板卡时返回）")
 
 
 @app.post("/process-dnf", response_model=ProcessDNFResponse)
@@ -235,9 +310,18 @@ async def process_dnf_requirements(request: ProcessDNFRequest):
       - **original**: 原始需求描述
       - **DNF**: DNF逻辑表达式（如: "AD_channel_count_single_ended ≥ 16 and DA_channel_count ≥ 16"）
       - **id**: 可选的需求ID
+    - **pushdown**: 是否将过滤下推到数据库（默认使用进程内共享的板卡目录快照）
+    - **trace**: 是否返回结构化追踪信息（默认关闭，关闭时不生成任何调试信息）
+    - **top_k**: 每个需求最多返回的 matched_boards 条数，按匹配度降序、价格升序选取
+    - **cursor**: 分页游标，传入上一页的 next_cursor 获取每个需求后续的候选板卡
 
     返回匹配的板卡数据和线性规划输入数据
     """
+    try:
+        decode_cursor(request.cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="无效的分页游标")
+
     try:
         # 构建输入数据格式（转换为字典列表）
         require_list = [
@@ -250,7 +334,9 @@ async def process_dnf_requirements(request: ProcessDNFRequest):
         ]
 
         # 调用核心处理函数
-        output_data = process_dnf_requirements_core(require=require_list)
+        output_data = process_dnf_requirements_core(
+            require=require_list, pushdown=request.pushdown, trace=request.trace,
+            top_k=request.top_k, cursor=request.cursor, parallel=request.parallel)
 
         return ProcessDNFResponse(
             success=True,
@@ -262,7 +348,9 @@ async def process_dnf_requirements(request: ProcessDNFRequest):
             total_candidates=output_data['total_candidates'],
             total_matches=output_data['total_matches'],
             processing_info=output_data['processing_info'],
-            unsatisfied_requirements=output_data.get('unsatisfied_requirements', [])
+            unsatisfied_requirements=output_data.get('unsatisfied_requirements', []),
+            trace=output_data.get('trace'),
+            next_cursor=output_data.get('next_cursor')
         )
 
     except Exception as e:
@@ -271,6 +359,111 @@ async def process_dnf_requirements(request: ProcessDNFRequest):
         raise HTTPException(status_code=500, detail=error_detail)
 
 
+@app.post("/process-dnf/stream")
+async def process_dnf_requirements_stream(request: ProcessDNFStreamRequest):
+    """
+    流式处理DNF逻辑表达式：每个需求评估完成后立即输出一条记录，最后输出汇总记录
+
+    请求参数与 /process-dnf 相同，另外：
+    - **format**: ndjson（默认，每行一个 JSON）或 sse（text/event-stream，事件名为记录类型）
+
+    记录类型：
+    - **requirement**: 单个需求的结果（requirement_id、original、satisfied、candidate_count、
+      perfect_match_count、matched_boards，trace=True 时包含 trace）
+    - **summary**: 最后一条，包含 linprog_input_data、linprog_requiremnets、total_candidates、
+      total_matches、processing_info、unsatisfied_requirements（指定 top_k 时包含 next_cursor）
+    - **error**: 处理过程中出错时输出，随后结束流
+    """
+    try:
+        decode_cursor(request.cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="无效的分页游标")
+
+    require_list = [
+        {
+            'id': req.id if req.id else f"req_{idx}_{uuid.uuid4().hex[:8]}",
+            'original': req.original,
+            'DNF': req.DNF
+        }
+        for idx, req in enumerate(request.require)
+    ]
+    sse = request.format == "sse"
+
+    def encode(record: Dict[str, Any]) -> str:
+        payload = json.dumps(record, ensure_ascii=False, default=str)
+        if sse:
+            return f"event: {record['type']}\ndata: {payload}\n\n"
+        return payload + "\n"
+
+    def generate():
+        # 同步生成器由 StreamingResponse 在线程池中迭代，不阻塞事件循环
+        try:
+            for record in iter_dnf_requirements(
+                    require_list, pushdown=request.pushdown, trace=request.trace,
+                    top_k=request.top_k, cursor=request.cursor, parallel=request.parallel):
+                yield encode(record)
+        except Exception as e:
+            yield encode({'type': 'error', 'message': f"处理失败: {str(e)}"})
+
+    media_type = "text/event-stream" if sse else "application/x-ndjson"
+    return StreamingResponse(generate(), media_type=media_type)
+
+
+class ExplainDNFRequest(BaseModel):
+    """explain-dnf 请求模型"""
+    DNF: str = Field(..., description="DNF逻辑表达式")
+
+
+@app.post("/explain-dnf")
+async def explain_dnf(request: ExplainDNFRequest):
+    """
+    说明DNF逻辑表达式的评估计划，用于分析需求匹配慢的原因
+
+    返回每个合取项中条件的评估顺序（按列统计信息估算的选择率从小到大）、
+    每个条件的估算/实际满足板卡数、求交后剩余板卡数、是否因交集为空被跳过，以及合取项耗时
+    """
+    processor = BoardProcessor()
+    try:
+        explanation = processor.explain_dnf(request.DNF)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"说明失败: {str(e)}")
+    finally:
+        processor.close_connection()
+
+    if explanation is None:
+        raise HTTPException(status_code=503, detail="板卡目录不可用")
+    return {"success": True, **explanation}
+
+
+@app.post("/catalog/refresh")
+async def refresh_catalog():
+    """
+    显式刷新板卡目录快照
+
+    板卡表数据更新后调用，提升目录版本号并立即重新加载快照
+    """
+    try:
+        version = bump_catalog_version()
+        snapshot = get_catalog_snapshot()
+        return {
+            "success": True,
+            "version": version,
+            "board_count": len(snapshot.boards),
+            "loaded_at": datetime.fromtimestamp(snapshot.loaded_at).isoformat()
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"刷新板卡目录失败: {str(e)}")
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """进程内结果缓存的统计信息（条目数、字节数、命中/未命中次数等）"""
+    return {
+        "requirement_cache": requirement_cache.stats(),
+        "optimize_cache": optimize_cache.stats()
+    }
+
+
 # ================= query_sim 接口 =================
 
 class SimRequirementItem(BaseModel):
@@ -0,0 +1,1047 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+板卡目录快照：进程内共享的 hardware_specifications_1109 全表数据
+同一进程内的所有请求、所有 BoardProcessor 实例共用一份只读快照，
+快照按 TTL 过期后重新加载，也可以通过 bump_catalog_version() 显式刷新
+"""
+
+import os
+import re
+import time
+import hashlib
+import threading
+import psycopg2
+import numpy as np
+from decimal import Decimal
+from functools import cached_property
+from operator import ge, le, gt, lt
+from typing import List, Dict, Any, Tuple, Optional, Iterable
+
+# 数据库配置
+DB_CONFIG = {
+    'host': '10.0.4.13',
+    'database': 'LS_chuangqi',
+    'user': 'postgres',
+    'password': '123456789',
+    'port': 5433
+}
+
+# 板卡规格表
+CATALOG_TABLE = 'hardware_specifications_1109'
+
+# 快照有效期（秒），可通过环境变量配置
+CATALOG_TTL_SECONDS = float(os.getenv('CATALOG_TTL_SECONDS', '300'))
+
+# 39个channel_count字段的固定顺序
+CHANNEL_COUNT_FIELDS = [
+    'AD_channel_count_single_ended',
+    'AD_channel_count_differential',
+    'DA_channel_count',
+    'DIO_total_channel_count',
+    'DI_channel_count',
+    'DO_channel_count',
+    'PWM_output_channel_count',
+    'Encoder_quadrature_channel_count',
+    'Encoder_hall_channel_count',
+    'Encoder_channel_count_differential',
+    'Encoder_channel_count_single_ended',
+    'Counter_channel_count',
+    'CAN_channel_count',
+    'UART_channel_count',
+    'MIL1553_channel_count',
+    'A429_tx_channel_count',
+    'A429_rx_channel_count',
+    'AFDX_channel_count',
+    'SPI_channel_count',
+    'SSI_channel_count',
+    'Endat_channel_count',
+    'BISSC_channel_count',
+    'SENT_channel_count',
+    'PSI5_channel_count',
+    'I2C_channel_count',
+    'PCM_channel_count',
+    'LVDS_channel_count',
+    'RDC_SDC_channel_count',
+    'LVDT_RVDT_channel_count',
+    'RTD_channel_count',
+    'PPS_input_channel_count',
+    'PPS_output_channel_count',
+    'FPGA_fiber_channel_count',
+    'Motion_DA_channel_count',
+    'Motion_AD_channel_count',
+    'Motion_encoder_input_channel_count',
+    'Motion_enable_reset_channel_count',
+    'Motion_pulse_output_channel_count',
+    'Power_output_channel_count'
+]
+
+# 通道数字段的数据库列名（小写）
+CHANNEL_COUNT_KEYS = frozenset(f.lower() for f in CHANNEL_COUNT_FIELDS)
+
+# 需求中常用的字段别名 -> 数据库列名
+FIELD_NAME_MAPPING = {
+    'uart_interface_types': 'UART_interface_types_supported',
+    'encoder_signal_types': 'Encoder_signal_types_supported',
+    'mil1553_operation_modes': 'MIL1553_operation_modes_supported',
+}
+
+# 列名后缀 -> 单位（按列名命名约定推断，后缀越长越优先）
+UNIT_SUFFIXES = {
+    '_percent_fs': '%FS',
+    '_percent': '%',
+    '_vpp': 'Vpp',
+    '_vrms': 'Vrms',
+    '_vdc': 'V',
+    '_kv': 'kV',
+    '_mv': 'mV',
+    '_uv': 'µV',
+    '_v': 'V',
+    '_ghz': 'GHz',
+    '_mhz': 'MHz',
+    '_khz': 'kHz',
+    '_hz': 'Hz',
+    '_ohm': 'Ω',
+    '_ma': 'mA',
+    '_mw': 'mW',
+    '_gbps': 'Gbps',
+    '_mbps': 'Mbps',
+    '_kbps': 'kbps',
+    '_bps': 'bps',
+    '_ns': 'ns',
+    '_us': 'µs',
+    '_ms': 'ms',
+    '_bytes': 'B',
+    '_m': 'm',
+    '_ppb': 'ppb',
+    '_cny': 'CNY',
+}
+_UNIT_SUFFIX_ORDER = sorted(UNIT_SUFFIXES, key=len, reverse=True)
+
+# 不符合后缀约定的列 -> 单位（优先于后缀推断；单位取自 db_clean/hd_v4.sql 中的列注释）
+COLUMN_UNITS = {
+    'da_slew_rate_v_per_us': 'V/µs',
+    'da_slew_rate_ma_per_us': 'mA/µs',
+    'fpga_block_ram_mb': 'Mb',
+    'fpga_ps_on_chip_ram_kb': 'KB',
+    'fpga_ps_l1_cache_kb': 'KB',
+    'fpga_ps_l2_cache_kb': 'KB',
+}
+
+# 单位 -> (SI 基本单位, 换算系数)：1 单位 = 系数 × 基本单位
+# 系数用 Decimal 保证 115.2 kbps -> 115200 bps 这类换算没有浮点误差；
+# 存储容量按 1024 进位，bit（b/Kb/Mb/Gb）与字节（B/KB/MB/GB）统一换算到字节
+UNIT_SCALES = {
+    '%FS': ('%FS', Decimal(1)),
+    '%': ('%', Decimal(1)),
+    'Vpp': ('Vpp', Decimal(1)),
+    'mVpp': ('Vpp', Decimal('1e-3')),
+    'Vrms': ('Vrms', Decimal(1)),
+    'mVrms': ('Vrms', Decimal('1e-3')),
+    'kV': ('V', Decimal('1e3')),
+    'V': ('V', Decimal(1)),
+    'mV': ('V', Decimal('1e-3')),
+    'µV': ('V', Decimal('1e-6')),
+    'GHz': ('Hz', Decimal('1e9')),
+    'MHz': ('Hz', Decimal('1e6')),
+    'kHz': ('Hz', Decimal('1e3')),
+    'Hz': ('Hz', Decimal(1)),
+    'MΩ': ('Ω', Decimal('1e6')),
+    'kΩ': ('Ω', Decimal('1e3')),
+    'Ω': ('Ω', Decimal(1)),
+    'A': ('A', Decimal(1)),
+    'mA': ('A', Decimal('1e-3')),
+    'µA': ('A', Decimal('1e-6')),
+    'W': ('W', Decimal(1)),
+    'mW': ('W', Decimal('1e-3')),
+    'Gbps': ('bps', Decimal('1e9')),
+    'Mbps': ('bps', Decimal('1e6')),
+    'kbps': ('bps', Decimal('1e3')),
+    'bps': ('bps', Decimal(1)),
+    's': ('s', Decimal(1)),
+    'ms': ('s', Decimal('1e-3')),
+    'µs': ('s', Decimal('1e-6')),
+    'ns': ('s', Decimal('1e-9')),
+    'V/s': ('V/s', Decimal(1)),
+    'V/µs': ('V/s', Decimal('1e6')),
+    'A/s': ('A/s', Decimal(1)),
+    'A/µs': ('A/s', Decimal('1e6')),
+    'mA/µs': ('A/s', Decimal('1e3')),
+    'GB': ('B', Decimal(1024 ** 3)),
+    'MB': ('B', Decimal(1024 ** 2)),
+    'KB': ('B', Decimal(1024)),
+    'B': ('B', Decimal(1)),
+    'Gb': ('B', Decimal(1024 ** 3) / 8),
+    'Mb': ('B', Decimal(1024 ** 2) / 8),
+    'Kb': ('B', Decimal(1024) / 8),
+    'b': ('B', Decimal(1) / 8),
+    'km': ('m', Decimal('1e3')),
+    'm': ('m', Decimal(1)),
+    'mm': ('m', Decimal('1e-3')),
+    'ppm': ('ppb', Decimal('1e3')),
+    'ppb': ('ppb', Decimal(1)),
+    'CNY': ('CNY', Decimal(1)),
+}
+
+# 单位的其他写法 -> UNIT_SCALES 中的单位
+UNIT_ALIASES = {
+    'uV': 'µV', 'μV': 'µV', 'uA': 'µA', 'μA': 'µA', 'us': 'µs', 'μs': 'µs',
+    'V/us': 'V/µs', 'V/μs': 'V/µs', 'A/us': 'A/µs', 'A/μs': 'A/µs', 'mA/us': 'mA/µs', 'mA/μs': 'mA/µs',
+    'ohm': 'Ω', 'kohm': 'kΩ', 'Mohm': 'MΩ', 'bit/s': 'bps', 'b/s': 'bps',
+    'bytes': 'B', 'byte': 'B', 'kB': 'KB', 'bit': 'b', 'bits': 'b', 'Kbit': 'Kb', 'Mbit': 'Mb', 'Gbit': 'Gb',
+    '元': 'CNY',
+}
+
+
+def _build_unit_lookup() -> Dict[str, str]:
+    """单位写法 -> 单位：先精确匹配，再按小写匹配（小写后有歧义的写法不参与，如 mV 与 MV、Mb 与 MB）"""
+    exact = dict(UNIT_ALIASES)
+    exact.update((unit, unit) for unit in UNIT_SCALES)
+    lowered: Dict[str, Optional[str]] = {}
+    for spelling, unit in exact.items():
+        key = spelling.lower()
+        lowered[key] = unit if lowered.get(key, unit) == unit else None
+    lookup = {key: unit for key, unit in lowered.items() if unit is not None}
+    lookup.update(exact)
+    return lookup
+
+
+_UNIT_LOOKUP = _build_unit_lookup()
+
+# 带单位的数量：数字 + 可选空白 + 单位，如 "115.2 kbps"、"10mV"
+_QUANTITY_RE = re.compile(r'^\s*([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)\s*([^\s\d.+-][^\s]*)\s*$')
+
+# 数值列等深直方图的桶数（用于估算范围条件的选择率），可通过环境变量配置
+HISTOGRAM_BUCKETS = int(os.getenv('HISTOGRAM_BUCKETS', '32'))
+
+# 枚举数组列及其枚举类型（与 db_clean/write_into_db.py 中的 known_enum_array_columns 一致），
+# 加载快照时为这些列预先构建元素/取值索引
+ENUM_ARRAY_COLUMNS = {
+    'uart_interface_types_supported': 'uart_mode_enum',
+    'ad_input_modes': 'ad_input_mode_enum',
+    'encoder_signal_types_supported': 'encoder_signal_level_enum',
+    'pps_logic_levels_supported': 'pps_logic_level_enum',
+    'mil1553_operation_modes_supported': 'mil1553_operation_mode_enum',
+    'di_input_modes': 'dio_input_mode_enum',
+    'do_output_modes': 'dio_output_mode_enum',
+}
+
+# 范围比较在有序数值索引上的二分方式：比较函数 -> (searchsorted side, 是否取阈值之后的部分)
+RANGE_SEARCH = {ge: ('left', True), gt: ('right', True), le: ('right', False), lt: ('left', False)}
+
+
+def to_float(val: Any) -> Optional[float]:
+    """将数值类型转换为float进行比较，非数值返回None"""
+    if isinstance(val, Decimal):
+        return float(val)
+    elif isinstance(val, (int, float)):
+        return float(val)
+    return None
+
+
+def normalize_bool(val: Any) -> Optional[bool]:
+    """将各种布尔值表示转换为 Python bool，无法识别时返回None"""
+    if isinstance(val, bool):
+        return val
+    if isinstance(val, str):
+        val_lower = val.strip().lower()
+        if val_lower in ('true', '1', 'yes', 'on'):
+            return True
+        elif val_lower in ('false', '0', 'no', 'off', ''):
+            return False
+    return None
+
+
+def channel_value_present(field_value: Any) -> bool:
+    """检查 CHANNEL_COUNT_FIELDS 字段的值：非空、有值且不为0"""
+    if field_value is None:
+        return False
+
+    # 转换为数值类型检查
+    try:
+        return float(field_value) != 0
+    except (ValueError, TypeError):
+        # 如果无法转换为数值，检查是否为空字符串
+        return str(field_value).strip() != ''
+
+
+def split_field_items(field_value: Any) -> List[str]:
+    """将字段值拆分为元素列表（用于 ⊇ 集合包含判断）"""
+    if isinstance(field_value, str):
+        if ',' in field_value:
+            return [v.strip() for v in field_value.split(',')]
+        return [field_value.strip()]
+    elif isinstance(field_value, list):
+        return [str(v) for v in field_value]
+    return [str(field_value)]
+
+
+def parse_array_value(field_value: Any) -> Optional[Tuple[Any, ...]]:
+    """
+    将数组类字段值解析为元素元组（用于板卡规格展示）：
+    列表直接转换；文本按 PostgreSQL 数组 {a,b}、斜杠分隔 a/b、逗号分隔 a,b、单个值的顺序识别；
+    其他类型返回None
+    """
+    if isinstance(field_value, list):
+        return tuple(field_value)
+    if not isinstance(field_value, str):
+        return None
+    if field_value.startswith('{') and field_value.endswith('}'):
+        return tuple(item.strip().strip('"').strip("'")
+                     for item in field_value[1:-1].split(',') if item.strip())
+    if '/' in field_value:
+        return tuple(item.strip() for item in field_value.split('/') if item.strip())
+    if ',' in field_value:
+        return tuple(item.strip() for item in field_value.split(',') if item.strip())
+    return (field_value.strip(),) if field_value.strip() else ()
+
+
+class CatalogColumn:
+    """
+    单列的列式视图
+
+    values 为原始值的 object 数组；数值数组、布尔数组、文本数组等派生数据在首次使用时计算并缓存
+    """
+
+    def __init__(self, name: str, values: np.ndarray):
+        self.name = name
+        self.values = values
+        self.size = len(values)
+
+    @cached_property
+    def notnull(self) -> np.ndarray:
+        """非空掩码"""
+        return np.fromiter((v is not None for v in self.values), dtype=bool, count=self.size)
+
+    @cached_property
+    def _numeric(self) -> Tuple[np.ndarray, np.ndarray]:
+        numbers = np.full(self.size, np.nan, dtype=np.float64)
+        mask = np.zeros(self.size, dtype=bool)
+        for i, v in enumerate(self.values):
+            f = to_float(v)
+            if f is not None:
+                numbers[i] = f
+                mask[i] = True
+        return numbers, mask
+
+    @property
+    def numbers(self) -> np.ndarray:
+        """float64 数值数组（非数值为 NaN）"""
+        return self._numeric[0]
+
+    @property
+    def number_mask(self) -> np.ndarray:
+        """数值有效掩码"""
+        return self._numeric[1]
+
+    @cached_property
+    def range_index(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        数值范围索引：按数值升序排列的 (数值数组, 行号数组)，数值相同时按行号排列
+        只包含有效数值（NaN 与任何阈值比较都不成立，不进入索引）
+        """
+        numbers, mask = self._numeric
+        rows = np.flatnonzero(mask & ~np.isnan(numbers))
+        order = np.argsort(numbers[rows], kind='stable')
+        return numbers[rows][order], rows[order]
+
+    def rows_in_range(self, compare, threshold: float) -> np.ndarray:
+        """
+        用范围索引二分查找满足 compare(数值, threshold) 的行，返回升序行号数组
+        compare 为 operator.ge/gt/le/lt 之一
+        """
+        if threshold != threshold:  # NaN 阈值：任何比较都不成立
+            return np.empty(0, dtype=np.intp)
+        values, rows = self.range_index
+        side, upper = RANGE_SEARCH[compare]
+        pos = np.searchsorted(values, threshold, side=side)
+        return np.sort(rows[pos:] if upper else rows[:pos])
+
+    @cached_property
+    def _boolean(self) -> Tuple[np.ndarray, np.ndarray]:
+        bools = np.zeros(self.size, dtype=bool)
+        mask = np.zeros(self.size, dtype=bool)
+        for i, v in enumerate(self.values):
+            b = normalize_bool(v)
+            if b is not None:
+                bools[i] = b
+                mask[i] = True
+        return bools, mask
+
+    @property
+    def bools(self) -> np.ndarray:
+        """布尔值数组"""
+        return self._boolean[0]
+
+    @property
+    def bool_mask(self) -> np.ndarray:
+        """布尔值有效掩码"""
+        return self._boolean[1]
+
+    @cached_property
+    def texts(self) -> np.ndarray:
+        """去除首尾空白的字符串数组（空值为空字符串）"""
+        return np.array([str(v).strip() if v is not None else '' for v in self.values], dtype=object)
+
+    @cached_property
+    def array_values(self) -> List[Optional[Tuple[Any, ...]]]:
+        """预先解析的数组类取值（见 parse_array_value，非文本/列表值为None），原始值仍保留在 values 中"""
+        return [parse_array_value(v) for v in self.values]
+
+    @cached_property
+    def items(self) -> List[Optional[List[str]]]:
+        """预先拆分的元素列表（空值为None）"""
+        return [split_field_items(v) if v is not None else None for v in self.values]
+
+    @cached_property
+    def item_rows(self) -> Dict[str, np.ndarray]:
+        """
+        元素倒排索引：拆分后的每个元素取值（枚举数组列即每个枚举值）-> 包含该元素的升序行号
+        只保存行号而不是整列掩码，取值很多的文本列也只占用与行数相当的内存
+        """
+        rows_by_item: Dict[str, List[int]] = {}
+        for i, items in enumerate(self.items):
+            if items is not None:
+                for item in dict.fromkeys(items):
+                    rows_by_item.setdefault(item, []).append(i)
+        return {item: np.array(rows, dtype=np.intp) for item, rows in rows_by_item.items()}
+
+    @cached_property
+    def text_rows(self) -> Dict[str, np.ndarray]:
+        """取值倒排索引：去除首尾空白后的每个取值 -> 取该值的升序行号（不含空值）"""
+        rows_by_text: Dict[str, List[int]] = {}
+        for i, (text, notnull) in enumerate(zip(self.texts, self.notnull)):
+            if notnull:
+                rows_by_text.setdefault(text, []).append(i)
+        return {text: np.array(rows, dtype=np.intp) for text, rows in rows_by_text.items()}
+
+    @cached_property
+    def bool_bitmaps(self) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """布尔列的位图索引 (取值为 False 的掩码, 取值为 True 的掩码)；含非布尔值的列返回None"""
+        bools, mask = self._boolean
+        if not np.array_equal(mask, self.notnull):
+            return None
+        return ~bools & mask, bools & mask
+
+    def contains_all(self, required_values) -> np.ndarray:
+        """
+        ⊇ 判断：每个需求值都是该板卡某个元素的子串
+        先在元素取值上做子串匹配，把命中元素的行号置位，再对各需求值的结果按位与
+        """
+        result = self.notnull.copy()
+        for req_val in required_values:
+            matched = np.zeros(self.size, dtype=bool)
+            for item, rows in self.item_rows.items():
+                if req_val in item:
+                    matched[rows] = True
+            result &= matched
+            if not result.any():
+                break
+        return result
+
+    def in_values(self, allowed_values) -> np.ndarray:
+        """∈ 判断：取值（去除首尾空白）属于允许值之一，即对应取值的行号按位或"""
+        result = np.zeros(self.size, dtype=bool)
+        for value in set(allowed_values):
+            rows = self.text_rows.get(value)
+            if rows is not None:
+                result[rows] = True
+        return result
+
+    @cached_property
+    def present(self) -> np.ndarray:
+        """通道数字段的有效掩码：非空、有值且不为0"""
+        return np.fromiter((channel_value_present(v) for v in self.values), dtype=bool, count=self.size)
+
+    @cached_property
+    def stats(self) -> 'ColumnStatistics':
+        """列统计信息（用于估算条件选择率）"""
+        return ColumnStatistics(self)
+
+
+class ColumnStatistics:
+    """
+    单列统计信息，各项在首次使用时由列数据计算并缓存（随快照重建）
+        null_fraction: 空值比例
+        present_fraction: 通道数字段有效值（非空、有值且不为0）比例
+        numeric_fraction: 有效数值比例
+        histogram: 有效数值的等深直方图边界（HISTOGRAM_BUCKETS + 1 个分位点）
+        value_counts: 每个取值（去除首尾空白）的板卡数，distinct_count 为不同取值个数
+        item_counts: 每个元素（枚举数组列即每个枚举值）的板卡数
+        true_fraction / false_fraction: 布尔列取值为 True / False 的比例
+    """
+
+    def __init__(self, column: CatalogColumn):
+        self.column = column
+        self.size = column.size
+
+    def _fraction(self, count: int) -> float:
+        return count / self.size if self.size else 0.0
+
+    @cached_property
+    def null_fraction(self) -> float:
+        return 1.0 - self._fraction(int(self.column.notnull.sum())) if self.size else 1.0
+
+    @cached_property
+    def present_fraction(self) -> float:
+        return self._fraction(int(self.column.present.sum()))
+
+    @cached_property
+    def numeric_fraction(self) -> float:
+        return self._fraction(len(self.column.range_index[0]))
+
+    @cached_property
+    def histogram(self) -> np.ndarray:
+        values = self.column.range_index[0]
+        if not len(values):
+            return values
+        return np.quantile(values, np.linspace(0.0, 1.0, HISTOGRAM_BUCKETS + 1), method='inverted_cdf')
+
+    @cached_property
+    def value_counts(self) -> Dict[str, int]:
+        return {text: len(rows) for text, rows in self.column.text_rows.items()}
+
+    @property
+    def distinct_count(self) -> int:
+        return len(self.value_counts)
+
+    @cached_property
+    def item_counts(self) -> Dict[str, int]:
+        return {item: len(rows) for item, rows in self.column.item_rows.items()}
+
+    @cached_property
+    def true_fraction(self) -> float:
+        return self._fraction(int((self.column.bools & self.column.bool_mask).sum()))
+
+    @cached_property
+    def false_fraction(self) -> float:
+        return self._fraction(int((~self.column.bools & self.column.bool_mask).sum()))
+
+    def numeric_cdf(self, threshold: float, inclusive: bool) -> float:
+        """按直方图估算有效数值中小于（inclusive 时为小于等于）threshold 的比例"""
+        bounds = self.histogram
+        buckets = len(bounds) - 1
+        if buckets < 0:
+            return 0.0
+        i = int(np.searchsorted(bounds, threshold, side='right' if inclusive else 'left'))
+        if i == 0:
+            return 0.0
+        if i > buckets:
+            return 1.0
+        lo, hi = bounds[i - 1], bounds[i]
+        within = (threshold - lo) / (hi - lo) if hi > lo and np.isfinite(hi - lo) else 1.0
+        return (i - 1 + within) / buckets
+
+    def range_selectivity(self, compare, threshold: float) -> float:
+        """估算范围条件 compare(数值, threshold) 的选择率"""
+        if threshold != threshold:
+            return 0.0
+        side, upper = RANGE_SEARCH[compare]
+        below = self.numeric_cdf(threshold, inclusive=(side == 'right'))
+        return self.numeric_fraction * ((1.0 - below) if upper else below)
+
+
+class ColumnarCatalog:
+    """
+    板卡目录的列式视图
+
+    每列一个 CatalogColumn；行号与 boards 列表下标一一对应，
+    ids/models/prices 用于从行号映射回板卡
+    """
+
+    def __init__(self, columns: List[str], boards: List[Dict[str, Any]]):
+        self.boards = boards
+        self.size = len(boards)
+        self.ids = [str(b.get('id', '')) for b in boards]
+        self.row_of_id = {board_id: i for i, board_id in enumerate(self.ids)}
+        self.models = [b.get('model', '') for b in boards]
+
+        self._columns: Dict[str, CatalogColumn] = {}
+        for col in columns:
+            values = np.empty(self.size, dtype=object)
+            values[:] = [b.get(col) for b in boards]
+            self._columns[col] = CatalogColumn(col, values)
+
+        price_column = self._columns.get('price_cny')
+        self.prices = price_column.numbers if price_column is not None else np.full(self.size, np.nan)
+
+    def build_bitmap_indexes(self):
+        """
+        预先构建索引：每列的非空位图，枚举数组列的解析后元素、元素/取值倒排索引，布尔列的取值位图
+        （其余索引在首次使用时构建）
+        """
+        for name, column in self._columns.items():
+            column.notnull
+            if name in ENUM_ARRAY_COLUMNS:
+                column.array_values
+                column.item_rows
+                column.text_rows
+            elif isinstance(next((v for v in column.values if v is not None), None), bool):
+                column.bool_bitmaps
+
+    def column(self, name: str) -> Optional[CatalogColumn]:
+        """按字段名获取列（不存在返回None）"""
+        return self._columns.get(name)
+
+    def non_null_mask(self, names: Iterable[str]) -> np.ndarray:
+        """任一指定列非空的板卡掩码（各列非空位图按位或，不存在的列忽略）"""
+        mask = self.empty_mask()
+        for name in set(names):
+            column = self._columns.get(name)
+            if column is not None:
+                mask |= column.notnull
+        return mask
+
+    def id_mask(self, board_ids: Iterable[Any]) -> np.ndarray:
+        """指定板卡 id 对应的掩码（不在目录中的 id 忽略）"""
+        mask = self.empty_mask()
+        rows = [self.row_of_id[str(board_id)] for board_id in board_ids
+                if board_id and str(board_id) in self.row_of_id]
+        mask[rows] = True
+        return mask
+
+    def empty_mask(self) -> np.ndarray:
+        """全 False 掩码"""
+        return np.zeros(self.size, dtype=bool)
+
+
+class CatalogSnapshot:
+    """板卡目录快照（只读，请勿修改 boards 中的数据）"""
+
+    def __init__(self, columns: List[str], boards: List[Dict[str, Any]], version: int, fingerprint: str):
+        self.columns = columns
+        self.boards = boards
+        self.version = version
+        self.fingerprint = fingerprint
+        self.loaded_at = time.time()
+        self.expires_at = time.monotonic() + CATALOG_TTL_SECONDS
+
+    def is_expired(self) -> bool:
+        """快照是否已超过有效期"""
+        return time.monotonic() >= self.expires_at
+
+    def renew(self):
+        """数据未变化时延长有效期，保留快照对象（及其上的派生数据）"""
+        self.expires_at = time.monotonic() + CATALOG_TTL_SECONDS
+
+    @cached_property
+    def fields(self) -> 'FieldRegistry':
+        """快照各列的字段元数据注册表（类型取自表结构，表结构不可用时不含类型信息）"""
+        try:
+            schema = get_catalog_schema()
+        except Exception as e:
+            print(f"Database error: {e}")
+            schema = None
+        return FieldRegistry(self.columns, schema)
+
+    @cached_property
+    def columnar(self) -> ColumnarCatalog:
+        """列式视图及其位图索引（每个快照只构建一次）"""
+        columnar = ColumnarCatalog(self.columns, self.boards)
+        columnar.build_bitmap_indexes()
+        return columnar
+
+
+class CatalogSchema:
+    """板卡表结构：列类型及枚举类型的取值"""
+
+    def __init__(self, column_types: Dict[str, Dict[str, str]], enum_labels: Dict[str, List[str]]):
+        self.column_types = column_types  # {列名: {'data_type': ..., 'udt_name': ...}}
+        self.columns = list(column_types.keys())
+        self.enum_labels = enum_labels  # {枚举类型名: [取值, ...]}
+        self.expires_at = time.monotonic() + CATALOG_TTL_SECONDS
+
+    def has_column(self, name: str) -> bool:
+        return name in self.column_types
+
+    def data_type(self, name: str) -> Optional[str]:
+        info = self.column_types.get(name)
+        return info['data_type'] if info else None
+
+    def array_enum_type(self, name: str) -> Optional[str]:
+        """枚举数组列的元素枚举类型名（非枚举数组列返回None）"""
+        info = self.column_types.get(name)
+        if not info or info['data_type'] != 'ARRAY':
+            return None
+        element_type = info['udt_name'].lstrip('_')
+        return element_type if element_type in self.enum_labels else None
+
+    @cached_property
+    def fields(self) -> 'FieldRegistry':
+        """字段元数据注册表（每次加载表结构时构建一次）"""
+        return FieldRegistry(self.columns, self)
+
+
+def unit_of_column(name: str) -> Optional[str]:
+    """
+    字段的存储单位（无法推断时返回None）：先查 COLUMN_UNITS，再按列名后缀推断；
+    _per_ 之后的后缀是比率的分母（如 _per_us），不作为单位
+    """
+    if name in COLUMN_UNITS:
+        return COLUMN_UNITS[name]
+    for suffix in _UNIT_SUFFIX_ORDER:
+        if name.endswith(suffix):
+            return None if name.endswith('_per' + suffix) else UNIT_SUFFIXES[suffix]
+    return None
+
+
+def resolve_unit(unit: Optional[str]) -> Optional[str]:
+    """
+    将单位的各种写法（GHZ、Kbps、uV 等）规范为 UNIT_SCALES 中的单位，无法识别时返回None
+    按小写匹配时 b（bit）与 B（字节）的大小写必须与单位一致，MBps 不会被当作 Mbps
+    """
+    if not unit:
+        return None
+    unit = unit.strip()
+    if unit in _UNIT_LOOKUP:
+        return _UNIT_LOOKUP[unit]
+    resolved = _UNIT_LOOKUP.get(unit.lower())
+    if resolved is None or [c for c in unit if c in 'bB'] != [c for c in resolved if c in 'bB']:
+        return None
+    return resolved
+
+
+def parse_quantity(text: Any) -> Optional[Tuple[Decimal, str]]:
+    """解析带单位的数量字符串，如 "115.2 kbps" -> (Decimal('115.2'), 'kbps')；不是"数字+已知单位"时返回None"""
+    if not isinstance(text, str):
+        return None
+    match = _QUANTITY_RE.match(text.strip('"').strip("'"))
+    if match is None:
+        return None
+    unit = resolve_unit(match.group(2))
+    if unit is None:
+        return None
+    return Decimal(match.group(1)), unit
+
+
+def convert_unit(value: Any, from_unit: Optional[str], to_unit: Optional[str]) -> Optional[float]:
+    """
+    单位换算：value（数值或数字字符串）从 from_unit 换算到 to_unit
+    两个单位无法识别或量纲不同时返回None；换算在 Decimal 上进行，结果转换为 float
+    """
+    source, target = resolve_unit(from_unit), resolve_unit(to_unit)
+    if source is None or target is None:
+        return None
+    (source_base, source_scale), (target_base, target_scale) = UNIT_SCALES[source], UNIT_SCALES[target]
+    if source_base != target_base:
+        return None
+    if isinstance(value, float):
+        value = str(value)  # 按最短十进制表示换算，避免把二进制误差带入结果
+    try:
+        amount = value if isinstance(value, Decimal) else Decimal(value)
+    except (ArithmeticError, ValueError, TypeError):
+        return None
+    return float(amount * source_scale / target_scale)
+
+
+def condition_threshold(field: str, value: Any) -> Optional[float]:
+    """
+    条件比较值在字段存储单位下的 float 值（编译条件时调用一次）
+    数值直接转换；带单位的字符串（如 "115.2 kbps"）按 unit_of_column 给出的单位换算，
+    量纲不符或字段没有单位时返回None（与非数值比较值一样，范围条件恒不满足）
+    """
+    threshold = to_float(value)
+    if threshold is not None:
+        return threshold
+    quantity = parse_quantity(value)
+    if quantity is None:
+        return None
+    return convert_unit(quantity[0], quantity[1], unit_of_column(field))
+
+
+class FieldInfo:
+    """
+    单个字段的元数据
+        name: 数据库列名（小写，即条件字典中的字段名）
+        aliases: 可以解析到该列的其他名字（小写）
+        data_type / udt_name: information_schema 中的类型（表结构不可用时为None）
+        enum_type: 枚举列或枚举数组列的枚举类型名
+        is_array: 是否为数组列
+        unit: 存储单位（unit_of_column）
+        channel_count: 是否为通道数字段
+    """
+
+    __slots__ = ('name', 'aliases', 'data_type', 'udt_name', 'enum_type', 'is_array', 'unit', 'channel_count')
+
+    def __init__(self, name: str, schema: Optional[CatalogSchema] = None):
+        info = schema.column_types.get(name) if schema is not None else None
+        self.name = name
+        self.aliases: List[str] = []
+        self.data_type = info['data_type'] if info else None
+        self.udt_name = info['udt_name'] if info else None
+        self.is_array = self.data_type == 'ARRAY' or (
+            self.data_type is None and name in ENUM_ARRAY_COLUMNS)
+        if schema is not None:
+            element_type = (self.udt_name or '').lstrip('_')
+            self.enum_type = element_type if element_type in schema.enum_labels else None
+        else:
+            self.enum_type = ENUM_ARRAY_COLUMNS.get(name)
+        self.unit = None if name in CHANNEL_COUNT_KEYS else unit_of_column(name)
+        self.channel_count = name in CHANNEL_COUNT_KEYS
+
+    def __repr__(self):
+        return f"FieldInfo({self.name!r})"
+
+
+class FieldRegistry:
+    """
+    字段元数据注册表：列名及其别名 -> FieldInfo
+    别名包括去掉 _supported 后缀的列名、FIELD_NAME_MAPPING 中的别名；
+    真实列名优先于别名，解析时先按原样查找，再按小写查找
+    """
+
+    def __init__(self, columns: List[str], schema: Optional[CatalogSchema] = None):
+        self.fields: Dict[str, FieldInfo] = {col: FieldInfo(col, schema) for col in columns}
+        self._by_name: Dict[str, FieldInfo] = dict(self.fields)
+
+        aliases = [(alias.lower(), column.lower()) for alias, column in FIELD_NAME_MAPPING.items()]
+        aliases += [(col[:-len('_supported')], col) for col in columns if col.endswith('_supported')]
+        for alias, column in aliases:
+            info = self.fields.get(column)
+            if info is not None and alias not in self._by_name:
+                self._by_name[alias] = info
+                info.aliases.append(alias)
+
+    def resolve(self, name: str) -> Optional[FieldInfo]:
+        """按列名或别名（大小写不敏感）查找字段，不存在返回None"""
+        info = self._by_name.get(name)
+        if info is None:
+            info = self._by_name.get(name.lower())
+        return info
+
+    def column_of(self, name: str) -> Optional[str]:
+        """字段名或别名对应的数据库列名"""
+        info = self.resolve(name)
+        return info.name if info is not None else None
+
+    def is_channel_count(self, name: str) -> bool:
+        info = self.resolve(name)
+        return info is not None and info.channel_count
+
+
+# 进程级快照及其版本号
+_snapshot: Optional[CatalogSnapshot] = None
+_snapshot_lock = threading.Lock()
+_catalog_version = 0
+_force_reload = False
+_schema: Optional[CatalogSchema] = None
+
+
+def fetch_catalog_rows() -> Tuple[List[str], List[tuple]]:
+    """从数据库读取板卡表的列名和全部数据行"""
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        cur = conn.cursor()
+
+        # 查询所有列（除了created_at等元数据）
+        cur.execute("""
+            SELECT column_name
+            FROM information_schema.columns
+            WHERE table_name = %s
+            AND column_name NOT IN ('created_at')
+            ORDER BY ordinal_position
+        """, (CATALOG_TABLE,))
+
+        columns = [row[0] for row in cur.fetchall()]
+
+        # 按 id 排序，保证快照内容和顺序稳定
+        column_list = ', '.join(columns)
+        cur.execute(
+            f"SELECT {column_list} FROM {CATALOG_TABLE} ORDER BY id")
+
+        rows = cur.fetchall()
+        cur.close()
+        return columns, rows
+    finally:
+        conn.close()
+
+
+def fetch_catalog_schema() -> CatalogSchema:
+    """从数据库读取板卡表的列类型及枚举类型取值"""
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT column_name, data_type, udt_name
+            FROM information_schema.columns
+            WHERE table_name = %s
+            AND column_name NOT IN ('created_at')
+            ORDER BY ordinal_position
+        """, (CATALOG_TABLE,))
+        column_types = {
+            name: {'data_type': data_type, 'udt_name': udt_name}
+            for name, data_type, udt_name in cur.fetchall()
+        }
+
+        cur.execute("""
+            SELECT t.typname, e.enumlabel
+            FROM pg_type t
+            JOIN pg_enum e ON e.enumtypid = t.oid
+            ORDER BY t.typname, e.enumsortorder
+        """)
+        enum_labels = {}
+        for type_name, label in cur.fetchall():
+            enum_labels.setdefault(type_name, []).append(label)
+
+        cur.close()
+        return CatalogSchema(column_types, enum_labels)
+    finally:
+        conn.close()
+
+
+def rows_to_boards(columns: List[str], rows: List[tuple]) -> List[Dict[str, Any]]:
+    """将数据行转换为字典列表，并处理布尔值类型"""
+    result = []
+    for row in rows:
+        board_dict = {}
+        for j, col in enumerate(columns):
+            value = row[j]
+            # 确保布尔值类型正确（PostgreSQL 布尔值可能被转换为字符串）
+            if isinstance(value, str) and value.lower() in ('true', 'false', 't', 'f', '1', '0'):
+                # 尝试转换为布尔值
+                if value.lower() in ('true', 't', '1'):
+                    value = True
+                elif value.lower() in ('false', 'f', '0', ''):
+                    value = False
+            board_dict[col] = value
+        result.append(board_dict)
+    return result
+
+
+def compute_fingerprint(columns: List[str], rows: List[tuple]) -> str:
+    """计算快照内容指纹，用于判断重新加载后数据是否变化"""
+    digest = hashlib.sha1()
+    digest.update(repr(columns).encode('utf-8'))
+    for row in rows:
+        digest.update(repr(row).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _load_snapshot_locked() -> CatalogSnapshot:
+    """加载快照（调用方需持有 _snapshot_lock）"""
+    global _snapshot, _catalog_version, _force_reload
+
+    columns, rows = fetch_catalog_rows()
+    fingerprint = compute_fingerprint(columns, rows)
+
+    # 数据未变化且不是显式刷新：沿用原快照，只延长有效期
+    if _snapshot is not None and not _force_reload and _snapshot.fingerprint == fingerprint:
+        _snapshot.renew()
+        return _snapshot
+
+    if _snapshot is not None and not _force_reload:
+        _catalog_version += 1
+
+    _snapshot = CatalogSnapshot(
+        columns, rows_to_boards(columns, rows), _catalog_version, fingerprint)
+    _force_reload = False
+    return _snapshot
+
+
+def get_catalog_snapshot(force_refresh: bool = False) -> CatalogSnapshot:
+    """
+    获取进程级板卡目录快照
+
+    首次调用、快照过期或版本号被显式提升时重新加载；
+    重新加载失败时继续使用旧快照（没有旧快照则抛出异常）
+    """
+    snapshot = _snapshot
+    if snapshot is not None and not force_refresh and not _force_reload and not snapshot.is_expired():
+        return snapshot
+
+    with _snapshot_lock:
+        # 双重检查：等待锁期间可能已由其他线程完成加载
+        snapshot = _snapshot
+        if snapshot is not None and not force_refresh and not _force_reload and not snapshot.is_expired():
+            return snapshot
+        try:
+            return _load_snapshot_locked()
+        except Exception as e:
+            if snapshot is None:
+                raise
+            print(f"板卡目录刷新失败，继续使用版本 {snapshot.version} 的快照: {e}")
+            snapshot.renew()
+            return snapshot
+
+
+def get_catalog_schema() -> CatalogSchema:
+    """获取板卡表结构（与快照使用相同的有效期）"""
+    global _schema
+    schema = _schema
+    if schema is not None and time.monotonic() < schema.expires_at:
+        return schema
+    with _snapshot_lock:
+        if _schema is None or time.monotonic() >= _schema.expires_at:
+            _schema = fetch_catalog_schema()
+        return _schema
+
+
+def get_field_registry() -> FieldRegistry:
+    """获取字段元数据注册表（由 information_schema 及枚举类型构建，随表结构一起缓存）"""
+    return get_catalog_schema().fields
+
+
+def bump_catalog_version() -> int:
+    """
+    显式提升目录版本号（例如板卡表更新后调用），下次访问时重新加载快照
+
+    Returns:
+        新的版本号
+    """
+    global _catalog_version, _force_reload, _schema
+    with _snapshot_lock:
+        _catalog_version += 1
+        _force_reload = True
+        _schema = None
+        return _catalog_version
+
+
+def get_catalog_version() -> int:
+    """当前目录版本号"""
+    return _catalog_version
+
+
+def check_units() -> None:
+    """单位解析自检：b（bit）与 B（字节）区分大小写，其余单位大小写不敏感"""
+    quantities = {
+        '115.2 kbps': ('115.2', 'kbps'),
+        '1 Kbps': ('1', 'kbps'),
+        '3 Mb': ('3', 'Mb'),
+        '3MB': ('3', 'MB'),
+        '2 GHZ': ('2', 'GHz'),
+        '10 uV': ('10', 'µV'),
+        '3 mb': None,
+        '2 MBps': None,
+    }
+    for text, expected in quantities.items():
+        quantity = parse_quantity(text)
+        actual = (str(quantity[0]), quantity[1]) if quantity else None
+        assert actual == expected, f"parse_quantity({text!r}) = {actual}, 期望 {expected}"
+
+    conversions = [
+        (('1', 'Kbps', 'bps'), 1000.0),
+        (('16', 'Mb', 'MB'), 2.0),
+        (('512', 'KB', 'Mb'), 4.0),
+        (('3', 'Mb', 'bps'), None),
+    ]
+    for args, expected in conversions:
+        actual = convert_unit(*args)
+        assert actual == expected, f"convert_unit{args} = {actual}, 期望 {expected}"
+
+    thresholds = [
+        (('da_slew_rate_v_per_us', '10 V/uS'), 10.0),
+        (('da_slew_rate_ma_per_us', '1.4 mA/µs'), 1.4),
+        (('da_slew_rate_v_per_us', '2 ms'), None),
+        (('fpga_block_ram_mb', '512 KB'), 4.0),
+        (('fpga_ps_l2_cache_kb', '1 MB'), 1024.0),
+        (('uart_max_baud_rate_bps', '115.2 Kbps'), 115200.0),
+        (('uart_max_baud_rate_bps', '3 Mb'), None),
+    ]
+    for args, expected in thresholds:
+        actual = condition_threshold(*args)
+        assert actual == expected, f"condition_threshold{args} = {actual}, 期望 {expected}"
+    print(f"check_units: {len(quantities)} 个数量 + {len(conversions)} 个换算 + {len(thresholds)} 个比较值通过")
+
+
+if __name__ == '__main__':
+    check_units()
@@ -0,0 +1,1019 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+DNF 逻辑表达式编译：把 DNF 字符串解析为不可变、可哈希的编译结果
+条件 ID 由条件内容（字段、操作符、取值）派生，同一条件在任何进程、任何请求中 ID 相同；
+编译结果按 DNF 字符串缓存在有界 LRU 中，每个需求在进程内只解析一次
+"""
+
+import os
+import re
+import uuid
+import hashlib
+from decimal import Decimal
+from functools import lru_cache
+from operator import ge, le, gt, lt
+from typing import List, Dict, Any, Tuple, Optional
+import numpy as np
+from board_catalog import (CHANNEL_COUNT_KEYS, ColumnarCatalog, condition_threshold, normalize_bool,
+                           channel_value_present, split_field_items)
+
+# 编译结果 LRU 缓存容量，可通过环境变量配置
+DNF_CACHE_SIZE = int(os.getenv('DNF_CACHE_SIZE', '1024'))
+
+# 条件 ID 的命名空间（uuid5）
+CONDITION_ID_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, 'linprog/dnf-condition')
+
+
+def normalize_field_name(field_name: str) -> str:
+    """将字段名转换为数据库中的格式（小写）"""
+    return field_name.strip().lower()
+
+
+def condition_id(cond_dict: Dict[str, Any]) -> str:
+    """由条件内容派生确定性的条件 ID"""
+    if 'values' in cond_dict:
+        operand = repr(tuple(cond_dict['values']))
+    else:
+        operand = repr(cond_dict.get('value'))
+    key = '\x1f'.join([cond_dict['field'], cond_dict['operator'], operand])
+    return str(uuid.uuid5(CONDITION_ID_NAMESPACE, key))
+
+
+def _with_condition_id(cond_dict: Dict[str, Any]) -> Dict[str, Any]:
+    """为解析出的条件字典加上 ID（放在首位，与原有输出格式一致）"""
+    return {'id': condition_id(cond_dict), **cond_dict}
+
+
+# 比较操作符（ASCII 写法统一映射为 Unicode 写法）
+COMPARISON_OPERATORS = {
+    '≥': '≥', '>=': '≥',
+    '≤': '≤', '<=': '≤',
+    '≠': '≠', '!=': '≠',
+    '=': '=', '==': '=',
+    '>': '>',
+    '<': '<',
+    '⊇': '⊇',
+    '∈': '∈',
+    # 全角写法
+    '＝': '=',
+    '＞': '>',
+    '＜': '<',
+}
+
+# 范围比较操作符对应的比较函数
+RANGE_COMPARATORS = {'≥': ge, '>=': ge, '≤': le, '<=': le, '>': gt, '<': lt}
+
+# 相等/不等操作符（ASCII 写法映射为 Unicode 写法）
+EQUALITY_OPERATORS = {'=': '=', '≠': '≠', '!=': '≠'}
+
+# 浮点相等比较的容差
+EQUALITY_TOLERANCE = 1e-9
+
+# 可直接转换为 float 比较的类型（bool 是 int 的子类）
+_NUMERIC_TYPES = (Decimal, int, float)
+
+# 逻辑操作符优先级：∧ 高于 ∨
+LOGICAL_PRECEDENCE = {'∧': 2, '∨': 1}
+
+# DNF 展开后合取项数量上限，防止 (A ∨ B) ∧ (C ∨ D) ∧ ... 指数膨胀，可通过环境变量配置
+DNF_MAX_CONJUNCTS = int(os.getenv('DNF_MAX_CONJUNCTS', '4096'))
+
+# 词法规则：各分支互不重叠，整个输入只扫描一遍
+_TOKEN_RE = re.compile(r'''
+    (?P<ws>\s+)
+  | (?P<lparen>[(（])
+  | (?P<rparen>[)）])
+  | (?P<and>∧|&&|(?i:\band\b))
+  | (?P<or>∨|\|\||(?i:\bor\b))
+  | (?P<op>>=|<=|!=|==|[≥≤≠=><⊇∈＝＞＜])
+  | (?P<set>\{(?:"[^"]*"|'[^']*'|[^{}"'])*\})
+  | (?P<string>"[^"]*"|'[^']*')
+  | (?P<word>[^\s()（）∧∨&|≥≤≠=<>!⊇∈＝＞＜{}"']+)
+  | (?P<other>.)
+''', re.VERBOSE | re.DOTALL)
+
+# 集合字面量中的元素：引号字符串或不含逗号的裸值
+_SET_ITEM_RE = re.compile(r'''"([^"]*)"|'([^']*)'|([^,"']+)''')
+
+
+class Token:
+    """词法单元：kind 为 ws/lparen/rparen/and/or/op/set/string/word/other，start/end 为源串位置"""
+
+    __slots__ = ('kind', 'text', 'start', 'end')
+
+    def __init__(self, kind: str, text: str, start: int, end: int):
+        self.kind = kind
+        self.text = text
+        self.start = start
+        self.end = end
+
+    def __repr__(self):
+        return f"Token({self.kind}, {self.text!r})"
+
+
+class ConditionNode:
+    """
+    AST 叶子：单个条件
+    condition 为解析出的条件字典；条件格式错误时 condition 为 None，error 为错误信息
+    """
+
+    __slots__ = ('text', 'condition', 'error')
+
+    def __init__(self, text: str, condition: Optional[Dict[str, Any]] = None, error: Optional[str] = None):
+        self.text = text
+        self.condition = condition
+        self.error = error
+
+    def __repr__(self):
+        return f"ConditionNode({self.text!r})"
+
+
+class LogicalNode:
+    """AST 内部节点：operator 为 ∧ 或 ∨，children 为子节点列表（同类操作符已展平）"""
+
+    __slots__ = ('operator', 'children')
+
+    def __init__(self, operator: str, children: List[Any]):
+        self.operator = operator
+        self.children = children
+
+    def __repr__(self):
+        return f"LogicalNode({self.operator}, {self.children!r})"
+
+
+def tokenize(logic_str: str) -> List[Token]:
+    """词法分析：返回不含空白的词法单元列表"""
+    return [Token(match.lastgroup, match.group(), match.start(), match.end())
+            for match in _TOKEN_RE.finditer(logic_str)
+            if match.lastgroup != 'ws']
+
+
+def _parse_scalar(value_str: str) -> Any:
+    """解析比较操作符右侧的取值：数字转换为 int/float，否则作为字符串"""
+    try:
+        if '.' in value_str:
+            return float(value_str)
+        return int(value_str)
+    except ValueError:
+        return value_str.strip('"').strip("'")
+
+
+def _parse_set_literal(set_str: str) -> List[str]:
+    """解析集合字面量 {"a", "b", c}"""
+    values = []
+    for match in _SET_ITEM_RE.finditer(set_str[1:-1]):
+        quoted = match.group(1) if match.group(1) is not None else match.group(2)
+        if quoted is not None:
+            values.append(quoted)
+        elif match.group(3).strip():
+            values.append(match.group(3).strip())
+    return values
+
+
+def _parse_condition_tokens(source: str, tokens: List[Token], text: str) -> Dict[str, Any]:
+    """将一个条件的词法单元解析为条件字典：字段 操作符 取值/集合"""
+    op_index = next((i for i, token in enumerate(tokens) if token.kind == 'op'), None)
+    if not op_index:
+        raise ValueError(f"Unsupported condition format: {text}")
+
+    field = normalize_field_name(source[tokens[0].start:tokens[op_index].start])
+    operator = COMPARISON_OPERATORS[tokens[op_index].text]
+    operand = tokens[op_index + 1:]
+    if not operand:
+        raise ValueError(f"Missing value in condition: {text}")
+    operand_str = source[operand[0].start:operand[-1].end]
+
+    if operator in ('⊇', '∈'):
+        if len(operand) != 1 or operand[0].kind != 'set':
+            raise ValueError(f"Invalid set format: {operand_str}")
+        return _with_condition_id({
+            'field': field,
+            'operator': operator,
+            'values': _parse_set_literal(operand_str)
+        })
+
+    if len(operand) == 1 and operand[0].kind == 'string':
+        value = operand_str[1:-1]
+    else:
+        value = _parse_scalar(operand_str)
+    return _with_condition_id({
+        'field': field,
+        'operator': operator,
+        'value': value
+    })
+
+
+def _build_condition(source: str, tokens: List[Token]) -> ConditionNode:
+    """由连续的非逻辑词法单元构造条件叶子，格式错误记录在叶子上而不抛出"""
+    text = source[tokens[0].start:tokens[-1].end].strip()
+    try:
+        return ConditionNode(text, _parse_condition_tokens(source, tokens, text))
+    except ValueError as e:
+        return ConditionNode(text, error=str(e))
+
+
+def _combine(operator: str, left: Any, right: Any) -> LogicalNode:
+    """合并两个子树：左侧同类节点直接追加右操作数，右侧的同类嵌套留给 _flatten 一次性展平"""
+    if isinstance(left, LogicalNode) and left.operator == operator:
+        left.children.append(right)
+        return left
+    return LogicalNode(operator, [left, right])
+
+
+def _flatten(root: Any) -> Any:
+    """自顶向下展平同类操作符的嵌套节点，每个节点只访问一次（右嵌套链不会被逐层复制）"""
+    pending = [root] if isinstance(root, LogicalNode) else []
+    while pending:
+        node = pending.pop()
+        children = []
+        stack = node.children[::-1]
+        while stack:
+            child = stack.pop()
+            if isinstance(child, LogicalNode) and child.operator == node.operator:
+                stack.extend(reversed(child.children))
+                continue
+            children.append(child)
+            if isinstance(child, LogicalNode):
+                pending.append(child)
+        node.children = children
+    return root
+
+
+def parse_expression(logic_str: str) -> Optional[Any]:
+    """
+    解析逻辑表达式为 AST（ConditionNode / LogicalNode），空表达式返回 None
+    使用显式栈的算符优先分析，时间与输入长度成线性关系，嵌套深度不受递归限制；
+    对 LLM 生成的表达式尽量宽容：相邻的条件/括号视为 ∧，多余的逻辑操作符和括号被忽略，未闭合的括号自动闭合
+    """
+    operands = []
+    operators = []
+    atom = []
+    expect_operand = True
+    open_parens = 0
+
+    def reduce():
+        operator = operators.pop()
+        right = operands.pop()
+        left = operands.pop()
+        operands.append(_combine(operator, left, right))
+
+    def push_operator(operator):
+        nonlocal expect_operand
+        if expect_operand:
+            return
+        while operators and operators[-1] != '(' and \
+                LOGICAL_PRECEDENCE[operators[-1]] >= LOGICAL_PRECEDENCE[operator]:
+            reduce()
+        operators.append(operator)
+        expect_operand = True
+
+    def push_operand(node):
+        nonlocal expect_operand
+        push_operator('∧')
+        operands.append(node)
+        expect_operand = False
+
+    def flush_atom():
+        if atom:
+            push_operand(_build_condition(logic_str, atom))
+            atom.clear()
+
+    def drop_dangling():
+        nonlocal expect_operand
+        while expect_operand and operators and operators[-1] != '(':
+            operators.pop()
+            expect_operand = False
+
+    for token in tokenize(logic_str):
+        kind = token.kind
+        if kind == 'and' or kind == 'or':
+            flush_atom()
+            push_operator('∧' if kind == 'and' else '∨')
+        elif kind == 'lparen':
+            flush_atom()
+            push_operator('∧')
+            operators.append('(')
+            open_parens += 1
+            expect_operand = True
+        elif kind == 'rparen':
+            flush_atom()
+            if not open_parens:
+                continue
+            drop_dangling()
+            while operators[-1] != '(':
+                reduce()
+            operators.pop()
+            open_parens -= 1
+            # 空括号 () 不产生操作数，丢弃为它插入的隐式 ∧
+            drop_dangling()
+        else:
+            atom.append(token)
+
+    flush_atom()
+    while operators:
+        drop_dangling()
+        if not operators:
+            break
+        if operators[-1] == '(':
+            operators.pop()
+        else:
+            reduce()
+
+    return _flatten(operands[-1]) if operands else None
+
+
+def to_dnf(node: Any) -> List[Tuple[ConditionNode, ...]]:
+    """
+    将 AST 展开为 DNF：返回合取项列表，每个合取项为条件叶子元组
+    使用显式栈的后序遍历；展开后的合取项数超过 DNF_MAX_CONJUNCTS 时抛出 ValueError
+    """
+    if node is None:
+        return []
+
+    results = {}
+    stack = [(node, False)]
+    while stack:
+        current, visited = stack.pop()
+        if isinstance(current, ConditionNode):
+            results[id(current)] = [[current]]
+            continue
+        if not visited:
+            stack.append((current, True))
+            stack.extend((child, False) for child in current.children)
+            continue
+
+        child_dnfs = [results.pop(id(child)) for child in current.children]
+        if current.operator == '∨':
+            combined = [conj for dnf in child_dnfs for conj in dnf]
+        else:
+            combined = [[]]
+            for dnf in child_dnfs:
+                if len(dnf) == 1:
+                    for conj in combined:
+                        conj.extend(dnf[0])
+                else:
+                    combined = [conj + other for conj in combined for other in dnf]
+                if len(combined) > DNF_MAX_CONJUNCTS:
+                    break
+        if len(combined) > DNF_MAX_CONJUNCTS:
+            raise ValueError(
+                f"DNF expansion exceeds {DNF_MAX_CONJUNCTS} conjuncts")
+        results[id(current)] = combined
+
+    return [tuple(conj) for conj in results[id(node)]]
+
+
+def parse_logical_expression(logic_str: str) -> List[List[str]]:
+    """
+    解析逻辑表达式，返回DNF（析取范式）形式
+    例如: (A ∧ B) ∨ (C ∧ D) -> [[A, B], [C, D]]
+    """
+    if not logic_str or not logic_str.strip():
+        return []
+    return [[leaf.text for leaf in conj] for conj in to_dnf(parse_expression(logic_str))]
+
+
+def parse_single_condition(condition: str) -> Dict[str, Any]:
+    """
+    解析单个条件，返回操作符和操作数
+    """
+    node = parse_expression(condition.strip())
+    if not isinstance(node, ConditionNode):
+        raise ValueError(f"Unsupported condition format: {condition}")
+    if node.error is not None:
+        raise ValueError(node.error)
+    return node.condition
+
+
+class ConditionPredicate:
+    """
+    条件谓词：每个条件编译一次，评估时只剩比较本身
+        key: 预先确定的列名
+        channel_count: 是否为通道数字段（编译时决定，只检查非空、有值且不为0）
+        threshold: 已转换为 float（带单位时已换算为字段存储单位）的比较阈值
+        compare: 绑定的比较函数（operator.ge 等，对标量和 numpy 数组都适用）
+        test: 针对操作符特化的逐行判断函数 test(row) -> bool
+    语义与 BoardProcessor.evaluate_condition 原有实现一致
+    """
+
+    __slots__ = ('key', 'operator', 'channel_count', 'threshold', 'compare',
+                 'value_text', 'value_bool', 'values', 'test')
+
+    def __init__(self, cond_dict: Dict[str, Any]):
+        self.key = cond_dict['field']
+        self.operator = cond_dict['operator']
+        self.channel_count = self.key in CHANNEL_COUNT_KEYS
+        self.threshold = None
+        self.compare = None
+        self.value_text = None
+        self.value_bool = None
+        self.values = None
+
+        if self.operator in RANGE_COMPARATORS or self.operator in EQUALITY_OPERATORS:
+            value = cond_dict['value']
+            # 带单位的比较值在编译时换算为字段的存储单位，评估时只剩 float 比较
+            self.threshold = condition_threshold(self.key, value)
+            self.value_text = str(value).strip()
+            self.value_bool = normalize_bool(value)
+            self.compare = RANGE_COMPARATORS.get(self.operator)
+        elif self.operator in ('⊇', '∈'):
+            self.values = tuple(str(v).strip() if self.operator == '∈' else v
+                                for v in cond_dict['values'])
+        else:
+            raise ValueError(f"Unsupported operator: {self.operator}")
+
+        self.test = self._build_test()
+
+    def __call__(self, row: Dict[str, Any]) -> bool:
+        return self.test(row)
+
+    def _build_test(self):
+        key = self.key
+        threshold = self.threshold
+        compare = self.compare
+        value_text = self.value_text
+        value_bool = self.value_bool
+
+        if self.channel_count:
+            return lambda row: channel_value_present(row.get(key))
+
+        if compare is not None:
+            if threshold is None:
+                return _never
+
+            def test(row):
+                value = row.get(key)
+                return isinstance(value, _NUMERIC_TYPES) and compare(float(value), threshold)
+            return test
+
+        if EQUALITY_OPERATORS.get(self.operator) == '=':
+            def test(row):
+                value = row.get(key)
+                if value is None:
+                    return False
+                # 优先级：布尔值比较 > 数值比较 > 字符串比较
+                if value_bool is not None:
+                    field_bool = normalize_bool(value)
+                    if field_bool is not None:
+                        return field_bool == value_bool
+                if threshold is not None and isinstance(value, _NUMERIC_TYPES):
+                    return abs(float(value) - threshold) < EQUALITY_TOLERANCE
+                return str(value).strip() == value_text
+            return test
+
+        if EQUALITY_OPERATORS.get(self.operator) == '≠':
+            def test(row):
+                value = row.get(key)
+                if value is None:
+                    return False
+                if threshold is not None and isinstance(value, _NUMERIC_TYPES):
+                    return abs(float(value) - threshold) >= EQUALITY_TOLERANCE
+                return str(value).strip() != value_text
+            return test
+
+        values = self.values
+        if self.operator == '⊇':
+            def test(row):
+                value = row.get(key)
+                if value is None:
+                    return False
+                items = split_field_items(value)
+                return all(any(req_val in item for item in items) for req_val in values)
+            return test
+
+        allowed = frozenset(values)
+
+        def test(row):
+            value = row.get(key)
+            return value is not None and str(value).strip() in allowed
+        return test
+
+    def evaluate_column(self, columnar: ColumnarCatalog) -> np.ndarray:
+        """对整列评估，返回每块板卡是否满足的布尔数组"""
+        column = columnar.column(self.key)
+        if column is None:
+            return columnar.empty_mask()
+
+        if self.channel_count:
+            return column.present.copy()
+
+        if self.compare is not None:
+            result = columnar.empty_mask()
+            if self.threshold is not None:
+                result[column.rows_in_range(self.compare, self.threshold)] = True
+            return result
+
+        equality = EQUALITY_OPERATORS.get(self.operator)
+        if equality == '=':
+            if self.value_bool is not None and column.bool_bitmaps is not None:
+                # 布尔列：直接取对应取值的位图
+                return column.bool_bitmaps[self.value_bool].copy()
+            result = column.texts == self.value_text
+            if self.threshold is not None:
+                result = np.where(column.number_mask,
+                                  np.abs(column.numbers - self.threshold) < EQUALITY_TOLERANCE, result)
+            if self.value_bool is not None:
+                result = np.where(column.bool_mask, column.bools == self.value_bool, result)
+            return result & column.notnull
+
+        if equality == '≠':
+            result = column.texts != self.value_text
+            if self.threshold is not None:
+                result = np.where(column.number_mask,
+                                  np.abs(column.numbers - self.threshold) >= EQUALITY_TOLERANCE, result)
+            return result & column.notnull
+
+        if self.operator == '⊇':
+            return column.contains_all(self.values)
+
+        return column.in_values(self.values)
+
+    def estimate_selectivity(self, columnar: ColumnarCatalog) -> float:
+        """根据列统计信息估算满足条件的板卡比例（0~1，不扫描数据）"""
+        column = columnar.column(self.key)
+        if column is None:
+            return 0.0
+        stats = column.stats
+
+        if self.channel_count:
+            return stats.present_fraction
+
+        if self.compare is not None:
+            if self.threshold is None:
+                return 0.0
+            return stats.range_selectivity(self.compare, self.threshold)
+
+        not_null = 1.0 - stats.null_fraction
+        equality = EQUALITY_OPERATORS.get(self.operator)
+        if equality is not None:
+            if self.value_bool is not None and column.bool_bitmaps is not None:
+                equal = stats.true_fraction if self.value_bool else stats.false_fraction
+            elif self.value_text in stats.value_counts:
+                equal = stats.value_counts[self.value_text] / stats.size
+            elif self.threshold is not None and stats.distinct_count:
+                # 数值的文本形式可能不同（如 16 与 16.0），按取值均匀分布估算
+                equal = not_null / stats.distinct_count
+            else:
+                equal = 0.0
+            return equal if equality == '=' else max(not_null - equal, 0.0)
+
+        if self.operator == '⊇':
+            # 各需求值相互独立：每个需求值命中的元素板卡数之和作为该值的比例
+            selectivity = not_null
+            for req_val in self.values:
+                hits = sum(count for item, count in stats.item_counts.items() if req_val in item)
+                selectivity *= min(hits / stats.size, not_null) / not_null if not_null else 0.0
+            return selectivity
+
+        counts = stats.value_counts
+        return min(sum(counts.get(value, 0) for value in set(self.values)) / stats.size, 1.0) if stats.size else 0.0
+
+    def matching_rows(self, columnar: ColumnarCatalog) -> np.ndarray:
+        """返回满足条件的升序行号数组（范围条件直接走数值范围索引的二分查找）"""
+        if self.compare is not None and not self.channel_count:
+            column = columnar.column(self.key)
+            if column is None or self.threshold is None:
+                return np.empty(0, dtype=np.intp)
+            return column.rows_in_range(self.compare, self.threshold)
+        return np.flatnonzero(self.evaluate_column(columnar))
+
+
+def selectivity_order(columnar: ColumnarCatalog, predicates: List[ConditionPredicate]) -> List[Tuple[int, float]]:
+    """按估算选择率从小到大排列条件，返回 [(条件下标, 估算选择率)]（估算相同时保持书写顺序）"""
+    estimates = [(i, predicate.estimate_selectivity(columnar)) for i, predicate in enumerate(predicates)]
+    return sorted(estimates, key=lambda item: item[1])
+
+
+def match_conjunction(columnar: ColumnarCatalog, predicates: List[ConditionPredicate]) -> np.ndarray:
+    """
+    求同时满足一个合取项中所有条件的升序行号数组
+    按估算选择率从小到大依次评估并求交，交集为空时立即结束，其余条件不再评估
+    """
+    if not predicates:
+        return np.arange(columnar.size)
+    rows = None
+    for i, _ in selectivity_order(columnar, predicates):
+        matched = predicates[i].matching_rows(columnar)
+        rows = matched if rows is None else np.intersect1d(rows, matched, assume_unique=True)
+        if not len(rows):
+            break
+    return rows
+
+
+def _never(row: Dict[str, Any]) -> bool:
+    return False
+
+
+class CompiledCondition:
+    """
+    编译后的单个条件
+    text 为原始条件字符串，condition 为 evaluate_condition 使用的条件字典（只读，不要修改）
+    """
+
+    __slots__ = ('text', 'condition', 'id', 'field', 'operator', 'predicate')
+
+    def __init__(self, text: str, condition: Dict[str, Any]):
+        self.text = text
+        self.condition = condition
+        self.id = condition['id']
+        self.field = condition['field']
+        self.operator = condition['operator']
+        self.predicate = ConditionPredicate(condition)
+
+    def __eq__(self, other):
+        return isinstance(other, CompiledCondition) and (self.text, self.id) == (other.text, other.id)
+
+    def __hash__(self):
+        return hash((self.text, self.id))
+
+    def __repr__(self):
+        return f"CompiledCondition({self.text!r})"
+
+
+class CompiledDNF:
+    """
+    编译后的 DNF 表达式
+        parts: 合取项元组，每个合取项为 CompiledCondition 元组（解析失败的条件已剔除，空合取项已剔除）
+        conditions: 解析成功的条件字符串（去重，保持出现顺序）
+        fields: 涉及的字段名
+        errors: 解析失败的条件 (条件字符串, 错误信息)
+    """
+
+    __slots__ = ('source', 'parts', 'conditions', 'fields', 'errors', '_key', '_simplification')
+
+    def __init__(self, source: str, parts: Tuple[Tuple[CompiledCondition, ...], ...],
+                 errors: Tuple[Tuple[str, str], ...] = ()):
+        self.source = source
+        self.parts = parts
+        self.errors = errors
+        self._simplification = None
+
+        self.conditions = tuple(dict.fromkeys(cond.text for part in parts for cond in part))
+        self.fields = frozenset(cond.field for part in parts for cond in part)
+        self._key = (tuple(tuple(cond.id for cond in part) for part in parts), errors)
+
+    def __bool__(self):
+        return bool(self.parts)
+
+    def __eq__(self, other):
+        return isinstance(other, CompiledDNF) and self._key == other._key
+
+    def __hash__(self):
+        return hash(self._key)
+
+    def __repr__(self):
+        return f"CompiledDNF({self.source!r})"
+
+    def iter_conditions(self):
+        """按出现顺序遍历所有条件（重复出现的条件会重复返回）"""
+        for part in self.parts:
+            yield from part
+
+    def condition_mapping(self) -> Dict[str, str]:
+        """条件字符串到条件 ID 的映射"""
+        return {cond.text: cond.id for cond in self.iter_conditions()}
+
+    def fingerprint(self) -> str:
+        """
+        规范化 DNF 的哈希：由各合取项的条件 ID（字段、操作符、取值）及解析错误派生，
+        与空白、括号、ASCII/Unicode 操作符写法等书写差异无关
+        """
+        return hashlib.sha1(repr(self._key).encode('utf-8')).hexdigest()
+
+    def simplify(self) -> 'DNFSimplification':
+        """化简结果（每个编译结果只化简一次）"""
+        if self._simplification is None:
+            self._simplification = simplify_dnf(self.parts)
+        return self._simplification
+
+
+# 超过该合取项数时不做合取项之间的蕴含检查（两两比较的开销随合取项数平方增长）
+DNF_SUBSUMPTION_LIMIT = int(os.getenv('DNF_SUBSUMPTION_LIMIT', '512'))
+
+_LOWER_BOUNDS = (ge, gt)
+
+
+class DNFSimplification:
+    """
+    DNF 化简结果，化简不改变表达式在逐行评估下的真值
+        parts: 化简后的合取项（同一字段的范围条件已合并，重复及等价条件已去除）
+        sources: 每个化简后合取项对应的原合取项下标
+        unsatisfiable: 不可满足而被剔除的合取项 [(原合取项下标, 原因)]
+        duplicates: 与前面的合取项相同而被剔除的原合取项下标
+        subsumed: 蕴含其他合取项（被更宽松的合取项覆盖）而被剔除的原合取项下标
+        dropped_conditions: 合并范围条件、去除重复条件时删掉的条件数
+    """
+
+    __slots__ = ('parts', 'sources', 'unsatisfiable', 'duplicates', 'subsumed', 'dropped_conditions')
+
+    def __init__(self, parts, sources, unsatisfiable, duplicates, subsumed, dropped_conditions):
+        self.parts = parts
+        self.sources = sources
+        self.unsatisfiable = unsatisfiable
+        self.duplicates = duplicates
+        self.subsumed = subsumed
+        self.dropped_conditions = dropped_conditions
+
+    @property
+    def is_unsatisfiable(self) -> bool:
+        """所有合取项都不可满足（整个需求不可能被任何板卡满足）"""
+        return bool(self.unsatisfiable) and not self.parts
+
+    def summary(self) -> Dict[str, Any]:
+        """化简统计（用于追踪和 explain 输出）"""
+        return {
+            'conjuncts_after': len(self.parts),
+            'unsatisfiable': [{'conjunct': index, 'reason': reason}
+                              for index, reason in self.unsatisfiable],
+            'duplicates': list(self.duplicates),
+            'subsumed': list(self.subsumed),
+            'dropped_conditions': self.dropped_conditions
+        }
+
+
+def _tighter(a: CompiledCondition, b: CompiledCondition) -> bool:
+    """同方向的两个范围条件中 a 是否比 b 更严格（或相同）"""
+    pa, pb = a.predicate, b.predicate
+    if pa.threshold != pb.threshold:
+        return pa.threshold > pb.threshold if pa.compare in _LOWER_BOUNDS else pa.threshold < pb.threshold
+    return pa.compare in (gt, lt) or pb.compare in (ge, le)
+
+
+def _numeric_equality(cond: CompiledCondition) -> bool:
+    """取值为数值（非布尔）的 '=' 条件：满足时字段值只能是该数值（或同样文本）"""
+    predicate = cond.predicate
+    return (EQUALITY_OPERATORS.get(predicate.operator) == '=' and
+            predicate.threshold is not None and predicate.value_bool is None)
+
+
+def _simplify_conjunct(part: Tuple[CompiledCondition, ...]) -> Tuple[Tuple[CompiledCondition, ...], Optional[str]]:
+    """
+    化简单个合取项：去除重复条件，同一字段的下界/上界各只保留最严格的一个，
+    通道数字段（只检查非零，与操作符无关）只保留一个条件
+    返回: (化简后的条件元组, 不可满足的原因；可满足时为None)
+    """
+    kept = {}  # (字段, 类别) -> 条件；保持首次出现的位置
+    for cond in part:
+        predicate = cond.predicate
+        if predicate.channel_count:
+            slot = (predicate.key, 'channel')
+        elif predicate.compare is not None:
+            if predicate.threshold is None:
+                return part, f"{cond.text}: 比较值不是数值"
+            slot = (predicate.key, 'lower' if predicate.compare in _LOWER_BOUNDS else 'upper')
+        else:
+            slot = (predicate.key, cond.id)
+        current = kept.get(slot)
+        if current is None:
+            kept[slot] = cond
+        elif slot[1] in ('lower', 'upper') and not _tighter(current, cond):
+            kept[slot] = cond
+
+    conditions = tuple(dict.fromkeys(kept.values()))
+    by_key: Dict[str, List[CompiledCondition]] = {}
+    for cond in conditions:
+        by_key.setdefault(cond.predicate.key, []).append(cond)
+
+    # 矛盾检查（只比较同一字段的条件）：下界高于上界、数值相等条件超出范围或互相冲突、= 与 ≠ 同值
+    for key, group in by_key.items():
+        if len(group) < 2:
+            continue
+        lower, upper = kept.get((key, 'lower')), kept.get((key, 'upper'))
+        if lower is not None and upper is not None:
+            lo, up = lower.predicate.threshold, upper.predicate.threshold
+            if lo > up or (lo == up and (lower.predicate.compare is gt or upper.predicate.compare is lt)):
+                return conditions, f"{lower.text} 与 {upper.text} 矛盾"
+        for cond in group:
+            if _numeric_equality(cond):
+                value = cond.predicate.threshold
+                if lower is not None and value + EQUALITY_TOLERANCE < lower.predicate.threshold:
+                    return conditions, f"{cond.text} 与 {lower.text} 矛盾"
+                if upper is not None and value - EQUALITY_TOLERANCE > upper.predicate.threshold:
+                    return conditions, f"{cond.text} 与 {upper.text} 矛盾"
+                for other in group:
+                    if (other is not cond and _numeric_equality(other) and
+                            other.predicate.value_text != cond.predicate.value_text and
+                            abs(other.predicate.threshold - value) >= 2 * EQUALITY_TOLERANCE):
+                        return conditions, f"{cond.text} 与 {other.text} 矛盾"
+            if EQUALITY_OPERATORS.get(cond.operator) == '=' and cond.predicate.value_bool is None:
+                for other in group:
+                    if (EQUALITY_OPERATORS.get(other.operator) == '≠' and
+                            other.predicate.value_text == cond.predicate.value_text and
+                            other.predicate.threshold == cond.predicate.threshold):
+                        return conditions, f"{cond.text} 与 {other.text} 矛盾"
+
+    return conditions, None
+
+
+def _implies(conditions: Tuple[CompiledCondition, ...], target: CompiledCondition) -> bool:
+    """合取项 conditions（已化简）是否蕴含条件 target"""
+    predicate = target.predicate
+    for cond in conditions:
+        if cond.id == target.id:
+            return True
+        other = cond.predicate
+        if other.key != predicate.key:
+            continue
+        if predicate.channel_count:
+            if other.channel_count:
+                return True
+        elif (predicate.compare is not None and other.compare is not None and
+              (predicate.compare in _LOWER_BOUNDS) == (other.compare in _LOWER_BOUNDS) and
+              _tighter(cond, target)):
+            return True
+    return False
+
+
+def simplify_dnf(parts: Tuple[Tuple[CompiledCondition, ...], ...]) -> DNFSimplification:
+    """
+    化简 DNF：
+        1. 每个合取项内合并同一字段的范围条件、去除重复条件，发现矛盾则剔除该合取项
+        2. 剔除与前面相同的合取项
+        3. 剔除蕴含其他合取项的合取项（A ∨ (A ∧ B) = A），合取项数不超过 DNF_SUBSUMPTION_LIMIT 时进行
+    """
+    simplified = []
+    unsatisfiable = []
+    duplicates = []
+    dropped = 0
+    seen = set()
+    for index, part in enumerate(parts):
+        conditions, reason = _simplify_conjunct(part)
+        if reason is not None:
+            unsatisfiable.append((index, reason))
+            continue
+        dropped += len(part) - len(conditions)
+        key = frozenset(cond.id for cond in conditions)
+        if key in seen:
+            duplicates.append(index)
+            continue
+        seen.add(key)
+        simplified.append((index, conditions))
+
+    subsumed = set()
+    if len(simplified) <= DNF_SUBSUMPTION_LIMIT:
+        # 化简后每个条件最多对应另一合取项中的一个条件，蕴含方的条件数不少于被蕴含方，
+        # 按条件数从少到多检查，只与已保留的（更宽松的）合取项比较
+        weaker = []
+        for index, conditions in sorted(simplified, key=lambda item: len(item[1])):
+            if any(all(_implies(conditions, target) for target in other) for other in weaker):
+                subsumed.add(index)
+            else:
+                weaker.append(conditions)
+
+    kept = [(index, conditions) for index, conditions in simplified if index not in subsumed]
+    return DNFSimplification(
+        parts=tuple(conditions for _, conditions in kept),
+        sources=tuple(index for index, _ in kept),
+        unsatisfiable=tuple(unsatisfiable),
+        duplicates=tuple(duplicates),
+        subsumed=tuple(sorted(subsumed)),
+        dropped_conditions=dropped)
+
+
+@lru_cache(maxsize=DNF_CACHE_SIZE)
+def compile_dnf(dnf_str: Optional[str]) -> CompiledDNF:
+    """
+    编译 DNF 表达式（结果按 DNF 字符串缓存）
+    空表达式返回空的 CompiledDNF；解析失败的条件记录在 errors 中
+    """
+    if not dnf_str or not dnf_str.strip():
+        return CompiledDNF(dnf_str or '', ())
+
+    try:
+        conjuncts = to_dnf(parse_expression(dnf_str))
+    except ValueError as e:
+        return CompiledDNF(dnf_str, (), ((dnf_str.strip(), str(e)),))
+
+    # 展开时同一个叶子可能出现在多个合取项中，每个叶子只编译一次、只报告一次错误
+    compiled_leaves = {}
+    parts = []
+    errors = []
+    for conj in conjuncts:
+        compiled_part = []
+        for leaf in conj:
+            if id(leaf) not in compiled_leaves:
+                if leaf.error is None:
+                    compiled_leaves[id(leaf)] = CompiledCondition(leaf.text, leaf.condition)
+                else:
+                    compiled_leaves[id(leaf)] = None
+                    errors.append((leaf.text, leaf.error))
+            if compiled_leaves[id(leaf)] is not None:
+                compiled_part.append(compiled_leaves[id(leaf)])
+        if compiled_part:
+            parts.append(tuple(compiled_part))
+
+    return CompiledDNF(dnf_str, tuple(parts), tuple(errors))
+
+
+def _random_expression(rng, depth: int, leaves: List[str]) -> Tuple[str, Any]:
+    """生成随机表达式：返回 (表达式字符串, 用于直接求值的嵌套元组)"""
+    if depth == 0 or rng.random() < 0.3:
+        index = rng.randrange(8)
+        op = rng.choice(['≥', '>=', '<', '≠', '!=', '='])
+        text = rng.choice([f"f{index} {op} {index}", f"f{index}{op}{index}",
+                           f"f{index} ⊇ {{\"v{index}\", 'w,{index}'}}", f"f{index} = \"a or b\""])
+        leaves.append(text)
+        return text, len(leaves) - 1
+    operator = rng.choice(['∧', '∨'])
+    children = [_random_expression(rng, depth - 1, leaves) for _ in range(rng.randint(2, 3))]
+    joiner = rng.choice({'∧': [' ∧ ', ' and ', ' AND ', '&&', '∧'],
+                         '∨': [' ∨ ', ' or ', ' OR ', '||', '∨']}[operator])
+    parts = []
+    for child_text, child_tree in children:
+        # ∧ 下的 ∨ 子表达式必须加括号，其余情况随机加括号
+        needs_parens = operator == '∧' and isinstance(child_tree, tuple) and child_tree[0] == '∨'
+        parts.append(f"({child_text})" if needs_parens or rng.random() < 0.5 else child_text)
+    text = joiner.join(parts)
+    return text, (operator, [tree for _, tree in children])
+
+
+def _evaluate_tree(tree: Any, truth: List[bool]) -> bool:
+    if isinstance(tree, int):
+        return truth[tree]
+    operator, children = tree
+    if operator == '∧':
+        return all(_evaluate_tree(child, truth) for child in children)
+    return any(_evaluate_tree(child, truth) for child in children)
+
+
+def fuzz(iterations: int = 2000, seed: int = 0) -> None:
+    """
+    模糊测试：
+        1. 随机生成嵌套表达式，检查展开后的 DNF 与原表达式在随机真值赋值下等价
+        2. 随机拼接操作符、括号、引号、花括号，检查 compile_dnf 不会抛出异常
+        3. 检查化简前后的 DNF 在随机板卡上真值一致，且被判为不可满足的合取项确实没有板卡满足
+    """
+    import random
+    rng = random.Random(seed)
+
+    for _ in range(iterations):
+        leaves = []
+        text, tree = _random_expression(rng, 3, leaves)
+        try:
+            conjuncts = parse_logical_expression(text)
+        except ValueError:
+            continue
+        for _ in range(16):
+            # 文本相同的叶子取相同真值
+            value_of = {leaf_text: rng.random() < 0.5 for leaf_text in leaves}
+            expected = _evaluate_tree(tree, [value_of[leaf_text] for leaf_text in leaves])
+            actual = any(all(value_of[cond] for cond in conj) for conj in conjuncts)
+            assert expected == actual, f"DNF mismatch: {text}"
+
+    alphabet = ['a', 'b=1', ' ', '(', ')', '（', '）', '∧', '∨', ' and ', ' or ', '&&', '||',
+                '≥', '>=', '=', '!', '⊇', '∈', '{', '}', '"', "'", ',', '1.5', '差分', '\n']
+    for _ in range(iterations):
+        text = ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 60)))
+        compile_dnf.__wrapped__(text)
+
+    values = [None, 0, 1, 2, 8, 16, 16.0, True, 'a', '1', ' 2 ', 'v1,w,1']
+    boards = [{f"f{i}": rng.choice(values) for i in range(8)} for _ in range(200)]
+    for _ in range(iterations):
+        text = _random_expression(rng, 3, [])[0]
+        compiled = compile_dnf.__wrapped__(text)
+        simplification = compiled.simplify()
+        for board in boards:
+            expected = any(all(cond.predicate(board) for cond in part) for part in compiled.parts)
+            actual = any(all(cond.predicate(board) for cond in part) for part in simplification.parts)
+            assert expected == actual, f"simplification mismatch: {text}"
+        for index, reason in simplification.unsatisfiable:
+            assert not any(all(cond.predicate(board) for cond in compiled.parts[index]) for board in boards), \
+                f"unsound unsatisfiable conjunct: {text} ({reason})"
+
+    print(f"fuzz: {iterations} 个嵌套表达式 + {iterations} 个随机串 + {iterations} 个化简用例通过")
+
+
+def benchmark(max_growth: float = 3.0) -> None:
+    """基准测试：病态表达式的解析耗时应随长度线性增长，单字符耗时增长超过 max_growth 倍视为超线性并报错"""
+    import time
+
+    cases = {
+        '长合取': lambda n: ' ∧ '.join(f"(f{i} ≥ {i})" for i in range(n)),
+        '长析取': lambda n: ' or '.join(f"f{i} ⊇ {{\"RS-232\", \"RS-422\"}}" for i in range(n)),
+        '深层嵌套括号': lambda n: '(' * n + 'f ≥ 1' + ')' * n,
+        '未闭合括号': lambda n: '(' * n + 'f ≥ 1',
+        '右嵌套合取': lambda n: ''.join(f"(f{i} ≥ 1 ∧ " for i in range(n)) + 'g ≥ 1' + ')' * n,
+        '右嵌套析取': lambda n: ''.join(f"(f{i} ≥ 1 ∨ " for i in range(n)) + 'g ≥ 1' + ')' * n,
+    }
+    for name, build in cases.items():
+        timings = []
+        per_char = []
+        for n in (1000, 4000, 16000, 64000):
+            text = build(n)
+            start = time.perf_counter()
+            parse_expression(text)
+            elapsed = time.perf_counter() - start
+            per_char.append(elapsed / len(text))
+            timings.append(f"n={n}: {elapsed * 1000:.1f}ms ({per_char[-1] * 1e9:.0f}ns/字符)")
+        print(f"{name}: " + ', '.join(timings))
+        assert per_char[-1] <= per_char[0] * max_growth, f"{name}: 解析耗时超线性增长"
+
+
+if __name__ == '__main__':
+    import sys
+    if '--bench' in sys.argv:
+        benchmark()
+    else:
+        fuzz()
+        benchmark()
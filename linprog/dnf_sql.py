@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+将解析后的 DNF 条件编译为参数化 SQL WHERE 子句，把板卡过滤下推到 PostgreSQL
+
+生成的 SQL 只用于预筛选：每个条件编译出的 SQL 谓词都是 Python 端
+evaluate_condition 语义的超集，数据库返回的候选行仍由 Python 端做精确评估
+"""
+
+from typing import List, Dict, Any, Tuple, Iterable, Optional
+from psycopg2 import sql
+from board_catalog import CATALOG_TABLE, CatalogSchema, condition_threshold, normalize_bool
+
+# 数值类型列
+NUMERIC_DATA_TYPES = {'smallint', 'integer', 'bigint', 'numeric', 'real', 'double precision'}
+
+# 文本类型列
+TEXT_DATA_TYPES = {'character varying', 'character', 'text', 'USER-DEFINED'}
+
+# 浮点相等比较的容差（与 evaluate_condition 一致）
+EQUALITY_TOLERANCE = 1e-9
+
+# 板卡结果中始终需要的基础列
+BASE_COLUMNS = ['id', 'model', 'price_cny', 'brief_description', 'detailed_description']
+
+_TRUE = sql.SQL('TRUE')
+_FALSE = sql.SQL('FALSE')
+
+
+def compile_condition_sql(cond_dict: Dict[str, Any], schema: CatalogSchema,
+                          channel_count_fields: Iterable[str]) -> Tuple[sql.Composable, List[Any]]:
+    """
+    将单个条件编译为 SQL 谓词
+
+    Returns:
+        (SQL 片段, 参数列表)
+    """
+    field = cond_dict['field']
+    operator = cond_dict['operator']
+
+    # 不存在的列：Python 端评估恒为 False
+    if not schema.has_column(field):
+        return _FALSE, []
+
+    col = sql.Identifier(field)
+    data_type = schema.data_type(field)
+    is_numeric = data_type in NUMERIC_DATA_TYPES
+    is_boolean = data_type == 'boolean'
+    not_null = sql.SQL('{} IS NOT NULL').format(col)
+
+    # 通道数字段：只检查非空、有值且不为0
+    if field in channel_count_fields:
+        if is_numeric:
+            return sql.SQL('({} IS NOT NULL AND {} <> 0)').format(col, col), []
+        return not_null, []
+
+    if operator in ['≥', '>=', '≤', '<=', '>', '<']:
+        value_float = condition_threshold(field, cond_dict.get('value'))
+        if value_float is None or not (is_numeric or is_boolean):
+            return _FALSE, []
+        sql_operator = {'≥': '>=', '>=': '>=', '≤': '<=', '<=': '<=', '>': '>', '<': '<'}[operator]
+        target = sql.SQL('{}::int').format(col) if is_boolean else col
+        return sql.SQL('{} {} %s').format(target, sql.SQL(sql_operator)), [value_float]
+
+    elif operator == '=':
+        value = cond_dict.get('value')
+        value_bool = normalize_bool(value)
+        value_float = condition_threshold(field, value)
+        if is_boolean:
+            if value_bool is not None:
+                return sql.SQL('{} = %s').format(col), [value_bool]
+            if value_float is not None:
+                return sql.SQL('{}::int = %s').format(col), [value_float]
+            return not_null, []
+        if is_numeric:
+            if value_float is not None:
+                return sql.SQL('abs({} - %s) < %s').format(col), [value_float, EQUALITY_TOLERANCE]
+            return sql.SQL('{}::text = %s').format(col), [str(value).strip()]
+        if data_type in TEXT_DATA_TYPES and value_bool is None:
+            return sql.SQL('btrim({}::text) = %s').format(col), [str(value).strip()]
+        # 文本列的布尔值比较、数组列等情况交给 Python 端判断
+        return not_null, []
+
+    elif operator in ['≠', '!=']:
+        value = cond_dict.get('value')
+        value_float = condition_threshold(field, value)
+        if is_numeric and value_float is not None:
+            return sql.SQL('abs({} - %s) >= %s').format(col), [value_float, EQUALITY_TOLERANCE]
+        if is_boolean and value_float is not None:
+            return sql.SQL('{}::int <> %s').format(col), [value_float]
+        if data_type in TEXT_DATA_TYPES:
+            return sql.SQL('btrim({}::text) <> %s').format(col), [str(value).strip()]
+        return not_null, []
+
+    elif operator == '⊇':
+        required_values = [str(v) for v in cond_dict.get('values', [])]
+        enum_type = schema.array_enum_type(field)
+        if enum_type is not None:
+            # 枚举数组列：每个需求值对应所有包含它的枚举取值，
+            # 只有一个取值时用数组包含（@>），否则用数组相交（&&）
+            labels = schema.enum_labels[enum_type]
+            exact = []
+            parts = []
+            params = []
+            for req_val in required_values:
+                candidates = [label for label in labels if req_val in label or label == req_val]
+                if not candidates:
+                    return _FALSE, []
+                if candidates == [req_val]:
+                    exact.append(req_val)
+                else:
+                    parts.append(sql.SQL('{} && %s::{}[]').format(col, sql.Identifier(enum_type)))
+                    params.append(candidates)
+            if exact:
+                parts.insert(0, sql.SQL('{} @> %s::{}[]').format(col, sql.Identifier(enum_type)))
+                params.insert(0, exact)
+            if not parts:
+                return not_null, []
+            return sql.SQL('({})').format(sql.SQL(' AND ').join(parts)), params
+        if is_boolean:
+            return not_null, []
+        # 其他列：每个需求值都必须是字段文本的子串
+        parts = [sql.SQL('position(%s in {}::text) > 0').format(col) for _ in required_values]
+        if not parts:
+            return not_null, []
+        return sql.SQL('({})').format(sql.SQL(' AND ').join(parts)), list(required_values)
+
+    elif operator == '∈':
+        allowed_values = [str(v).strip() for v in cond_dict.get('values', [])]
+        if is_boolean:
+            return not_null, []
+        return sql.SQL('btrim({}::text) = ANY(%s)').format(col), [allowed_values]
+
+    raise ValueError(f"Unsupported operator: {operator}")
+
+
+def compile_dnf_sql(parsed_dnf: List[List[Dict[str, Any]]], schema: CatalogSchema,
+                    channel_count_fields: Iterable[str]) -> Tuple[sql.Composable, List[Any]]:
+    """
+    将 DNF（合取项列表，每个合取项为条件字典列表）编译为 WHERE 子句
+
+    Returns:
+        (SQL 片段, 参数列表)；无法编译的条件退化为 TRUE（交给 Python 端判断）
+    """
+    channel_count_fields = set(channel_count_fields)
+    disjuncts = []
+    params: List[Any] = []
+    for part in parsed_dnf:
+        conjuncts = []
+        for cond_dict in part:
+            try:
+                clause, clause_params = compile_condition_sql(cond_dict, schema, channel_count_fields)
+            except Exception:
+                clause, clause_params = _TRUE, []
+            conjuncts.append(clause)
+            params.extend(clause_params)
+        if conjuncts:
+            disjuncts.append(sql.SQL('({})').format(sql.SQL(' AND ').join(conjuncts)))
+
+    if not disjuncts:
+        return _FALSE, []
+    return sql.SQL(' OR ').join(disjuncts), params
+
+
+def compile_non_null_sql(fields: Iterable[str], schema: CatalogSchema) -> sql.Composable:
+    """编译"任一字段非空"条件"""
+    clauses = [sql.SQL('{} IS NOT NULL').format(sql.Identifier(field))
+               for field in sorted(set(fields)) if schema.has_column(field)]
+    if not clauses:
+        return _FALSE
+    return sql.SQL(' OR ').join(clauses)
+
+
+def required_columns(fields: Iterable[str], schema: CatalogSchema,
+                     extra_columns: Optional[Iterable[str]] = None) -> List[str]:
+    """查询需要返回的列：基础列 + 条件涉及的字段 + 额外列，按表结构顺序排列"""
+    wanted = set(BASE_COLUMNS)
+    wanted.update(fields)
+    if extra_columns:
+        wanted.update(extra_columns)
+    return [col for col in schema.columns if col in wanted]
+
+
+def build_candidate_query(columns: List[str], where: sql.Composable) -> sql.Composable:
+    """构建候选板卡查询语句"""
+    return sql.SQL('SELECT {} FROM {} WHERE {} ORDER BY id').format(
+        sql.SQL(', ').join(sql.Identifier(col) for col in columns),
+        sql.Identifier(CATALOG_TABLE),
+        where)
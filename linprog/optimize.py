@@ -1,8 +1,18 @@
+import hashlib
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
 import numpy as np
 from scipy.optimize import linprog
 import json
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Optional, Tuple
 from process_dnf import CHANNEL_COUNT_FIELDS
+from board_catalog import get_catalog_version
+from result_cache import LRUCache
 
 # 通道类型：直接使用 process_dnf.py 中的 CHANNEL_COUNT_FIELDS（39个字段）
 CHANNEL_TYPES = CHANNEL_COUNT_FIELDS
@@ -10,20 +20,197 @@ CHANNEL_TYPES = CHANNEL_COUNT_FIELDS
 # 通道类型数量（39个）
 CHANNEL_COUNT = len(CHANNEL_COUNT_FIELDS)
 
+# 优化结果缓存容量（字节，估算值），可通过环境变量配置，为 0 时不缓存
+OPTIMIZE_CACHE_BYTES = int(os.getenv('OPTIMIZE_CACHE_BYTES', str(16 * 1024 * 1024)))
 
-def optimize_card_selection_core(
+# 优化结果缓存：(缩减模型哈希, 目录版本) -> 缩减模型的最优解，目录版本变化时整体失效
+optimize_cache = LRUCache(OPTIMIZE_CACHE_BYTES)
+
+# 整数规划求解的默认时间上限（秒）和相对 MIP 间隙，可通过环境变量配置，请求中可单独指定
+OPTIMIZE_TIME_LIMIT_SECONDS = float(os.getenv('OPTIMIZE_TIME_LIMIT_SECONDS', '30'))
+OPTIMIZE_MIP_REL_GAP = float(os.getenv('OPTIMIZE_MIP_REL_GAP', '0.0001'))
+
+# 两阶段模式的后台精确求解线程数及最多保留的任务数，可通过环境变量配置
+OPTIMIZE_JOB_WORKERS = int(os.getenv('OPTIMIZE_JOB_WORKERS', '2'))
+OPTIMIZE_JOB_LIMIT = int(os.getenv('OPTIMIZE_JOB_LIMIT', '256'))
+
+
+def presolve_dominance(
+    A: np.ndarray,
+    prices: np.ndarray,
+    b_requirements: np.ndarray
+) -> Tuple[List[int], Dict[int, List[int]]]:
+    """
+    求解前的支配剔除：只看有需求的通道类型，
+        - 通道数完全相同的板卡只保留最便宜的一个（价格相同时保留靠前的）
+        - 板卡 j 被 k 支配：k 每种需求通道数都不少于 j 且价格不高于 j，
+          用 k 替换方案中的每一块 j 仍然可行且成本不增加，因此剔除 j 不影响最优成本
+    被支配关系不成环（通道数相同的已先合并），每个被剔除的板卡都有一个保留下来的支配者
+
+    Returns:
+        (保留的板卡下标列表（升序）, 别名表：保留的板卡下标 -> 由它代替的被剔除板卡下标列表)
+    """
+    n_cards = len(prices)
+    R = A[:, b_requirements > 0]
+
+    # 1. 通道数完全相同的板卡合并为最便宜的代表
+    representative = {}
+    aliases: Dict[int, List[int]] = {}
+    for i in range(n_cards):
+        key = R[i].tobytes()
+        rep = representative.get(key)
+        if rep is None:
+            representative[key] = i
+            aliases[i] = []
+        elif prices[i] < prices[rep]:
+            representative[key] = i
+            aliases[i] = aliases.pop(rep) + [rep]
+        else:
+            aliases[rep].append(i)
+    candidates = sorted(representative.values())
+
+    # 2. 代表之间的支配关系：covers[k, j] 表示 k 的每种需求通道数都不少于 j
+    Rc = R[candidates]
+    pc = prices[candidates]
+    covers = (Rc[:, None, :] >= Rc[None, :, :]).all(axis=2) & (pc[:, None] <= pc[None, :])
+    np.fill_diagonal(covers, False)
+    dominated = covers.any(axis=0)
+
+    kept = [i for i, d in zip(candidates, dominated) if not d]
+    for j in np.flatnonzero(dominated):
+        # 被支配的板卡归到一个未被支配的支配者名下（支配关系可传递，这样的支配者一定存在）
+        k = next(k for k in np.flatnonzero(covers[:, j]) if not dominated[k])
+        aliases[candidates[k]].extend([candidates[j]] + aliases.pop(candidates[j]))
+    return kept, {i: sorted(aliases[i]) for i in kept if aliases[i]}
+
+
+class ReducedModel:
+    """
+    缩减后的整数规划模型：只保留有需求的通道类型（行），以及在这些通道上有贡献、未被支配的板卡（列）
+        rows: 保留的通道类型下标（对应 CHANNEL_TYPES）
+        cards: 保留的板卡下标（对应完整板卡列表）
+        aliases: 保留的板卡下标 -> 由它代替的被剔除板卡下标列表（见 presolve_dominance）
+        A: 缩减后的资源矩阵，shape: (len(cards), len(rows))
+        c: 保留板卡的价格
+        b: 保留通道类型的需求量
+        dropped_cards: 在有需求的通道上没有任何贡献的板卡数
+    """
+
+    __slots__ = ('rows', 'cards', 'aliases', 'A', 'c', 'b', 'n_cards', 'dropped_cards')
+
+    def __init__(self, A: np.ndarray, prices: np.ndarray, b_requirements: np.ndarray):
+        self.n_cards = len(prices)
+        self.rows = np.flatnonzero(b_requirements > 0)
+        contributing = np.flatnonzero(A[:, self.rows].any(axis=1))
+        self.dropped_cards = self.n_cards - len(contributing)
+
+        kept, aliases = presolve_dominance(
+            A[np.ix_(contributing, self.rows)], prices[contributing], b_requirements[self.rows])
+        self.cards = contributing[kept]
+        self.aliases = {int(contributing[i]): [int(contributing[j]) for j in removed]
+                        for i, removed in aliases.items()}
+        self.A = A[np.ix_(self.cards, self.rows)]
+        self.c = prices[self.cards]
+        self.b = b_requirements[self.rows]
+
+    def is_infeasible(self) -> bool:
+        """是否有某种需求通道没有任何保留板卡提供（此时整数规划必然无解）"""
+        return bool(len(self.rows)) and not self.A.any(axis=0).all()
+
+    def expand(self, x: np.ndarray) -> np.ndarray:
+        """将缩减模型的解映射回完整板卡列表（取整到最近的整数，未保留的板卡数量为0）"""
+        full = np.zeros(self.n_cards)
+        full[self.cards] = np.rint(x)
+        return full
+
+    def round_up(self, x: np.ndarray) -> np.ndarray:
+        """
+        将线性松弛的解修复为整数可行解（缩减模型下标）：
+            1. 向上取整（容忍数值误差）
+            2. 仍有不足时，逐块加入单位有效通道价格最低的板卡
+            3. 按价格从高到低逐个减少板卡数量，只要仍满足全部需求
+        """
+        x = np.maximum(np.ceil(x - 1e-6), 0)
+        covered = self.A.T @ x
+        while (covered < self.b).any():
+            deficit = np.maximum(self.b - covered, 0)
+            useful = np.minimum(self.A, deficit).sum(axis=1)
+            ratio = np.where(useful > 0, self.c / np.maximum(useful, 1e-12), np.inf)
+            k = int(np.argmin(ratio))
+            x[k] += 1
+            covered += self.A[k]
+        for k in np.argsort(-self.c, kind='stable'):
+            if x[k] == 0:
+                continue
+            used = self.A[k] > 0
+            # 板卡 k 最多能减少的数量：每种通道的富余量除以单块通道数
+            removable = np.floor((covered[used] - self.b[used]) / self.A[k][used]).min()
+            removable = min(x[k], removable)
+            if removable > 0:
+                x[k] -= removable
+                covered -= removable * self.A[k]
+        return x
+
+    def fingerprint(self) -> str:
+        """缩减模型的规范化哈希（资源矩阵、价格、需求量），与板卡 id 及剔除掉的板卡无关"""
+        digest = hashlib.sha1()
+        for array in (self.A, self.c, self.b):
+            array = np.ascontiguousarray(array, dtype=np.float64)
+            digest.update(repr(array.shape).encode())
+            digest.update(array.tobytes())
+        return digest.hexdigest()
+
+    def summary(self, card_ids: List[str]) -> Dict[str, Any]:
+        """缩减统计（用于响应中的 presolve 字段）"""
+        return {
+            "cards_before": self.n_cards,
+            "cards_after": len(self.cards),
+            "cards_without_contribution": self.dropped_cards,
+            "channel_types_before": CHANNEL_COUNT,
+            "channel_types_after": len(self.rows),
+            "aliases": {card_ids[i]: [card_ids[j] for j in removed] for i, removed in self.aliases.items()}
+        }
+
+
+def solver_value(value: Any) -> Optional[float]:
+    """HiGHS 返回的间隙/下界转换为 float（缺失或非有限值时为None）"""
+    if value is None or not np.isfinite(value):
+        return None
+    return float(value)
+
+
+def resolve_solver_options(time_limit: Optional[float], mip_rel_gap: Optional[float]) -> Tuple[float, float]:
+    """求解时间上限和相对 MIP 间隙：为None时使用环境变量配置的默认值，并校验取值范围"""
+    if time_limit is None:
+        time_limit = OPTIMIZE_TIME_LIMIT_SECONDS
+    if mip_rel_gap is None:
+        mip_rel_gap = OPTIMIZE_MIP_REL_GAP
+    if time_limit <= 0:
+        raise ValueError(f"time_limit 必须大于 0，当前为 {time_limit}")
+    if mip_rel_gap < 0:
+        raise ValueError(f"mip_rel_gap 不能小于 0，当前为 {mip_rel_gap}")
+    return time_limit, mip_rel_gap
+
+
+class OptimizationProblem:
+    """
+    一次优化请求：校验并转换后的板卡数据、需求以及缩减模型（两阶段模式下两个阶段共用同一个实例）
+    """
+
+    __slots__ = ('card_ids', 'models', 'prices', 'originals', 'A', 'b_requirements',
+                 'requirements_summary', 'model', 'presolve')
+
+
+def prepare_optimization(
     linprog_input_data: List[Dict[str, Any]],
     linprog_requiremnets: List[int]
-) -> Dict[str, Any]:
+) -> OptimizationProblem:
     """
-    板卡选型优化核心逻辑
-    
+    校验输入、构建资源矩阵和需求摘要，并生成缩减模型
+
     Args:
         linprog_input_data: process_dnf输出的板卡数据数组（包含id, matrix_channel_count, model, price_cny, original）
         linprog_requiremnets: process_dnf输出的需求数组（CHANNEL_COUNT个元素）
-    
-    Returns:
-        包含优化结果的字典，格式与 OptimizationResponse 对应
     """
     # 1. 数据验证
     if len(linprog_requiremnets) != CHANNEL_COUNT:
@@ -102,52 +289,83 @@ def optimize_card_selection_core(
                 "required": req
             })
 
-    # 6. 线性规划求解（板卡数量无限，无需可行性检查）
-    c = prices
-    A_ub = -A.T
-    b_ub = -b_requirements
-    bounds = [(0, None)] * n_cards
+    # 6. 模型缩减：只保留有需求的通道类型，以及在这些通道上有贡献、未被支配的板卡
+    model = ReducedModel(A, prices, b_requirements)
 
-    result = linprog(
-        c=c,
-        A_ub=A_ub,
-        b_ub=b_ub,
-        bounds=bounds,
-        method='highs',
-        integrality=[1] * n_cards
-    )
+    problem = OptimizationProblem()
+    problem.card_ids = card_ids
+    problem.models = models
+    problem.prices = prices
+    problem.originals = originals
+    problem.A = A
+    problem.b_requirements = b_requirements
+    problem.requirements_summary = requirements_summary
+    problem.model = model
+    problem.presolve = model.summary(card_ids)
+    return problem
 
-    if not result.success:
-        return {
-            "success": False,
-            "message": f"优化求解失败: {result.message}",
-            "total_cards": n_cards,
-            "requirements_summary": requirements_summary,
-            "optimized_solution": None,
-            "total_cost": None,
-            "channel_satisfaction": None
-        }
 
-    # 9. 构建优化方案
+def new_solver_info(time_limit: float, mip_rel_gap: float) -> Dict[str, Any]:
+    """
+    求解状态 solver.status: optimal（在 mip_rel_gap 内最优）、time_limit（达到时间上限，返回当前最优可行解）、
+    relaxation（两阶段模式的快速方案，线性松弛取整）或 failed
+    """
+    return {
+        "status": "optimal",
+        "time_limit": time_limit,
+        "mip_rel_gap": mip_rel_gap,
+        "mip_gap": 0.0,
+        "mip_dual_bound": 0.0
+    }
+
+
+def optimization_failure(problem: OptimizationProblem, solver: Dict[str, Any], reason: str,
+                         status: str = "failed") -> Dict[str, Any]:
+    """求解失败的结果"""
+    solver["status"] = status
+    return {
+        "success": False,
+        "message": f"优化求解失败: {reason}",
+        "total_cards": len(problem.card_ids),
+        "requirements_summary": problem.requirements_summary,
+        "optimized_solution": None,
+        "total_cost": None,
+        "channel_satisfaction": None,
+        "presolve": problem.presolve,
+        "from_cache": False,
+        "solver": solver
+    }
+
+
+def optimization_result(problem: OptimizationProblem, x_reduced: np.ndarray, solver: Dict[str, Any],
+                        from_cache: bool = False) -> Dict[str, Any]:
+    """由缩减模型的解构建优化结果（采购方案、总成本、通道满足情况）"""
+    prices = problem.prices
+    b_requirements = problem.b_requirements
+
+    # 映射回完整板卡列表（被剔除的板卡数量为0），通道满足情况按全部 39 种通道类型重新计算
+    x = problem.model.expand(x_reduced)
+
+    # 构建优化方案
     optimized_solution = []
     total_cost = 0
 
-    for i, quantity in enumerate(result.x):
+    for i, quantity in enumerate(x):
         if quantity > 0.01:
             qty = int(quantity)
             cost = qty * prices[i]
             optimized_solution.append({
-                "model": models[i],
+                "model": problem.models[i],
                 "quantity": qty,
                 "unit_price": int(prices[i]),
                 "total_price": int(cost),
-                "id": card_ids[i],
-                "original": originals[i]
+                "id": problem.card_ids[i],
+                "original": problem.originals[i]
             })
             total_cost += cost
 
-    # 10. 计算实际满足的通道需求
-    satisfied_channels = A.T @ result.x
+    # 计算实际满足的通道需求
+    satisfied_channels = problem.A.T @ x
     channel_satisfaction = []
 
     for i, channel_type in enumerate(CHANNEL_TYPES):
@@ -164,19 +382,248 @@ def optimize_card_selection_core(
             })
 
     # 构建响应消息
-    message = "优化成功"
+    gap = solver["mip_gap"]
+    gap_text = f"，与下界的相对间隙为 {gap:.2%}" if gap is not None else ""
+    if solver["status"] == "time_limit":
+        message = f"达到求解时间上限（{solver['time_limit']} 秒），返回当前最优可行解{gap_text}"
+    elif solver["status"] == "relaxation":
+        message = f"快速方案（线性松弛取整）{gap_text}"
+    else:
+        message = "优化成功"
 
     return {
         "success": True,
         "message": message,
-        "total_cards": n_cards,
-        "requirements_summary": requirements_summary,
+        "total_cards": len(problem.card_ids),
+        "requirements_summary": problem.requirements_summary,
         "optimized_solution": optimized_solution,
         "total_cost": int(total_cost),
-        "channel_satisfaction": channel_satisfaction
+        "channel_satisfaction": channel_satisfaction,
+        "presolve": problem.presolve,
+        "from_cache": from_cache,
+        "solver": solver
     }
 
 
+def trivial_solution(problem: OptimizationProblem, solver: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    不需要调用求解器的情况：没有任何通道需求时返回空方案，某种需求通道没有任何板卡提供时返回失败
+    其余情况返回None
+    """
+    model = problem.model
+    if len(model.rows) == 0:
+        return optimization_result(problem, np.zeros(len(model.cards)), solver)
+    if model.is_infeasible():
+        missing = [CHANNEL_TYPES[model.rows[i]] for i in np.flatnonzero(~model.A.any(axis=0))]
+        return optimization_failure(problem, solver, f"没有板卡提供所需通道: {', '.join(missing)}")
+    return None
+
+
+def exact_cache_key(problem: OptimizationProblem, mip_rel_gap: float) -> Optional[Tuple[str, float, int]]:
+    """优化结果缓存的键 (缩减模型哈希, MIP 间隙, 目录版本)；缓存关闭时为None"""
+    if optimize_cache.max_bytes <= 0:
+        return None
+    version = get_catalog_version()
+    optimize_cache.bind_version(version)
+    return problem.model.fingerprint(), mip_rel_gap, version
+
+
+def solve_exact(problem: OptimizationProblem, time_limit: float, mip_rel_gap: float) -> Dict[str, Any]:
+    """
+    整数规划精确求解（板卡数量无限，无需可行性检查）
+    相同的缩减模型和 MIP 间隙（同一目录版本下）直接复用缓存的最优解，不再调用求解器；
+    只缓存最优解，达到时间上限的解不缓存
+    """
+    solver = new_solver_info(time_limit, mip_rel_gap)
+    result = trivial_solution(problem, solver)
+    if result is not None:
+        return result
+
+    model = problem.model
+    cache_key = exact_cache_key(problem, mip_rel_gap)
+    cached = optimize_cache.get(cache_key) if cache_key is not None else None
+    if cached is not None:
+        x_reduced, solver["mip_dual_bound"], solver["mip_gap"] = cached
+        return optimization_result(problem, x_reduced, solver, from_cache=True)
+
+    result = linprog(
+        c=model.c,
+        A_ub=-model.A.T,
+        b_ub=-model.b,
+        bounds=[(0, None)] * len(model.cards),
+        method='highs',
+        integrality=[1] * len(model.cards),
+        options={"time_limit": time_limit, "mip_rel_gap": mip_rel_gap}
+    )
+    time_limited = result.status == 1
+    solver["mip_dual_bound"] = solver_value(getattr(result, 'mip_dual_bound', None))
+    solver["mip_gap"] = solver_value(getattr(result, 'mip_gap', None))
+    if result.x is None or not (result.success or time_limited):
+        if time_limited:
+            return optimization_failure(problem, solver, f"达到求解时间上限（{time_limit} 秒），尚未找到可行解",
+                                        "time_limit")
+        return optimization_failure(problem, solver, result.message)
+    x_reduced = np.rint(result.x)
+    if time_limited:
+        solver["status"] = "time_limit"
+    elif cache_key is not None:
+        optimize_cache.put(cache_key, (x_reduced, solver["mip_dual_bound"], solver["mip_gap"]))
+    return optimization_result(problem, x_reduced, solver)
+
+
+def solve_relaxation(problem: OptimizationProblem, time_limit: float, mip_rel_gap: float) -> Dict[str, Any]:
+    """
+    快速方案：求解线性松弛（不要求整数），向上取整后修复并去掉多余的板卡
+        - 线性松弛的最优值是整数最优成本的下界（solver.mip_dual_bound）
+        - 资源矩阵非负，向上取整只会增加通道数；数值误差导致的不足由贪心补齐
+        - 再按价格从高到低逐个减少板卡数量，只要仍满足全部需求
+    """
+    solver = new_solver_info(time_limit, mip_rel_gap)
+    result = trivial_solution(problem, solver)
+    if result is not None:
+        return result
+
+    model = problem.model
+    result = linprog(
+        c=model.c,
+        A_ub=-model.A.T,
+        b_ub=-model.b,
+        bounds=[(0, None)] * len(model.cards),
+        method='highs',
+        options={"time_limit": time_limit}
+    )
+    if not result.success:
+        return optimization_failure(problem, solver, result.message)
+
+    x = model.round_up(result.x)
+    cost = float(model.c @ x)
+    bound = float(result.fun)
+    solver["status"] = "relaxation"
+    solver["mip_dual_bound"] = bound
+    solver["mip_gap"] = max(cost - bound, 0.0) / cost if cost > 0 else 0.0
+    return optimization_result(problem, x, solver)
+
+
+def optimize_card_selection_core(
+    linprog_input_data: List[Dict[str, Any]],
+    linprog_requiremnets: List[int],
+    time_limit: Optional[float] = None,
+    mip_rel_gap: Optional[float] = None
+) -> Dict[str, Any]:
+    """
+    板卡选型优化核心逻辑
+    
+    Args:
+        linprog_input_data: process_dnf输出的板卡数据数组（包含id, matrix_channel_count, model, price_cny, original）
+        linprog_requiremnets: process_dnf输出的需求数组（CHANNEL_COUNT个元素）
+        time_limit: 求解时间上限（秒），达到上限时返回当前最优可行解；为None时使用 OPTIMIZE_TIME_LIMIT_SECONDS
+        mip_rel_gap: 相对 MIP 间隙，当前解与下界的相对差距不超过该值即停止；为None时使用 OPTIMIZE_MIP_REL_GAP
+    
+    Returns:
+        包含优化结果的字典，格式与 OptimizationResponse 对应
+    """
+    time_limit, mip_rel_gap = resolve_solver_options(time_limit, mip_rel_gap)
+    problem = prepare_optimization(linprog_input_data, linprog_requiremnets)
+    return solve_exact(problem, time_limit, mip_rel_gap)
+
+
+class OptimizationJobs:
+    """
+    两阶段模式的后台精确求解任务（线程池执行）
+        limit: 最多保留的任务数，超出时丢弃最早提交的已结束任务；
+               未结束（求解中或排队中）的任务达到该数量时不再接受新任务
+    """
+
+    def __init__(self, workers: int, limit: int):
+        self.limit = limit
+        self._executor = ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix='optimize-job')
+        self._jobs: 'OrderedDict[str, Tuple[Future, float]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, problem: OptimizationProblem, time_limit: float, mip_rel_gap: float) -> Optional[str]:
+        """提交精确求解任务，返回任务 id；未结束的任务已达 limit 个时不提交，返回None"""
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            if sum(not job.done() for job, _ in self._jobs.values()) >= self.limit:
+                return None
+            future = self._executor.submit(solve_exact, problem, time_limit, mip_rel_gap)
+            self._jobs[job_id] = (future, time.time())
+            excess = len(self._jobs) - self.limit
+            if excess > 0:
+                finished = [key for key, (job, _) in self._jobs.items() if job.done()][:excess]
+                for key in finished:
+                    del self._jobs[key]
+        return job_id
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        任务状态：running（求解中）、done（result 为精确求解结果）或 error（error 为异常信息）
+        任务不存在（或已被丢弃）时返回None
+        """
+        with self._lock:
+            entry = self._jobs.get(job_id)
+        if entry is None:
+            return None
+        future, submitted_at = entry
+        job = {
+            "job_id": job_id,
+            "status": "running",
+            "submitted_at": datetime.fromtimestamp(submitted_at).isoformat(),
+            "result": None,
+            "error": None
+        }
+        if future.done():
+            error = future.exception()
+            if error is not None:
+                job["status"] = "error"
+                job["error"] = str(error)
+            else:
+                job["status"] = "done"
+                job["result"] = future.result()
+        return job
+
+
+# 两阶段模式的后台任务表
+optimize_jobs = OptimizationJobs(OPTIMIZE_JOB_WORKERS, OPTIMIZE_JOB_LIMIT)
+
+
+def optimize_card_selection_two_phase(
+    linprog_input_data: List[Dict[str, Any]],
+    linprog_requiremnets: List[int],
+    time_limit: Optional[float] = None,
+    mip_rel_gap: Optional[float] = None
+) -> Dict[str, Any]:
+    """
+    两阶段模式：立即返回线性松弛取整得到的可行方案（solver.status 为 relaxation，附下界和相对间隙），
+    同时在后台提交精确求解任务，结果中的 job_id 用于查询精确解（见 optimize_jobs.status）
+    两个阶段共用同一个缩减模型；精确解已在缓存中、不需要调用求解器或未结束的后台任务已达 OPTIMIZE_JOB_LIMIT 个时
+    直接（同步）返回精确结果，job_id 为None
+
+    Args:
+        与 optimize_card_selection_core 相同（time_limit / mip_rel_gap 作用于后台精确求解）
+    """
+    time_limit, mip_rel_gap = resolve_solver_options(time_limit, mip_rel_gap)
+    problem = prepare_optimization(linprog_input_data, linprog_requiremnets)
+
+    cache_key = exact_cache_key(problem, mip_rel_gap)
+    if trivial_solution(problem, new_solver_info(time_limit, mip_rel_gap)) is not None or (
+            cache_key is not None and cache_key in optimize_cache):
+        result = solve_exact(problem, time_limit, mip_rel_gap)
+        result["job_id"] = None
+        return result
+
+    job_id = optimize_jobs.submit(problem, time_limit, mip_rel_gap)
+    if job_id is None:
+        # 未结束的后台任务已达 OPTIMIZE_JOB_LIMIT 个：不再排队，直接同步精确求解
+        result = solve_exact(problem, time_limit, mip_rel_gap)
+        result["job_id"] = None
+        return result
+
+    result = solve_relaxation(problem, time_limit, mip_rel_gap)
+    result["job_id"] = job_id
+    return result
+
+
 # ================= 以下为测试代码 =================
 
 # 输入数据（每个分组代表一类需求的可选板卡）
@@ -6,80 +6,60 @@
 """
 
 import json
+import base64
+import heapq
 import psycopg2
 import re
 import io
 from decimal import Decimal
-from typing import List, Dict, Tuple, Any, Set, Optional
+from typing import List, Dict, Tuple, Any, Set, Optional, Iterator
 from itertools import product
 import sys
 import os
 import uuid
+import time
+import multiprocessing
+import pickle
+import atexit
+import threading
 from datetime import datetime
+from multiprocessing import shared_memory
 import logging
+import numpy as np
+from board_catalog import (DB_CONFIG, CHANNEL_COUNT_FIELDS, CHANNEL_COUNT_KEYS, FIELD_NAME_MAPPING,
+                           CatalogSnapshot, CatalogSchema, ColumnarCatalog, FieldRegistry,
+                           get_catalog_snapshot, get_catalog_schema, get_field_registry,
+                           rows_to_boards, channel_value_present, parse_array_value)
+from dnf_compiler import (CompiledDNF, CompiledCondition, ConditionPredicate, compile_dnf,
+                          match_conjunction, selectivity_order, normalize_field_name,
+                          parse_logical_expression, parse_single_condition)
+from dnf_sql import compile_dnf_sql, compile_non_null_sql, required_columns, build_candidate_query
+from result_cache import LRUCache, estimate_size
 
-# 数据库配置
-DB_CONFIG = {
-    'host': '10.0.4.13',
-    'database': 'LS_chuangqi',
-    'user': 'postgres',
-    'password': '123456789',
-    'port': 5433
-}
-
-# 39个channel_count字段的固定顺序
-CHANNEL_COUNT_FIELDS = [
-    'AD_channel_count_single_ended',
-    'AD_channel_count_differential',
-    'DA_channel_count',
-    'DIO_total_channel_count',
-    'DI_channel_count',
-    'DO_channel_count',
-    'PWM_output_channel_count',
-    'Encoder_quadrature_channel_count',
-    'Encoder_hall_channel_count',
-    'Encoder_channel_count_differential',
-    'Encoder_channel_count_single_ended',
-    'Counter_channel_count',
-    'CAN_channel_count',
-    'UART_channel_count',
-    'MIL1553_channel_count',
-    'A429_tx_channel_count',
-    'A429_rx_channel_count',
-    'AFDX_channel_count',
-    'SPI_channel_count',
-    'SSI_channel_count',
-    'Endat_channel_count',
-    'BISSC_channel_count',
-    'SENT_channel_count',
-    'PSI5_channel_count',
-    'I2C_channel_count',
-    'PCM_channel_count',
-    'LVDS_channel_count',
-    'RDC_SDC_channel_count',
-    'LVDT_RVDT_channel_count',
-    'RTD_channel_count',
-    'PPS_input_channel_count',
-    'PPS_output_channel_count',
-    'FPGA_fiber_channel_count',
-    'Motion_DA_channel_count',
-    'Motion_AD_channel_count',
-    'Motion_encoder_input_channel_count',
-    'Motion_enable_reset_channel_count',
-    'Motion_pulse_output_channel_count',
-    'Power_output_channel_count'
-]
+# 需求级结果缓存容量（字节，估算值），可通过环境变量配置，为 0 时不缓存
+REQUIREMENT_CACHE_BYTES = int(os.getenv('REQUIREMENT_CACHE_BYTES', str(64 * 1024 * 1024)))
+
+# 需求级结果缓存：(规范化 DNF 哈希, 目录版本) -> RequirementScores，目录版本变化时整体失效
+requirement_cache = LRUCache(REQUIREMENT_CACHE_BYTES)
+
+# 并行模式的工作进程数（默认为 CPU 核数）及启用并行的最少待评分需求数，可通过环境变量配置
+DNF_WORKERS = int(os.getenv('DNF_WORKERS', str(os.cpu_count() or 1)))
+DNF_PARALLEL_MIN_REQUIREMENTS = int(os.getenv('DNF_PARALLEL_MIN_REQUIREMENTS', '16'))
 
 
 class BoardProcessor:
     """板卡处理器主类"""
 
-    def __init__(self):
+    def __init__(self, pushdown: bool = False):
         self.conn = None
+        self.pushdown = pushdown  # 是否将过滤下推到数据库（不加载全表）
+        self.catalog = None  # 进程级共享的板卡目录快照
+        self.field_registry = None  # 字段元数据注册表
         self.all_boards = None
         self.board_cache = {}  # 缓存板卡数据
         self.logger = None  # 日志记录器
         self.log_file = None  # 日志文件路径
+        self.debug_enabled = False  # 是否输出调试日志（关闭时不格式化任何调试信息）
 
     def setup_logging(self, log_file: str = None):
         """
@@ -114,6 +94,7 @@ class BoardProcessor:
         self.logger.addHandler(file_handler)
 
         self.logger.info(f"日志文件: {log_file}")
+        self.debug_enabled = True
 
     def log_debug(self, message: str):
         """记录调试信息"""
@@ -136,489 +117,197 @@ class BoardProcessor:
 
     def normalize_field_name(self, field_name: str) -> str:
         """将字段名转换为数据库中的格式（小写）"""
-        return field_name.strip().lower()
+        return normalize_field_name(field_name)
+
+    def get_field_registry(self) -> FieldRegistry:
+        """获取字段元数据注册表（下推模式按表结构构建，否则按目录快照的列构建）"""
+        if self.field_registry is None:
+            self.field_registry = get_field_registry() if self.pushdown else self.get_catalog().fields
+        return self.field_registry
 
     def is_channel_count_field(self, field_name: str) -> bool:
-        """检查字段是否在 CHANNEL_COUNT_FIELDS 中（大小写不敏感）"""
-        field_lower = field_name.lower()
-        return any(f.lower() == field_lower for f in CHANNEL_COUNT_FIELDS)
+        """检查字段（列名或别名，大小写不敏感）是否为通道数字段"""
+        return self.get_field_registry().is_channel_count(field_name)
 
     def check_channel_count_field_value(self, field_value: Any) -> bool:
         """检查 CHANNEL_COUNT_FIELDS 字段的值：非空、有值且不为0"""
-        if field_value is None:
-            return False
-
-        # 转换为数值类型检查
-        try:
-            if isinstance(field_value, Decimal):
-                num_value = float(field_value)
-            elif isinstance(field_value, (int, float)):
-                num_value = float(field_value)
-            else:
-                # 尝试转换为数值
-                num_value = float(field_value)
-
-            # 检查是否不为0
-            return num_value != 0
-        except (ValueError, TypeError):
-            # 如果无法转换为数值，检查是否为空字符串
-            return str(field_value).strip() != ''
+        return channel_value_present(field_value)
 
     def parse_logical_expression(self, logic_str: str) -> List[List[str]]:
         """
         解析逻辑表达式，返回DNF（析取范式）形式
         例如: (A ∧ B) ∨ (C ∧ D) -> [[A, B], [C, D]]
         """
-        if not logic_str or not logic_str.strip():
-            return []
-
-        # 清理字符串，保留特殊字符
-        logic_str = logic_str.strip().replace('\n', ' ').replace('\t', ' ')
-
-        # 如果整个表达式被括号包裹，去掉外层括号
-        while logic_str.startswith('(') and logic_str.endswith(')'):
-            # 检查是否是最外层括号
-            depth = 0
-            is_outer = True
-            for i, char in enumerate(logic_str[1:-1], 1):
-                if char == '(':
-                    depth += 1
-                elif char == ')':
-                    depth -= 1
-                    if depth < 0:
-                        is_outer = False
-                        break
-            if is_outer and depth == 0:
-                logic_str = logic_str[1:-1].strip()
-            else:
-                break
-
-        # 按最外层析取符（∨）分割
-        parts = []
-        depth = 0
-        start = 0
-        current_conditions = []
-        buffer = []
-
-        i = 0
-        while i < len(logic_str):
-            char = logic_str[i]
-
-            if char == '(':
-                if depth == 0:
-                    start = i
-                depth += 1
-                buffer.append(char)
-            elif char == ')':
-                depth -= 1
-                buffer.append(char)
-                if depth == 0:
-                    # 提取完整的括号内容
-                    content = ''.join(buffer).strip()
-                    if content.startswith('(') and content.endswith(')'):
-                        content = content[1:-1].strip()
-                    if content:
-                        current_conditions.append(content)
-                    buffer = []
-            elif depth == 0:
-                # 在顶层，检查逻辑操作符
-                remaining = logic_str[i:]
-                if remaining.lower().startswith(' and '):
-                    # 遇到合取符，保存当前条件
-                    if buffer:
-                        cond = ''.join(buffer).strip()
-                        if cond:
-                            current_conditions.append(cond)
-                            buffer = []
-                    # 跳过 " and "
-                    i += 4
-                    continue
-                elif remaining.lower().startswith(' or '):
-                    # 遇到析取符，保存当前合取项
-                    if current_conditions or buffer:
-                        if buffer:
-                            cond = ''.join(buffer).strip()
-                            if cond:
-                                current_conditions.append(cond)
-                                buffer = []
-                        if current_conditions:
-                            parts.append(current_conditions)
-                            current_conditions = []
-                    # 跳过 " or "
-                    i += 3
-                    continue
-                elif i < len(logic_str) - 1:
-                    two_char = logic_str[i:i+2]
-                    if '∨' in two_char:
-                        if current_conditions or buffer:
-                            if buffer:
-                                cond = ''.join(buffer).strip()
-                                if cond:
-                                    current_conditions.append(cond)
-                                    buffer = []
-                            if current_conditions:
-                                parts.append(current_conditions)
-                                current_conditions = []
-                        i += 1
-                        continue
-                    elif '∧' in two_char:
-                        if buffer:
-                            cond = ''.join(buffer).strip()
-                            if cond:
-                                current_conditions.append(cond)
-                                buffer = []
-                        i += 1
-                        continue
-
-                buffer.append(char)
-            else:
-                buffer.append(char)
-
-            i += 1
-
-        # 处理剩余内容
-        if buffer:
-            cond = ''.join(buffer).strip()
-            if cond:
-                current_conditions.append(cond)
-
-        if current_conditions:
-            parts.append(current_conditions)
-
-        # 如果没有找到析取，整个表达式作为一个合取
-        if not parts:
-            conditions = []
-            import re
-            parts_str = re.split(r'\s+and\s+|\s+∧\s+|∧',
-                                 logic_str, flags=re.IGNORECASE)
-            for part in parts_str:
-                part = part.strip()
-                if part:
-                    if part.startswith('(') and part.endswith(')'):
-                        part = part[1:-1].strip()
-                    if part:
-                        conditions.append(part)
-
-            if conditions:
-                parts = [conditions]
-            else:
-                parts = [[logic_str.strip()]]
-
-        return parts
+        return parse_logical_expression(logic_str)
 
     def parse_single_condition(self, condition: str) -> Dict[str, Any]:
         """
         解析单个条件，返回操作符和操作数
         """
-        condition = condition.strip()
-
-        # 处理集合包含关系 ⊇ (Unicode)
-        if '⊇' in condition:
-            parts = condition.split('⊇', 1)
-            if len(parts) != 2:
-                raise ValueError(f"Invalid condition format: {condition}")
-            field = parts[0].strip()
-            set_str = parts[1].strip()
-            if set_str.startswith('{') and set_str.endswith('}'):
-                set_str = set_str[1:-1]
-                values = [v.strip().strip('"').strip("'")
-                          for v in set_str.split(',')]
-                return {
-                    'id': str(uuid.uuid4()),
-                    'field': self.normalize_field_name(field),
-                    'operator': '⊇',
-                    'values': values
-                }
-            else:
-                raise ValueError(f"Invalid set format: {set_str}")
-
-        # 处理比较操作符
-        operators = [
-            ('≥', '>='),
-            ('≤', '<='),
-            ('≠', '!='),
-            ('>', '>'),
-            ('<', '<'),
-            ('=', '=')
-        ]
-
-        for unicode_op, ascii_op in operators:
-            if unicode_op in condition:
-                parts = condition.split(unicode_op, 1)
-                if len(parts) == 2:
-                    field = parts[0].strip()
-                    value_str = parts[1].strip()
-
-                    try:
-                        if '.' in value_str:
-                            value = float(value_str)
-                        else:
-                            value = int(value_str)
-                    except ValueError:
-                        value = value_str.strip('"').strip("'")
-
-                    return {
-                        'id': str(uuid.uuid4()),
-                        'field': self.normalize_field_name(field),
-                        'operator': unicode_op,
-                        'value': value
-                    }
+        return parse_single_condition(condition)
 
-            if ascii_op in condition and ascii_op != unicode_op:
-                parts = condition.split(ascii_op, 1)
-                if len(parts) == 2:
-                    field = parts[0].strip()
-                    value_str = parts[1].strip()
-
-                    try:
-                        if '.' in value_str:
-                            value = float(value_str)
-                        else:
-                            value = int(value_str)
-                    except ValueError:
-                        value = value_str.strip('"').strip("'")
-
-                    return {
-                        'id': str(uuid.uuid4()),
-                        'field': self.normalize_field_name(field),
-                        'operator': unicode_op,
-                        'value': value
-                    }
-
-        # 处理带 ∨ 的等于条件
-        if '=' in condition and ('∨' in condition or ' or ' in condition.lower()):
-            field_match = re.match(r'^([^=]+)=', condition)
-            if field_match:
-                field = self.normalize_field_name(field_match.group(1).strip())
-                values = []
-                parts = re.split(r'[∨]| or ', condition, flags=re.IGNORECASE)
-                for part in parts:
-                    part = part.strip()
-                    if '=' in part:
-                        value = part.split('=', 1)[
-                            1].strip().strip('"').strip("'")
-                        values.append(value)
-                    elif part:
-                        value = part.strip().strip('"').strip("'")
-                        values.append(value)
-                if values:
-                    return {
-                        'id': str(uuid.uuid4()),
-                        'field': field,
-                        'operator': '∈',
-                        'values': values
-                    }
+    def evaluate_condition(self, row: Dict[str, Any], condition: Any) -> bool:
+        """
+        评估单个条件是否满足
+        condition 可以是条件字典，也可以是编译好的 ConditionPredicate（热路径直接传谓词，避免重复编译）
+        """
+        try:
+            predicate = condition if isinstance(condition, ConditionPredicate) else ConditionPredicate(condition)
+            return predicate.test(row)
+        except Exception as e:
+            return False
 
-        raise ValueError(f"Unsupported condition format: {condition}")
+    def evaluate_condition_columnar(self, columnar: ColumnarCatalog, condition: Any) -> np.ndarray:
+        """
+        对整列评估单个条件，返回每块板卡是否满足的布尔数组
+        语义与 evaluate_condition 逐行评估一致，但每个条件只调用一次
+        """
+        try:
+            predicate = condition if isinstance(condition, ConditionPredicate) else ConditionPredicate(condition)
+            return predicate.evaluate_column(columnar)
+        except Exception as e:
+            return columnar.empty_mask()
 
-    def evaluate_condition(self, row: Dict[str, Any], condition_dict: Dict[str, Any]) -> bool:
-        """评估单个条件是否满足"""
+    def explain_dnf(self, logic_str: str) -> Dict[str, Any]:
+        """
+        说明逻辑表达式在板卡目录上的评估过程：化简结果，化简后每个合取项中条件的评估顺序（按估算选择率），
+        以及每个条件的估算/实际满足板卡数、求交后剩余板卡数、是否因交集为空而跳过
+        返回: 说明信息字典（目录不可用时返回None）
+        """
+        compiled = compile_dnf(logic_str)
+        simplification = compiled.simplify()
         try:
-            field = condition_dict['field']
-            operator = condition_dict['operator']
-
-            field_value = row.get(field)
-
-            if field_value is None:
-                return False
-
-            # 对于 CHANNEL_COUNT_FIELDS 中的字段，只检查非空、有值且不为0
-
-            if self.is_channel_count_field(field):
-                result = self.check_channel_count_field_value(field_value)
-                return result
-
-            # 辅助函数：将数值类型转换为float进行比较
-            def to_float(val):
-                if isinstance(val, Decimal):
-                    return float(val)
-                elif isinstance(val, (int, float)):
-                    return float(val)
-                return None
-
-            if operator in ['≥', '>=']:
-                value = condition_dict['value']
-                field_float = to_float(field_value)
-                value_float = to_float(value)
-                if field_float is not None and value_float is not None:
-                    result = field_float >= value_float
-                    self.log_debug(f"[DEBUG]   字段 '{field}': {field_value} (类型: {type(field_value).__name__}, 转换后: {field_float}) "
-                                   f"{operator} {value} (类型: {type(value).__name__}, 转换后: {value_float}) -> 结果: {result}")
-                    return result
-                self.log_debug(
-                    f"[DEBUG] 字段 '{field}': 无法进行数值比较 ({field_value} vs {value})")
-                return False
-
-            elif operator in ['≤', '<=']:
-                value = condition_dict['value']
-                field_float = to_float(field_value)
-                value_float = to_float(value)
-                if field_float is not None and value_float is not None:
-                    result = field_float <= value_float
-                    self.log_debug(f"[DEBUG] 字段 '{field}': {field_value} (类型: {type(field_value).__name__}, 转换后: {field_float}) "
-                                   f"{operator} {value} (类型: {type(value).__name__}, 转换后: {value_float}) -> 结果: {result}")
-                    return result
-                self.log_debug(
-                    f"[DEBUG] 字段 '{field}': 无法进行数值比较 ({field_value} vs {value})")
-                return False
-
-            elif operator == '>':
-                value = condition_dict['value']
-                field_float = to_float(field_value)
-                value_float = to_float(value)
-                if field_float is not None and value_float is not None:
-                    result = field_float > value_float
-                    self.log_debug(f"[DEBUG] 字段 '{field}': {field_value} (类型: {type(field_value).__name__}, 转换后: {field_float}) "
-                                   f"{operator} {value} (类型: {type(value).__name__}, 转换后: {value_float}) -> 结果: {result}")
-                    return result
-                self.log_debug(
-                    f"[DEBUG] 字段 '{field}': 无法进行数值比较 ({field_value} vs {value})")
-                return False
-
-            elif operator == '<':
-                value = condition_dict['value']
-                field_float = to_float(field_value)
-                value_float = to_float(value)
-                if field_float is not None and value_float is not None:
-                    result = field_float < value_float
-                    self.log_debug(f"[DEBUG] 字段 '{field}': {field_value} (类型: {type(field_value).__name__}, 转换后: {field_float}) "
-                                   f"{operator} {value} (类型: {type(value).__name__}, 转换后: {value_float}) -> 结果: {result}")
-                    return result
-                self.log_debug(
-                    f"[DEBUG] 字段 '{field}': 无法进行数值比较 ({field_value} vs {value})")
-                return False
+            snapshot = self.get_catalog()
+        except Exception as e:
+            print(f"Database error: {e}")
+            return None
+        columnar = snapshot.columnar
+        size = columnar.size
+
+        conjuncts = []
+        matched_rows = np.empty(0, dtype=np.intp)
+        for part, source in zip(simplification.parts, simplification.sources):
+            predicates = [cond.predicate for cond in part]
+
+            # 按实际评估方式计时（短路后的条件不评估）
+            started_at = time.perf_counter()
+            part_rows = self.match_conjunct_rows(columnar, part)
+            elapsed_ms = (time.perf_counter() - started_at) * 1000
+            matched_rows = np.union1d(matched_rows, part_rows)
+
+            steps = []
+            rows = None
+            estimated_fraction = 1.0
+            for i, selectivity in selectivity_order(columnar, predicates):
+                cond = part[i]
+                actual = predicates[i].matching_rows(columnar)
+                evaluated = rows is None or len(rows) > 0
+                rows = actual if rows is None else np.intersect1d(rows, actual, assume_unique=True)
+                estimated_fraction *= selectivity
+                steps.append({
+                    'condition': cond.text,
+                    'field': cond.field,
+                    'operator': cond.operator,
+                    'estimated_selectivity': round(selectivity, 6),
+                    'estimated_rows': round(selectivity * size, 2),
+                    'actual_rows': len(actual),
+                    'rows_after': len(rows),
+                    'evaluated': evaluated
+                })
 
-            elif operator == '=':
-                value = condition_dict['value']
-                
-                # 处理布尔值比较
-                def normalize_bool(val):
-                    """将各种布尔值表示转换为 Python bool"""
-                    if isinstance(val, bool):
-                        return val
-                    if isinstance(val, str):
-                        val_lower = val.strip().lower()
-                        if val_lower in ('true', '1', 'yes', 'on'):
-                            return True
-                        elif val_lower in ('false', '0', 'no', 'off', ''):
-                            return False
-                    return None
-                
-                field_bool = normalize_bool(field_value)
-                value_bool = normalize_bool(value)
-                if field_bool is not None and value_bool is not None:
-                    result = field_bool == value_bool
-                    self.log_debug(f"[DEBUG] 字段 '{field}': 布尔值比较 {field_value} (类型: {type(field_value).__name__}, 转换后: {field_bool}) "
-                                   f"{operator} {value} (类型: {type(value).__name__}, 转换后: {value_bool}) -> 结果: {result}")
-                    return result
-                
-                # 尝试数值比较
-                field_float = to_float(field_value)
-                value_float = to_float(value)
-                if field_float is not None and value_float is not None:
-                    result = abs(field_float - value_float) < 1e-9
-                    self.log_debug(f"[DEBUG] 字段 '{field}': 比较 {field_value} (类型: {type(field_value).__name__}, 转换后: {field_float}) "
-                                   f"{operator} {value} (类型: {type(value).__name__}, 转换后: {value_float}) "
-                                   f"-> 结果: {result} (差值: {abs(field_float - value_float)})")
-                    return result
-                
-                # 字符串比较
-                result = str(field_value).strip() == str(value).strip()
-                self.log_debug(
-                    f"[DEBUG] 字段 '{field}': 字符串比较 '{field_value}' {operator} '{value}' -> 结果: {result}")
-                return result
-
-            elif operator in ['≠', '!=']:
-                value = condition_dict['value']
-                field_float = to_float(field_value)
-                value_float = to_float(value)
-                if field_float is not None and value_float is not None:
-                    return abs(field_float - value_float) >= 1e-9
-                return str(field_value).strip() != str(value).strip()
-
-            elif operator == '⊇':
-                required_values = condition_dict['values']
-                if isinstance(field_value, str):
-                    field_values = []
-                    if ',' in field_value:
-                        field_values = [v.strip()
-                                        for v in field_value.split(',')]
-                    else:
-                        field_values = [field_value.strip()]
-                elif isinstance(field_value, list):
-                    field_values = [str(v) for v in field_value]
-                else:
-                    field_values = [str(field_value)]
-
-                for req_val in required_values:
-                    if not any(req_val in fv or fv == req_val for fv in field_values):
-                        return False
-                return True
-
-            elif operator == '∈':
-                allowed_values = condition_dict['values']
-                field_value_str = str(field_value).strip()
-                return field_value_str in [str(v).strip() for v in allowed_values]
+            conjuncts.append({
+                'conjunct_index': source,
+                'conditions': steps,
+                'estimated_rows': round(estimated_fraction * size, 2),
+                'actual_rows': len(part_rows),
+                'elapsed_ms': round(elapsed_ms, 3)
+            })
 
-            else:
-                raise ValueError(f"Unsupported operator: {operator}")
+        return {
+            'dnf': logic_str,
+            'catalog_version': snapshot.version,
+            'catalog_size': size,
+            'parse_errors': [{'condition': cond_str, 'error': error}
+                             for cond_str, error in compiled.errors],
+            'conjuncts_before': len(compiled.parts),
+            'simplification': simplification.summary(),
+            'conjuncts': conjuncts,
+            'matched_rows': len(matched_rows)
+        }
 
+    def match_conjunct_rows(self, columnar: ColumnarCatalog, part: List[CompiledCondition]) -> np.ndarray:
+        """
+        求满足合取项中所有条件的板卡行号（升序）
+        任一条件评估出错时该条件视为不满足，整个合取项为空
+        """
+        try:
+            return match_conjunction(columnar, [cond.predicate for cond in part])
         except Exception as e:
-            return False
+            return np.empty(0, dtype=np.intp)
+
+    def get_catalog(self) -> CatalogSnapshot:
+        """获取板卡目录快照（同一个处理器实例内始终使用同一份快照）"""
+        if self.catalog is None:
+            self.catalog = get_catalog_snapshot()
+        return self.catalog
 
     def query_board_data(self) -> List[Dict[str, Any]]:
-        """查询所有板卡数据"""
+        """查询所有板卡数据（来自进程级共享快照，不再每次全表扫描）"""
         if self.all_boards is not None:
             return self.all_boards
 
-        conn = None
         try:
-            conn = self.get_connection()
-            cur = conn.cursor()
-
-            # 查询所有列（除了created_at等元数据）
-            cur.execute("""
-                SELECT column_name 
-                FROM information_schema.columns 
-                WHERE table_name = 'hardware_specifications_1109' 
-                AND column_name NOT IN ('created_at')
-                ORDER BY ordinal_position
-            """)
+            self.all_boards = self.get_catalog().boards
+            return self.all_boards
+        except Exception as e:
+            print(f"Database error: {e}")
+            return []
 
-            columns = [row[0] for row in cur.fetchall()]
+    def query_board_columns(self) -> Optional[ColumnarCatalog]:
+        """获取板卡数据的列式视图（数据库不可用时返回None）"""
+        try:
+            return self.get_catalog().columnar
+        except Exception as e:
+            print(f"Database error: {e}")
+            return None
 
-            # 构建查询语句
-            column_list = ', '.join(columns)
-            cur.execute(
-                f"SELECT {column_list} FROM hardware_specifications_1109")
+    def lookup_columns(self, fields: Set[str]) -> Set[str]:
+        """字段对应的数据库列（按字段元数据注册表解析别名，无法解析的字段按小写列名处理）"""
+        registry = self.get_field_registry()
+        return {registry.column_of(field) or field.lower() for field in fields}
 
+    def query_pushdown_columns(self, schema: CatalogSchema, where, params: List[Any],
+                               fields: Set[str]) -> Optional[ColumnarCatalog]:
+        """
+        下推模式：在数据库中执行 WHERE 过滤，只返回候选行及所需的列
+        返回候选板卡的列式视图（查询失败时返回None）
+        """
+        try:
+            columns = required_columns(
+                self.lookup_columns(fields), schema, CHANNEL_COUNT_KEYS)
+            conn = self.get_connection()
+            cur = conn.cursor()
+            cur.execute(build_candidate_query(columns, where), params)
             rows = cur.fetchall()
             cur.close()
+            return ColumnarCatalog(columns, rows_to_boards(columns, rows))
+        except Exception as e:
+            print(f"Database error: {e}")
+            if self.conn is not None and not self.conn.closed:
+                self.conn.rollback()
+            return None
 
-            # 转换为字典列表，并处理布尔值类型
-            result = []
-            for i, row in enumerate(rows):
-                board_dict = {}
-                for j, col in enumerate(columns):
-                    value = row[j]
-                    # 确保布尔值类型正确（PostgreSQL 布尔值可能被转换为字符串）
-                    if isinstance(value, str) and value.lower() in ('true', 'false', 't', 'f', '1', '0'):
-                        # 尝试转换为布尔值
-                        if value.lower() in ('true', 't', '1'):
-                            value = True
-                        elif value.lower() in ('false', 'f', '0', ''):
-                            value = False
-                    board_dict[col] = value
-                result.append(board_dict)
-
-            self.all_boards = result
-            return result
-
+    def query_dnf_candidates(self, compiled: CompiledDNF) -> Optional[ColumnarCatalog]:
+        """下推模式：将编译后的 DNF 转换为 SQL，由数据库返回候选板卡"""
+        try:
+            schema = get_catalog_schema()
         except Exception as e:
             print(f"Database error: {e}")
-            return []
-        finally:
-            pass  # 不要关闭连接，保持复用
+            return None
+        cond_dicts = [[cond.condition for cond in part] for part in compiled.simplify().parts]
+        where, params = compile_dnf_sql(
+            cond_dicts, schema, CHANNEL_COUNT_KEYS)
+        return self.query_pushdown_columns(schema, where, params, compiled.fields)
 
     def find_matching_boards(self, logic_str: str) -> Tuple[List[Dict], Dict]:
         """
@@ -636,74 +325,74 @@ class BoardProcessor:
                 "condition_mapping": {}
             }
         
-        # 步骤1：解析逻辑表达式为DNF形式
-        dnf_parts = self.parse_logical_expression(logic_str)
+        # 步骤1：编译逻辑表达式（解析结果按 DNF 字符串缓存）
+        compiled = compile_dnf(logic_str)
 
-        if not dnf_parts:
+        if not compiled and not compiled.errors:
             return [], {
                 "condition_status": {},
                 "satisfied_ratio": 0.0,
                 "matched_with": []
             }
 
-        # 步骤2：解析每个条件
-        parsed_dnf = []
-        all_conditions = []
-        condition_mapping = {}  # 条件字符串到ID的映射
+        # 步骤2：收集条件
+        for cond_str, error in compiled.errors:
+            print(
+                f"Warning: Failed to parse condition '{cond_str}': {error}")
+        all_conditions = list(compiled.conditions)
+        condition_mapping = compiled.condition_mapping()
 
-        for part in dnf_parts:
-            parsed_part = []
-            for cond_str in part:
-                try:
-                    cond_dict = self.parse_single_condition(cond_str)
-                    parsed_part.append((cond_str, cond_dict))
-                    condition_mapping[cond_str] = cond_dict['id']
-                    if cond_str not in all_conditions:
-                        all_conditions.append(cond_str)
-                except Exception as e:
-                    print(
-                        f"Warning: Failed to parse condition '{cond_str}': {e}")
-            if parsed_part:
-                parsed_dnf.append(parsed_part)
-
-        if not parsed_dnf:
+        if not compiled:
             return [], {
                 "condition_status": {cond: False for cond in all_conditions},
                 "satisfied_ratio": 0.0,
                 "matched_with": []
             }
 
-        # 步骤3：获取所有板卡数据
-        boards = self.query_board_data()
+        # 化简：合并范围条件、剔除重复/被覆盖/不可满足的合取项；全部不可满足时不必查询板卡
+        simplification = compiled.simplify()
+        unsatisfiable_conjuncts = [
+            {'conditions': [cond.text for cond in compiled.parts[index]], 'reason': reason}
+            for index, reason in simplification.unsatisfiable
+        ]
+        if simplification.is_unsatisfiable:
+            return [], {
+                "condition_status": {cond: False for cond in all_conditions},
+                "satisfied_ratio": 0.0,
+                "matched_with": [],
+                "total_conditions": len(all_conditions),
+                "matched_conditions_count": 0,
+                "condition_mapping": condition_mapping,
+                "unsatisfiable_conjuncts": unsatisfiable_conjuncts
+            }
 
-        if not boards:
+        # 步骤3：获取板卡数据的列式视图（下推模式下由数据库预筛选候选行）
+        if self.pushdown:
+            columnar = self.query_dnf_candidates(compiled)
+        else:
+            columnar = self.query_board_columns()
+
+        # 下推模式下候选行为空只说明没有板卡满足条件，仍需返回完整状态信息
+        if columnar is None or (columnar.size == 0 and not self.pushdown):
             return [], {
                 "condition_status": {cond: False for cond in all_conditions},
                 "satisfied_ratio": 0.0,
                 "matched_with": []
             }
 
-        # 步骤4：评估每个板卡
-        matched_boards = []
+        # 步骤4：求每个合取项满足的行号集合（范围条件走索引，各条件行号集合从小到大求交）
+        matched_rows = np.empty(0, dtype=np.intp)
         matched_conditions = set()
 
-        for board in boards:
-            # 检查是否符合DNF中的任何一个合取项
-            for parsed_part in parsed_dnf:
-                part_satisfied = True
-                part_conditions = []
+        for part, source in zip(simplification.parts, simplification.sources):
+            part_rows = self.match_conjunct_rows(columnar, part)
 
-                for cond_str, cond_dict in parsed_part:
-                    if self.evaluate_condition(board, cond_dict):
-                        part_conditions.append(cond_str)
-                    else:
-                        part_satisfied = False
-                        break
+            # 只记录作为板卡首个满足项的合取项中的条件（按原合取项记录，包括化简时合并掉的条件）
+            if len(np.setdiff1d(part_rows, matched_rows, assume_unique=True)):
+                matched_conditions.update(cond.text for cond in compiled.parts[source])
+                matched_rows = np.union1d(matched_rows, part_rows)
 
-                if part_satisfied:
-                    matched_boards.append(board)
-                    matched_conditions.update(part_conditions)
-                    break
+        matched_boards = [columnar.boards[i] for i in matched_rows]
 
         # 步骤5：构建状态信息
         condition_status = {cond: (cond in matched_conditions)
@@ -717,7 +406,8 @@ class BoardProcessor:
             "matched_with": list(matched_conditions),
             "total_conditions": len(all_conditions),
             "matched_conditions_count": len(matched_conditions),
-            "condition_mapping": condition_mapping
+            "condition_mapping": condition_mapping,
+            "unsatisfiable_conjuncts": unsatisfiable_conjuncts
         }
 
     def build_matrix_channel_count(self, board: Dict[str, Any]) -> List[int]:
@@ -743,49 +433,46 @@ class BoardProcessor:
         if not dnf_str or not dnf_str.strip():
             return set()
 
-        fields = set()
-        try:
-            dnf_parts = self.parse_logical_expression(dnf_str)
-            for part in dnf_parts:
-                for cond_str in part:
-                    try:
-                        cond_dict = self.parse_single_condition(cond_str)
-                        fields.add(cond_dict['field'])
-                    except:
-                        pass
-        except:
-            pass
-
-        return fields
+        return set(compile_dnf(dnf_str).fields)
 
-    def find_boards_with_values(self, fields: Set[str], exclude_board_ids: Set[str] = None) -> List[Dict[str, Any]]:
+    def find_candidate_rows(self, fields: Set[str],
+                            exclude_board_ids: Set[str] = None) -> Tuple[Optional[ColumnarCatalog], np.ndarray]:
         """
         查找数据库中指定字段至少有一个非NULL的板卡
+        返回: (列式视图, 候选板卡行号数组)；查询失败时列式视图为None
         """
+        no_rows = np.empty(0, dtype=np.intp)
         if not fields:
-            return []
+            return None, no_rows
+
+        if self.pushdown:
+            try:
+                schema = get_catalog_schema()
+            except Exception as e:
+                print(f"Database error: {e}")
+                return None, no_rows
+            columnar = self.query_pushdown_columns(
+                schema, compile_non_null_sql({f.lower() for f in fields}, schema), [], fields)
+        else:
+            columnar = self.query_board_columns()
+        if columnar is None:
+            return None, no_rows
 
-        all_boards = self.query_board_data()
-        if exclude_board_ids is None:
-            exclude_board_ids = set()
+        # 任一字段非空即可：各字段非空位图按位或，再去掉排除板卡的位图
+        mask = columnar.non_null_mask(field.lower() for field in fields)
+        if exclude_board_ids:
+            mask &= ~columnar.id_mask(exclude_board_ids)
 
-        result = []
-        for board in all_boards:
-            board_id = board.get('id')
-            if board_id and str(board_id) in exclude_board_ids:
-                continue
+        return columnar, np.flatnonzero(mask)
 
-            has_value = False
-            for field in fields:
-                field_lower = field.lower()
-                if board.get(field_lower) is not None:
-                    has_value = True
-                    break
-
-            if has_value:
-                result.append(board)
-
-        return result
+    def find_boards_with_values(self, fields: Set[str], exclude_board_ids: Set[str] = None) -> List[Dict[str, Any]]:
+        """
+        查找数据库中指定字段至少有一个非NULL的板卡
+        """
+        columnar, rows = self.find_candidate_rows(fields, exclude_board_ids)
+        if columnar is None:
+            return []
+        return [columnar.boards[i] for i in rows]
 
     def extract_requirement_specification(self, dnf_str: str) -> Dict[str, Any]:
         """
@@ -795,191 +482,92 @@ class BoardProcessor:
             return {}
 
         spec = {}
-        self.log_debug("\n" + "=" * 80)
-        self.log_debug(f"[DEBUG] ========== 开始提取需求规格 ==========")
-        self.log_debug(f"[DEBUG] DNF 表达式: {dnf_str}")
-        try:
-            dnf_parts = self.parse_logical_expression(dnf_str)
-            for part in dnf_parts:
-                for cond_str in part:
-                    try:
-                        cond_dict = self.parse_single_condition(cond_str)
-                        field = cond_dict['field']
-                        operator = cond_dict['operator']
-                        self.log_debug(f"[DEBUG] 处理条件: {cond_str}")
-                        self.log_debug(
-                            f"[DEBUG]   字段: {field}, 操作符: {operator} (类型: {type(operator).__name__})")
-
-                        if operator in ['≥', '>=', '≤', '<=', '>', '<', '=', '≠', '!=']:
-                            spec[field] = {
-                                'value': cond_dict.get('value'),
-                                'operator': operator
-                            }
-                            self.log_debug(
-                                f"[DEBUG]   ✓ 已提取到需求规格: {field} = {cond_dict.get('value')}")
-                        elif operator == '⊇':
-                            spec[field] = {
-                                'values': cond_dict.get('values', []),
-                                'operator': operator
-                            }
-                            self.log_debug(
-                                f"[DEBUG]   ✓ 已提取到需求规格: {field} ⊇ {cond_dict.get('values', [])}")
-                        elif operator == '∈':
-                            spec[field] = {
-                                'values': cond_dict.get('values', []),
-                                'operator': operator
-                            }
-                            self.log_debug(
-                                f"[DEBUG]   ✓ 已提取到需求规格: {field} ∈ {cond_dict.get('values', [])}")
-                        else:
-                            self.log_debug(
-                                f"[DEBUG]   ✗ 操作符 '{operator}' 不在提取列表中，跳过")
-                    except Exception as e:
-                        self.log_debug(f"[DEBUG]   处理条件时出错: {e}")
-                        import traceback
-                        traceback.print_exc()
-                        pass
-        except Exception as e:
-            self.log_debug(f"[DEBUG] 解析 DNF 表达式时出错: {e}")
-            import traceback
-            traceback.print_exc()
-            pass
-
-        self.log_debug(f"[DEBUG] 提取完成，共 {len(spec)} 个字段: {list(spec.keys())}")
-        self.log_debug(f"[DEBUG] ========== 需求规格提取完成 ==========")
-        self.log_debug("=" * 80 + "\n")
+        debug = self.debug_enabled
+        compiled = compile_dnf(dnf_str)
+        if debug:
+            self.log_debug("\n" + "=" * 80)
+            self.log_debug(f"[DEBUG] ========== 开始提取需求规格 ==========")
+            self.log_debug(f"[DEBUG] DNF 表达式: {dnf_str}")
+            for cond_str, error in compiled.errors:
+                self.log_debug(f"[DEBUG]   处理条件时出错: {error}")
+        for cond in compiled.iter_conditions():
+            cond_dict = cond.condition
+            field = cond.field
+            operator = cond.operator
+            if debug:
+                self.log_debug(f"[DEBUG] 处理条件: {cond.text}")
+                self.log_debug(
+                    f"[DEBUG]   字段: {field}, 操作符: {operator} (类型: {type(operator).__name__})")
+
+            if operator in ['≥', '>=', '≤', '<=', '>', '<', '=', '≠', '!=']:
+                spec[field] = {
+                    'value': cond_dict.get('value'),
+                    'operator': operator
+                }
+            elif operator in ['⊇', '∈']:
+                spec[field] = {
+                    'values': list(cond_dict.get('values', [])),
+                    'operator': operator
+                }
+            else:
+                if debug:
+                    self.log_debug(
+                        f"[DEBUG]   ✗ 操作符 '{operator}' 不在提取列表中，跳过")
+                continue
+            if debug:
+                self.log_debug(
+                    f"[DEBUG]   ✓ 已提取到需求规格: {field} {operator} {spec[field].get('value', spec[field].get('values'))}")
+
+        if debug:
+            self.log_debug(f"[DEBUG] 提取完成，共 {len(spec)} 个字段: {list(spec.keys())}")
+            self.log_debug(f"[DEBUG] ========== 需求规格提取完成 ==========")
+            self.log_debug("=" * 80 + "\n")
         return spec
 
     def extract_board_specification(self, board: Dict[str, Any], fields: Set[str], requirement_spec: Dict[str, Any] = None) -> Dict[str, Any]:
         """
-        从板卡数据中提取相关字段的值
+        从板卡数据中提取相关字段的值（数组类取值转换为列表）
         """
         spec = {}
 
-        # 字段名映射：需求中的字段名 -> 数据库中的实际字段名
-        field_name_mapping = {
-            'uart_interface_types': 'UART_interface_types_supported',
-            'encoder_signal_types': 'Encoder_signal_types_supported',
-            'mil1553_operation_modes': 'MIL1553_operation_modes_supported',
-        }
+        # 字段名 / 别名 -> 数据库列名
+        registry = self.get_field_registry()
 
-        def find_field_value(field_name: str) -> Any:
-            """查找字段值，支持多种字段名格式"""
-            # 1. 尝试直接使用字段名（小写）
-            field_lower = field_name.lower()
-            value = board.get(field_lower)
-            if value is not None:
-                return value, field_lower
-
-            # 2. 尝试字段名映射
-            if field_name in field_name_mapping:
-                db_field = field_name_mapping[field_name]
-                value = board.get(db_field)
-                if value is not None:
-                    return value, db_field
-                # 也尝试小写版本
-                value = board.get(db_field.lower())
-                if value is not None:
-                    return value, db_field.lower()
-
-            # 3. 尝试大小写不敏感匹配
-            field_lower = field_name.lower()
-            for key in board.keys():
-                if key.lower() == field_lower:
-                    return board[key], key
-                # 也尝试匹配带 _supported 后缀的
-                if key.lower() == field_lower + '_supported':
-                    return board[key], key
-
-            return None, None
-
-        if requirement_spec:
-            for field in requirement_spec.keys():
-                value, matched_key = find_field_value(field)
-                if value is not None:
-                    # 处理数组类型字段：确保返回列表格式
-                    if isinstance(value, list):
-                        # 已经是列表，直接使用
-                        spec[field] = {
-                            'value': value
-                        }
-                    elif isinstance(value, str):
-                        # 如果是字符串，尝试解析为数组
-                        # 检查是否是 PostgreSQL 数组格式 {item1,item2,item3}
-                        if value.startswith('{') and value.endswith('}'):
-                            # PostgreSQL 数组格式
-                            items = value[1:-1].split(',')
-                            items = [item.strip().strip('"').strip("'")
-                                     for item in items if item.strip()]
-                            spec[field] = {
-                                'value': items
-                            }
-                        elif '/' in value:
-                            # 斜杠分隔格式 "RS-232/422/485"
-                            items = [item.strip()
-                                     for item in value.split('/') if item.strip()]
-                            spec[field] = {
-                                'value': items
-                            }
-                        elif ',' in value:
-                            # 逗号分隔格式
-                            items = [item.strip()
-                                     for item in value.split(',') if item.strip()]
-                            spec[field] = {
-                                'value': items
-                            }
-                        else:
-                            # 单个值，转换为列表
-                            spec[field] = {
-                                'value': [value.strip()] if value.strip() else []
-                            }
-                    else:
-                        # 其他类型，直接使用
-                        spec[field] = {
-                            'value': value
-                        }
-                    self.log_debug(
-                        f"[DEBUG] 提取板卡规格 - 字段: {field} -> {matched_key}, 值: {spec[field]['value']} (类型: {type(spec[field]['value']).__name__})")
-        else:
-            for field in sorted(fields):
-                value, matched_key = find_field_value(field)
-                if value is not None:
-                    # 处理数组类型字段
-                    if isinstance(value, list):
-                        spec[field] = {
-                            'value': value
-                        }
-                    elif isinstance(value, str):
-                        # 字符串格式处理
-                        if value.startswith('{') and value.endswith('}'):
-                            items = value[1:-1].split(',')
-                            items = [item.strip().strip('"').strip("'")
-                                     for item in items if item.strip()]
-                            spec[field] = {
-                                'value': items
-                            }
-                        elif '/' in value:
-                            items = [item.strip()
-                                     for item in value.split('/') if item.strip()]
-                            spec[field] = {
-                                'value': items
-                            }
-                        elif ',' in value:
-                            items = [item.strip()
-                                     for item in value.split(',') if item.strip()]
-                            spec[field] = {
-                                'value': items
-                            }
-                        else:
-                            spec[field] = {
-                                'value': [value.strip()] if value.strip() else []
-                            }
-                    else:
-                        spec[field] = {
-                            'value': value
-                        }
-                    self.log_debug(
-                        f"[DEBUG] 提取板卡规格 - 字段: {field} -> {matched_key}, 值: {spec[field]['value']} (类型: {type(spec[field]['value']).__name__})")
+        for field in (requirement_spec.keys() if requirement_spec else sorted(fields)):
+            matched_key = registry.column_of(field)
+            value = board.get(matched_key) if matched_key is not None else None
+            if value is None:
+                continue
+            items = parse_array_value(value)
+            spec[field] = {
+                'value': list(items) if items is not None else value
+            }
+            if self.debug_enabled:
+                self.log_debug(
+                    f"[DEBUG] 提取板卡规格 - 字段: {field} -> {matched_key}, 值: {spec[field]['value']} (类型: {type(spec[field]['value']).__name__})")
+
+        return spec
+
+    def extract_row_specification(self, columnar: ColumnarCatalog, row: int, fields: Set[str],
+                                  requirement_spec: Dict[str, Any] = None) -> Dict[str, Any]:
+        """
+        与 extract_board_specification 相同，但直接使用列式视图中预先解析的数组类取值
+        """
+        spec = {}
+        registry = self.get_field_registry()
+
+        for field in (requirement_spec.keys() if requirement_spec else sorted(fields)):
+            matched_key = registry.column_of(field)
+            column = columnar.column(matched_key) if matched_key is not None else None
+            if column is None or column.values[row] is None:
+                continue
+            items = column.array_values[row]
+            spec[field] = {
+                'value': list(items) if items is not None else column.values[row]
+            }
+            if self.debug_enabled:
+                self.log_debug(
+                    f"[DEBUG] 提取板卡规格 - 字段: {field} -> {matched_key}, 值: {spec[field]['value']} (类型: {type(spec[field]['value']).__name__})")
 
         return spec
 
@@ -990,96 +578,142 @@ class BoardProcessor:
         if not dnf_str or not dnf_str.strip():
             return {}
 
+        debug = self.debug_enabled
         compliance = {}
-        board_id = board.get('id', 'N/A')
-        board_model = board.get('model', 'N/A')
-        self.log_debug("\n" + "-" * 80)
-        self.log_debug(f"[DEBUG] ========== 开始评估板卡合规性 ==========")
-        self.log_debug(f"[DEBUG] 板卡 ID: {board_id}, 型号: {board_model}")
-        self.log_debug(f"[DEBUG] DNF 表达式: {dnf_str}")
+        compiled = compile_dnf(dnf_str)
+        if debug:
+            self.log_debug("\n" + "-" * 80)
+            self.log_debug(f"[DEBUG] ========== 开始评估板卡合规性 ==========")
+            self.log_debug(f"[DEBUG] 板卡 ID: {board.get('id', 'N/A')}, 型号: {board.get('model', 'N/A')}")
+            self.log_debug(f"[DEBUG] DNF 表达式: {dnf_str}")
+            for cond_str, error in compiled.errors:
+                self.log_debug(f"[DEBUG]   评估条件时出错: {error}")
+            self.log_debug(f"[DEBUG] 解析后的 DNF 部分数: {len(compiled.parts)}")
+
+        for part_idx, part in enumerate(compiled.parts):
+            if debug:
+                self.log_debug(f"[DEBUG] --- 处理 DNF 部分 {part_idx + 1} ---")
+            for cond_idx, cond in enumerate(part):
+                # 通道数字段的简化检查（非空、有值且不为0）已在编译谓词时决定
+                is_ok = self.evaluate_condition(board, cond.predicate)
+                compliance_key = f"{cond.field}_ok"
+                compliance[compliance_key] = {
+                    'value': is_ok
+                }
+                if debug:
+                    self.log_condition_debug(board, cond, cond_idx, is_ok)
+
+        if debug:
+            match_degree = self.calculate_match_percentage(compliance)
+            satisfied_count = sum(1 for item in compliance.values()
+                                  if isinstance(item, dict) and item.get('value') is True)
+            self.log_debug(f"[DEBUG] ========== 板卡合规性评估完成 ==========")
+            self.log_debug(
+                f"[DEBUG] 匹配程度: {match_degree}% (满足 {satisfied_count}/{len(compliance)} 个条件)")
+            self.log_debug("-" * 80 + "\n")
+        return compliance
 
-        try:
-            dnf_parts = self.parse_logical_expression(dnf_str)
-            self.log_debug(f"[DEBUG] 解析后的 DNF 部分数: {len(dnf_parts)}")
+    def log_condition_debug(self, board: Dict[str, Any], cond: CompiledCondition, cond_idx: int, is_ok: bool):
+        """输出单个条件评估的调试信息（仅在 debug_enabled 时调用）"""
+        field = cond.field
+        cond_dict = cond.condition
+        field_value = board.get(field)
+        self.log_debug(f"[DEBUG] 条件 {cond_idx + 1}: {cond.text}")
+        if cond.predicate.channel_count:
+            self.log_debug(
+                f"[DEBUG]   字段名: {field} (CHANNEL_COUNT_FIELDS 字段，使用简化检查)")
+        else:
+            self.log_debug(f"[DEBUG]   字段名: {field}")
+            self.log_debug(f"[DEBUG]   操作符: {cond.operator}")
+            if 'value' in cond_dict:
+                self.log_debug(
+                    f"[DEBUG]   条件值: {cond_dict['value']} (类型: {type(cond_dict['value']).__name__})")
+            if 'values' in cond_dict:
+                self.log_debug(
+                    f"[DEBUG]   条件值列表: {cond_dict['values']}")
+        self.log_debug(
+            f"[DEBUG]   板卡中的值: {field_value} (类型: {type(field_value).__name__ if field_value is not None else 'None'})")
+        self.log_debug(f"[DEBUG]   评估结果: {is_ok} -> {field}_ok = {is_ok}")
+        self.log_debug("")
 
-            for part_idx, part in enumerate(dnf_parts):
-                self.log_debug(f"[DEBUG] --- 处理 DNF 部分 {part_idx + 1} ---")
-                for cond_idx, cond_str in enumerate(part):
-                    try:
-                        cond_dict = self.parse_single_condition(cond_str)
-                        field = cond_dict['field']
-
-                        # 对于 CHANNEL_COUNT_FIELDS 中的字段，使用简化检查
-                        if self.is_channel_count_field(field):
-                            self.log_debug(
-                                f"[DEBUG] 条件 {cond_idx + 1}: {cond_str}")
-                            self.log_debug(
-                                f"[DEBUG]   字段名: {field} (CHANNEL_COUNT_FIELDS 字段，使用简化检查)")
-
-                            # 获取板卡中的实际值
-                            field_value = board.get(field)
-                            self.log_debug(
-                                f"[DEBUG]   板卡中的值: {field_value} (类型: {type(field_value).__name__ if field_value is not None else 'None'})")
-
-                            # 简化检查：非空、有值且不为0
-                            is_ok = self.check_channel_count_field_value(
-                                field_value)
-                            compliance_key = f"{field}_ok"
-                            compliance[compliance_key] = {
-                                'value': is_ok
-                            }
-                            self.log_debug(
-                                f"[DEBUG]   评估结果: {is_ok} -> {compliance_key} = {is_ok} (简化检查：非空且不为0)")
-                            self.log_debug("")
-                        else:
-                            # 普通字段，使用正常的条件比较
-                            self.log_debug(
-                                f"[DEBUG] 条件 {cond_idx + 1}: {cond_str}")
-                            self.log_debug(f"[DEBUG]   字段名: {field}")
-                            self.log_debug(
-                                f"[DEBUG]   操作符: {cond_dict['operator']}")
-                            if 'value' in cond_dict:
-                                self.log_debug(
-                                    f"[DEBUG]   条件值: {cond_dict['value']} (类型: {type(cond_dict['value']).__name__})")
-                            if 'values' in cond_dict:
-                                self.log_debug(
-                                    f"[DEBUG]   条件值列表: {cond_dict['values']}")
-
-                            # 获取板卡中的实际值
-                            field_value = board.get(field)
-                            self.log_debug(
-                                f"[DEBUG]   板卡中的值: {field_value} (类型: {type(field_value).__name__ if field_value is not None else 'None'})")
-
-                            is_ok = self.evaluate_condition(board, cond_dict)
-                            compliance_key = f"{field}_ok"
-                            compliance[compliance_key] = {
-                                'value': is_ok
-                            }
-                            self.log_debug(
-                                f"[DEBUG]   评估结果: {is_ok} -> {compliance_key} = {is_ok}")
-                            self.log_debug("")
-                    except Exception as e:
-                        self.log_debug(f"[DEBUG]   评估条件时出错: {e}")
-                        import traceback
-                        traceback.print_exc()
-                        pass
+    def compliance_slots(self, compiled: CompiledDNF) -> List[Tuple[str, CompiledCondition]]:
+        """
+        compliance 的各项：每个字段一项（按首次出现的顺序），
+        同一字段出现多次时取最后一个条件（与 build_compliance 逐条覆盖的结果一致）
+        """
+        slots = {}
+        for cond in compiled.iter_conditions():
+            slots[f"{cond.field}_ok"] = cond
+        return list(slots.items())
+
+    def build_truth_matrix(self, columnar: ColumnarCatalog, rows: np.ndarray,
+                           compiled: CompiledDNF) -> Tuple[List[str], np.ndarray]:
+        """
+        一次性计算候选板卡 × 条件的真值矩阵（每个条件对整列做一次向量化评估）
+        返回: (compliance 键列表, 布尔矩阵 [候选板卡, 条件])
+        """
+        slots = self.compliance_slots(compiled)
+        matrix = np.zeros((len(rows), len(slots)), dtype=bool)
+        for j, (_, cond) in enumerate(slots):
+            matrix[:, j] = self.evaluate_condition_columnar(columnar, cond.predicate)[rows]
+        return [key for key, _ in slots], matrix
+
+    def score_requirement(self, dnf: str, compiled: CompiledDNF) -> 'RequirementScores':
+        """评估单个需求：候选板卡、真值矩阵与匹配度"""
+        # 提取字段
+        fields = self.extract_fields_from_dnf(dnf)
+
+        # 提取requirement_specification
+        req_spec = self.extract_requirement_specification(dnf)
+
+        # 查找所有逻辑表达式中字段有值的板卡
+        columnar, candidate_rows = self.find_candidate_rows(fields, exclude_board_ids=None)
+
+        # 候选板卡 × 条件的真值矩阵，compliance、match_degree、完全匹配集合都由它派生
+        if columnar is not None:
+            compliance_keys, truth_matrix = self.build_truth_matrix(columnar, candidate_rows, compiled)
+        else:
+            compliance_keys, truth_matrix = [], np.zeros((0, 0), dtype=bool)
+        match_degrees = self.calculate_match_degrees(truth_matrix)
+        return RequirementScores(fields, req_spec, columnar, candidate_rows,
+                                 compliance_keys, truth_matrix, match_degrees)
+
+    def requirement_cache_key(self, compiled: CompiledDNF) -> Optional[Tuple[str, int]]:
+        """需求级缓存的键 (规范化 DNF 哈希, 目录版本)；下推模式、缓存关闭或目录不可用时为None"""
+        if self.pushdown or requirement_cache.max_bytes <= 0:
+            return None
+        try:
+            version = self.get_catalog().version
         except Exception as e:
-            self.log_debug(f"[DEBUG] 解析 DNF 表达式时出错: {e}")
-            import traceback
-            traceback.print_exc()
-            pass
-
-        # 计算匹配百分比
-        match_degree = self.calculate_match_percentage(compliance)
-        satisfied_count = sum(1 for item in compliance.values()
-                              if isinstance(item, dict) and item.get('value') is True)
-        total_count = len(compliance)
-
-        self.log_debug(f"[DEBUG] ========== 板卡合规性评估完成 ==========")
-        self.log_debug(
-            f"[DEBUG] 匹配程度: {match_degree}% (满足 {satisfied_count}/{total_count} 个条件)")
-        self.log_debug("-" * 80 + "\n")
-        return compliance
+            print(f"Database error: {e}")
+            return None
+        requirement_cache.bind_version(version)
+        return compiled.fingerprint(), version
+
+    def cached_requirement_scores(self, dnf: str, compiled: CompiledDNF) -> Tuple['RequirementScores', bool]:
+        """
+        需求评分结果，优先从需求级缓存中取（按规范化 DNF 哈希和目录版本；下推模式不缓存）
+        返回: (评分结果, 是否命中缓存)
+        """
+        key = self.requirement_cache_key(compiled)
+        if key is None:
+            return self.score_requirement(dnf, compiled), False
+        scores = requirement_cache.get(key)
+        if scores is not None:
+            return scores, True
+        scores = self.score_requirement(dnf, compiled)
+        if scores.columnar is not None:
+            scores.cache_key = key
+        return scores, False
+
+    def calculate_match_degrees(self, matrix: np.ndarray) -> np.ndarray:
+        """
+        按真值矩阵的每一行计算匹配百分比（取整方式与 calculate_match_percentage 一致）
+        """
+        total = matrix.shape[1]
+        if total == 0:
+            return np.zeros(matrix.shape[0], dtype=int)
+        return (matrix.sum(axis=1) / total * 100).astype(int)
 
     def calculate_match_percentage(self, compliance: Dict[str, Any]) -> int:
         """
@@ -1289,188 +923,606 @@ class BoardProcessor:
         if self.log_file:
             print(f"  - 日志文件: {self.log_file}")
 
-def process_dnf_requirements_core(
-    require: List[Dict[str, Any]]
-    ) -> Dict[str, Any]:
+class RequirementScores:
     """
-    处理DNF逻辑表达式，查询数据库，生成板卡匹配结果（核心逻辑）
-    
-    Args:
-        require: 需求列表，每个需求包含：
-            - id: 可选的需求ID
-            - original: 原始需求描述
-            - DNF: DNF逻辑表达式
-    
-    Returns:
-        包含处理结果的字典，格式与 ProcessDNFResponse 对应
+    单个需求的评分结果（只取决于规范化的 DNF 和目录版本，与需求 id、原文无关，可跨请求复用）
+        fields / req_spec: 涉及的字段和 requirement_specification
+        columnar / candidate_rows: 评分使用的列式视图和候选板卡行号
+        compliance_keys / truth_matrix / match_degrees: 候选板卡 × 条件的真值矩阵及匹配度
+        perfect_rows: 完全匹配（match_degree 为 100）的行号
+        entries: 已构建的 matched_boards 记录（不含 requirement_id、original，Decimal 已转换为 float），
+                 按候选下标缓存；多个请求的输出共用这些记录，请勿修改
+        cache_key: 需求级缓存的键（不缓存时为None）
+        size: 估算占用的字节数（不含共用的列式视图），创建时计算一次，之后每新增一条记录累加该记录的大小
+    结果放入需求级缓存后会被多个请求线程共用：entries 和 size 只在 _lock 下修改
     """
-    # 创建 BoardProcessor 实例
+
+    __slots__ = ('fields', 'req_spec', 'columnar', 'candidate_rows', 'compliance_keys',
+                 'truth_matrix', 'match_degrees', 'perfect_rows', 'entries', 'cache_key', 'size', '_lock')
+
+    def __init__(self, fields: Set[str], req_spec: Dict[str, Any], columnar: Optional[ColumnarCatalog],
+                 candidate_rows: np.ndarray, compliance_keys: List[str], truth_matrix: np.ndarray,
+                 match_degrees: np.ndarray):
+        self.fields = fields
+        self.req_spec = req_spec
+        self.columnar = columnar
+        self.candidate_rows = candidate_rows
+        self.compliance_keys = compliance_keys
+        self.truth_matrix = truth_matrix
+        self.match_degrees = match_degrees
+        self.perfect_rows = candidate_rows[match_degrees == 100]
+        self.entries = {}
+        self.cache_key = None
+        self.size = estimate_size((fields, req_spec, candidate_rows, compliance_keys, truth_matrix,
+                                   match_degrees, self.perfect_rows, self.entries))
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # 列式视图不随结果在进程间传递（主进程与工作进程共用同一份快照，接收后重新关联）
+        with self._lock:
+            return {name: getattr(self, name) for name in self.__slots__ if name not in ('columnar', '_lock')}
+
+    def __setstate__(self, state):
+        self.columnar = None
+        self._lock = threading.Lock()
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    def board_entry(self, processor: 'BoardProcessor', i: int) -> Dict[str, Any]:
+        """第 i 个候选板卡的输出记录（首次使用时构建，之后复用；多个线程同时构建时保留先写入的一份）"""
+        with self._lock:
+            entry = self.entries.get(i)
+        if entry is not None:
+            return entry
+        columnar = self.columnar
+        row = self.candidate_rows[i]
+        board = columnar.boards[row]
+
+        # 提取board_specification
+        board_spec = processor.extract_row_specification(columnar, row, self.fields, self.req_spec)
+
+        # 构建compliance
+        compliance = {key: {'value': is_ok}
+                      for key, is_ok in zip(self.compliance_keys, self.truth_matrix[i].tolist())}
+
+        entry = processor.convert_decimal_to_float({
+            'id': columnar.ids[row],
+            'model': board.get('model', ''),
+            'description': board.get('brief_description', '') or board.get('detailed_description', ''),
+            'match_degree': int(self.match_degrees[i]),
+            'price_cny': board.get('price_cny'),
+            'requirement_specification': self.req_spec,
+            'board_specification': board_spec,
+            'compliance': compliance
+        })
+        size = estimate_size(entry)
+        with self._lock:
+            if i in self.entries:
+                return self.entries[i]
+            self.entries[i] = entry
+            self.size += size
+        return entry
+
+
+def ranking_key(columnar: ColumnarCatalog, row: int, match_degree: int) -> Tuple[int, float, str]:
+    """候选板卡排序键：match_degree 降序、价格升序（无价格排在最后）、板卡ID升序"""
+    price = columnar.prices[row]
+    return (-match_degree, float(price) if price == price else float('inf'), columnar.ids[row])
+
+
+def select_top_k(columnar: ColumnarCatalog, rows: np.ndarray, match_degrees: np.ndarray, top_k: int,
+                 after: Optional[Tuple[int, float, str]] = None) -> Tuple[List[int], bool]:
+    """
+    用堆选出排序键在 after 之后的前 top_k 个候选板卡
+    返回: (候选板卡在 rows 中的下标列表（已排序）, 是否还有剩余)
+    """
+    keyed = ((ranking_key(columnar, row, degree), i)
+             for i, (row, degree) in enumerate(zip(rows.tolist(), match_degrees.tolist())))
+    if after is not None:
+        keyed = [item for item in keyed if item[0] > after]
+    else:
+        keyed = list(keyed)
+    selected = heapq.nsmallest(top_k, keyed)
+    return [i for _, i in selected], len(keyed) > len(selected)
+
+
+def encode_cursor(positions: Dict[str, Tuple[int, float, str]]) -> str:
+    """将每个需求（按请求中的下标）的最后一个排序键编码为分页游标"""
+    payload = json.dumps(positions, ensure_ascii=False, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor: Optional[str]) -> Dict[str, Tuple[int, float, str]]:
+    """解析分页游标，格式不正确时抛出 ValueError"""
+    if not cursor:
+        return {}
+    try:
+        positions = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+        return {str(index): (int(key[0]), float(key[1]), str(key[2])) for index, key in positions.items()}
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def select_page(scores: RequirementScores, req_index: int, top_k: Optional[int],
+                cursor_positions: Dict[str, Tuple[int, float, str]]) -> Tuple[List[int], Optional[Tuple[int, float, str]]]:
+    """
+    选择要输出的候选板卡：未指定 top_k 时按目录顺序全部输出，
+    否则用堆按 (match_degree 降序, 价格升序) 只取当前页的 top_k 个
+    返回: (候选下标列表, 还有剩余时本页最后一条的排序键；否则为None)
+    """
+    if top_k is None:
+        return list(range(len(scores.candidate_rows))), None
+    page_key = str(req_index)
+    if cursor_positions and page_key not in cursor_positions:
+        # 后续页只继续上一页还有剩余的需求
+        return [], None
+    selected, has_more = select_top_k(scores.columnar, scores.candidate_rows, scores.match_degrees,
+                                      top_k, cursor_positions.get(page_key))
+    if not has_more:
+        return selected, None
+    last = selected[-1]
+    return selected, ranking_key(scores.columnar, scores.candidate_rows[last], int(scores.match_degrees[last]))
+
+
+# 并行模式的工作进程（由 ScoringPool 启动）：目录快照由主进程序列化一次放入共享内存，
+# 工作进程启动时从中取出后只读使用，不访问数据库
+_worker_catalog: Optional[CatalogSnapshot] = None
+
+
+def _init_scoring_worker(block_name: str, size: int):
+    """工作进程初始化：从共享内存块读取主进程的目录快照（含列式视图和字段注册表）"""
+    global _worker_catalog
+    block = shared_memory.SharedMemory(name=block_name)
+    try:
+        _worker_catalog = pickle.loads(block.buf[:size])
+    finally:
+        block.close()
+
+
+def _score_in_worker(job: Tuple[int, str, Optional[int], Dict[str, Tuple[int, float, str]]]
+                     ) -> Tuple[RequirementScores, List[int], Optional[Tuple[int, float, str]]]:
+    """工作进程：评分并构建当前页的输出记录（结果传回主进程时不含列式视图）"""
+    req_index, dnf, top_k, cursor_positions = job
     processor = BoardProcessor()
+    processor.catalog = _worker_catalog
+    scores = processor.score_requirement(dnf, compile_dnf(dnf))
+    selected, last_key = select_page(scores, req_index, top_k, cursor_positions)
+    if scores.columnar is not None:
+        for i in selected:
+            scores.board_entry(processor, i)
+    return scores, selected, last_key
 
-    # 设置日志（使用内存缓冲区，不写文件）
-    import logging
-    import io
-    log_buffer = io.StringIO()
-    handler = logging.StreamHandler(log_buffer)
-    handler.setLevel(logging.DEBUG)
-    formatter = logging.Formatter('%(message)s')
-    handler.setFormatter(formatter)
-    processor.logger = logging.getLogger('BoardProcessor')
-    processor.logger.setLevel(logging.DEBUG)
-    processor.logger.handlers = []
-    processor.logger.addHandler(handler)
-
-    # 获取所有板卡数据
-    all_boards = processor.query_board_data()
-
-    # 用于存储结果
-    linprog_input_data = []
-    matched_boards = []
-    board_original_map = {}
-    all_candidate_ids = set()
-    all_match_ids = set()
-    unsatisfied_requirements = []  # 无法处理的需求（DNF为空或没有百分百匹配的板卡）
-    requirement_channel_counts = {}
 
-    # 处理每个需求
+class ScoringPool:
+    """
+    并行模式的常驻进程池：首次并行请求时创建，之后在使用同一份目录快照的请求间复用
+    使用 forkserver / spawn 启动工作进程，不从多线程的服务进程中直接 fork（避免子进程继承被其他线程持有的锁）；
+    进程池绑定创建时的快照（按内容指纹区分），主进程的快照变化后关闭旧进程池，按新快照重新创建
+    """
+
+    def __init__(self):
+        self._pool = None
+        self._block = None
+        self._fingerprint = None
+        self._workers = 0
+        self._lock = threading.Lock()
+
+    @property
+    def workers(self) -> int:
+        """工作进程数（进程池未启动时为 0）"""
+        return self._workers if self._pool is not None else 0
+
+    def imap(self, snapshot: CatalogSnapshot, jobs: List[tuple], workers: int) -> Optional[Iterator]:
+        """
+        在绑定 snapshot 的进程池上提交任务，返回按提交顺序的结果迭代器
+        workers 只在创建进程池时使用；少于 2 时不启动进程池，返回None
+        """
+        if workers < 2:
+            return None
+        with self._lock:
+            if self._pool is not None and self._fingerprint != snapshot.fingerprint:
+                self._close_locked()
+            if self._pool is None:
+                self._start_locked(snapshot, workers)
+            chunksize = max(1, len(jobs) // (self._workers * 4))
+            return self._pool.imap(_score_in_worker, jobs, chunksize)
+
+    def _start_locked(self, snapshot: CatalogSnapshot, workers: int):
+        """把快照（先构建好列式视图和字段注册表，工作进程无需重建）写入共享内存，再启动工作进程"""
+        snapshot.columnar, snapshot.fields
+        data = pickle.dumps(snapshot, protocol=pickle.HIGHEST_PROTOCOL)
+        block = shared_memory.SharedMemory(create=True, size=len(data))
+        block.buf[:len(data)] = data
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+        try:
+            self._pool = context.Pool(workers, initializer=_init_scoring_worker, initargs=(block.name, len(data)))
+        except Exception:
+            block.close()
+            block.unlink()
+            raise
+        # 共享内存保留到进程池关闭：异常退出的工作进程被替换时，新进程仍需从中读取快照
+        self._block = block
+        self._fingerprint = snapshot.fingerprint
+        self._workers = workers
+
+    def _close_locked(self):
+        """关闭进程池：不再接受新任务，等待已提交的任务完成后回收工作进程，再释放共享内存"""
+        pool, block = self._pool, self._block
+        self._pool, self._block, self._fingerprint = None, None, None
+        if pool is not None:
+            pool.close()
+            pool.join()
+        if block is not None:
+            block.close()
+            block.unlink()
+
+    def shutdown(self):
+        """关闭进程池（服务关闭或进程退出时调用）"""
+        with self._lock:
+            self._close_locked()
+
+
+# 并行模式共用的进程池（首次并行请求时创建，服务关闭或进程退出时回收）
+scoring_pool = ScoringPool()
+atexit.register(scoring_pool.shutdown)
+
+
+def start_parallel_scoring(processor: 'BoardProcessor', require: List[Dict[str, Any]], top_k: Optional[int],
+                           cursor_positions: Dict[str, Tuple[int, float, str]]):
+    """
+    并行模式：把需要评分的需求（DNF 非空且未命中缓存）分发到常驻进程池 scoring_pool
+    工作进程使用与 processor 相同的目录快照，结果按需求顺序返回，由主进程按原顺序合并
+
+    Returns:
+        (需求下标集合, 按需求顺序的结果迭代器)；不满足并行条件时为 (空集合, 空迭代器)
+    """
+    none = (set(), iter(()))
+    if processor.pushdown or processor.query_board_columns() is None:
+        return none
+
+    jobs = []
     for req_index, req in enumerate(require):
-        req_id = req.get('id') if req.get('id') else f"req_{req_index}_{uuid.uuid4().hex[:8]}"
-        original = req.get('original', '')
         dnf = req.get('DNF', '')
-
         if not dnf or not dnf.strip():
-            # 记录无法处理的需求（DNF为空）
-            if original:
-                unsatisfied_requirements.append({
-                    'original': original
-                })
             continue
+        compiled = compile_dnf(dnf)
+        key = processor.requirement_cache_key(compiled)
+        if key is not None and key in requirement_cache:
+            continue
+        jobs.append((req_index, dnf, top_k, cursor_positions))
+    if len(jobs) < max(DNF_PARALLEL_MIN_REQUIREMENTS, 2):
+        return none
+
+    results = scoring_pool.imap(processor.get_catalog(), jobs, DNF_WORKERS)
+    if results is None:
+        return none
+    return {job[0] for job in jobs}, results
+
+
+def iter_dnf_requirements(
+    require: List[Dict[str, Any]],
+    pushdown: bool = False,
+    trace: bool = False,
+    top_k: Optional[int] = None,
+    cursor: Optional[str] = None,
+    parallel: bool = False
+    ) -> Iterator[Dict[str, Any]]:
+    """
+    逐个需求处理DNF逻辑表达式，每个需求评估完成后立即产出一条记录（流式接口使用）
 
-        # 提取字段
-        fields = processor.extract_fields_from_dnf(dnf)
+    参数含义与 process_dnf_requirements_core 相同。依次产出：
+        - 每个需求一条 {'type': 'requirement', ...} 记录，包含该需求的 matched_boards、
+          完全匹配数量以及（trace=True 时的）追踪信息
+        - 最后一条 {'type': 'summary', ...} 记录，包含 linprog_input_data、linprog_requiremnets
+          等汇总结果
 
-        # 提取requirement_specification
-        req_spec = processor.extract_requirement_specification(dnf)
+    已产出的需求不会在内存中保留 matched_boards，生成器提前关闭时也会关闭数据库连接（及并行模式的进程池）
+    """
+    # 创建 BoardProcessor 实例
+    processor = BoardProcessor(pushdown=pushdown)
+    try:
+        # 分页：每个需求上一页最后一条的排序键（按需求在请求中的下标）
+        cursor_positions = decode_cursor(cursor) if top_k is not None else {}
+        next_positions = {}
+        total_records = 0
+        boards_returned = 0
+        cached_requirements = 0
 
-        # 查找所有逻辑表达式中字段有值的板卡
-        boards_with_values = processor.find_boards_with_values(
-            fields, exclude_board_ids=None)
+        # 获取所有板卡数据（下推模式下不加载全表）
+        all_boards = processor.query_board_data() if not pushdown else None
 
-        # 跟踪当前需求是否有完全匹配的板卡
-        req_has_perfect_match = False
+        # 用于存储结果
+        linprog_input_data = []
+        board_original_map = {}
+        all_candidate_ids = set()
+        all_match_ids = set()
+        candidate_boards = {}  # 下推模式下的候选板卡（board_id -> board）
+        unsatisfied_requirements = []  # 无法处理的需求（DNF为空或没有百分百匹配的板卡）
+        requirement_channel_counts = {}
 
-        # 对所有有值的板卡进行匹配打分
-        for board in boards_with_values:
-            board_id = str(board.get('id', ''))
+        # 并行模式：需要评分的需求先分发到进程池，下面按需求顺序取回结果并合并
+        parallel_indexes, parallel_results = set(), iter(())
+        if parallel:
+            parallel_indexes, parallel_results = start_parallel_scoring(
+                processor, require, top_k, cursor_positions)
 
-            # 提取board_specification
-            board_spec = processor.extract_board_specification(
-                board, fields, req_spec)
+        # 处理每个需求
+        for req_index, req in enumerate(require):
+            req_id = req.get('id') if req.get('id') else f"req_{req_index}_{uuid.uuid4().hex[:8]}"
+            original = req.get('original', '')
+            dnf = req.get('DNF', '')
 
-            # 构建compliance
-            compliance = processor.build_compliance(board, dnf)
+            if not dnf or not dnf.strip():
+                # 记录无法处理的需求（DNF为空）
+                if original:
+                    unsatisfied_requirements.append({
+                        'original': original
+                    })
+                record = {
+                    'type': 'requirement',
+                    'index': req_index,
+                    'requirement_id': req_id,
+                    'original': original,
+                    'satisfied': False,
+                    'unsatisfiable': False,
+                    'candidate_count': 0,
+                    'perfect_match_count': 0,
+                    'matched_boards': []
+                }
+                if trace:
+                    record['trace'] = {
+                        'requirement_id': req_id,
+                        'original': original,
+                        'dnf': dnf,
+                        'skipped': 'DNF为空'
+                    }
+                yield record
+                continue
 
-            # 计算match_degree
-            match_degree = processor.calculate_match_percentage(
-                compliance)
+            started_at = time.perf_counter() if trace else None
+
+            # 化简后所有合取项都不可满足时仍照常评分（compliance 逐字段给出部分匹配），只在记录中标记 unsatisfiable
+            compiled = compile_dnf(dnf)
+            simplification = compiled.simplify()
+
+            # 评分（同一规范化 DNF 在同一目录版本下直接复用缓存的评分结果；
+            # 并行模式下取回工作进程的评分结果，并关联主进程的同一份快照）
+            if req_index in parallel_indexes:
+                scores, selected, last_key = next(parallel_results)
+                if scores.fields:
+                    scores.columnar = processor.query_board_columns()
+                    scores.cache_key = processor.requirement_cache_key(compiled)
+                cached = False
+                size_before = -1
+            else:
+                scores, cached = processor.cached_requirement_scores(dnf, compiled)
+                size_before = scores.size
+                selected, last_key = select_page(scores, req_index, top_k, cursor_positions)
+            cached_requirements += cached
+            fields, req_spec, columnar = scores.fields, scores.req_spec, scores.columnar
+            candidate_rows, perfect_rows = scores.candidate_rows, scores.perfect_rows
+            compliance_keys, truth_matrix = scores.compliance_keys, scores.truth_matrix
+
+            # 只为当前页选中的候选板卡构建输出记录
+            total_records += len(candidate_rows)
+            if last_key is not None:
+                next_positions[str(req_index)] = last_key
+
+            matched_boards = []
+            for i in selected:
+                entry = scores.board_entry(processor, i)
 
-            # 添加到matched_boards
-            matched_boards.append({
-                'id': board_id,
-                'requirement_id': req_id,
-                'model': board.get('model', ''),
-                'description': board.get('brief_description', '') or board.get('detailed_description', ''),
-                'original': original,
-                'match_degree': match_degree,
-                'price_cny': board.get('price_cny'),
-                'requirement_specification': req_spec,
-                'board_specification': board_spec,
-                'compliance': compliance
-            })
+                # 添加到matched_boards
+                matched_boards.append({
+                    'id': entry['id'],
+                    'requirement_id': req_id,
+                    'model': entry['model'],
+                    'description': entry['description'],
+                    'original': original,
+                    'match_degree': entry['match_degree'],
+                    'price_cny': entry['price_cny'],
+                    'requirement_specification': entry['requirement_specification'],
+                    'board_specification': entry['board_specification'],
+                    'compliance': entry['compliance']
+                })
+            boards_returned += len(matched_boards)
+
+            # 新评分或新构建了输出记录时写回缓存（大小已随新记录累加，不再遍历整个结果）
+            if scores.cache_key is not None and (not cached or scores.size != size_before):
+                requirement_cache.put(scores.cache_key, scores, scores.size)
 
             # 统计所有有值的板卡和完全匹配的板卡
-            all_candidate_ids.add(board_id)
-            if match_degree == 100:
+            all_candidate_ids.update(columnar.ids[row] for row in candidate_rows)
+            req_has_perfect_match = len(perfect_rows) > 0
+            for row in perfect_rows:
+                board_id = columnar.ids[row]
                 all_match_ids.add(board_id)
-                req_has_perfect_match = True
+                if pushdown:
+                    candidate_boards.setdefault(board_id, columnar.boards[row])
                 # 只有百分百匹配时，才记录该板卡满足的需求
                 if board_id not in board_original_map:
                     board_original_map[board_id] = []
                 if original not in board_original_map[board_id]:
                     board_original_map[board_id].append(original)
 
-        # 如果当前需求没有完全匹配的板卡，添加到 unsatisfied_requirements
-        if not req_has_perfect_match and original:
-            unsatisfied_requirements.append({
-                'original': original
+            record = {
+                'type': 'requirement',
+                'index': req_index,
+                'requirement_id': req_id,
+                'original': original,
+                'satisfied': req_has_perfect_match,
+                'unsatisfiable': simplification.is_unsatisfiable,
+                'candidate_count': len(candidate_rows),
+                'perfect_match_count': len(perfect_rows),
+                'matched_boards': matched_boards
+            }
+            if trace:
+                slots = dict(processor.compliance_slots(compiled))
+                record['trace'] = {
+                    'requirement_id': req_id,
+                    'original': original,
+                    'dnf': dnf,
+                    'conjuncts': [[cond.text for cond in part] for part in compiled.parts],
+                    'parse_errors': [{'condition': cond_str, 'error': error}
+                                     for cond_str, error in compiled.errors],
+                    'simplification': simplification.summary(),
+                    'cached': cached,
+                    'fields': sorted(fields),
+                    'candidate_count': len(candidate_rows),
+                    'conditions': [
+                        {
+                            'key': key,
+                            'condition': slots[key].text,
+                            'field': slots[key].field,
+                            'operator': slots[key].operator,
+                            'operand': slots[key].condition.get('value', slots[key].condition.get('values')),
+                            'channel_count_check': slots[key].predicate.channel_count,
+                            'satisfied_count': int(truth_matrix[:, j].sum())
+                        }
+                        for j, key in enumerate(compliance_keys)
+                    ],
+                    'perfect_match_ids': [columnar.ids[row] for row in perfect_rows],
+                    'elapsed_ms': round((time.perf_counter() - started_at) * 1000, 3)
+                }
+
+            # 如果当前需求没有完全匹配的板卡，添加到 unsatisfied_requirements
+            if not req_has_perfect_match and original:
+                unsatisfied_requirements.append({
+                    'original': original
+                })
+            else:
+                # 只有当前需求有完全匹配的板卡时，才更新 requirement_channel_counts
+                # 如果需求在 unsatisfied_requirements 中，对应的通道数不计入 linprog_requiremnets
+                for field in fields:
+                    field_lower = field.lower()
+                    if field_lower in CHANNEL_COUNT_KEYS:
+                        if field_lower in req_spec:
+                            req_info = req_spec[field_lower]
+                            req_value = req_info.get('value') if isinstance(
+                                req_info, dict) else req_info
+                            if isinstance(req_value, (int, float)) and req_value > 0:
+                                if field_lower not in requirement_channel_counts:
+                                    requirement_channel_counts[field_lower] = 0
+                                requirement_channel_counts[field_lower] = max(
+                                    requirement_channel_counts[field_lower],
+                                    int(req_value)
+                                )
+
+            # 转换 Decimal 为 float 后立即产出该需求的结果（matched_boards 中的记录构建时已转换）
+            yield {key: value if key == 'matched_boards' else processor.convert_decimal_to_float(value)
+                   for key, value in record.items()}
+
+        # 构建linprog_input_data（从matched_boards中提取match_degree=100的板卡）
+        perfect_match_board_ids = all_match_ids
+
+        # 下推模式下没有全表数据，按 id 顺序使用候选板卡
+        if all_boards is None:
+            all_boards = sorted(candidate_boards.values(), key=lambda b: b.get('id'))
+
+        board_dict = {}
+        for board in all_boards:
+            board_id = str(board.get('id', ''))
+            if board_id and board_id in perfect_match_board_ids:
+                board_dict[board_id] = board
+
+        for board_id, board in board_dict.items():
+            matrix = processor.build_matrix_channel_count(board)
+            original_list = board_original_map.get(board_id, [])
+
+            linprog_input_data.append({
+                'id': board_id,
+                'matrix_channel_count': matrix,
+                'model': board.get('model', ''),
+                'price_cny': board.get('price_cny'),
+                'original': original_list
             })
-        else:
-            # 只有当前需求有完全匹配的板卡时，才更新 requirement_channel_counts
-            # 如果需求在 unsatisfied_requirements 中，对应的通道数不计入 linprog_requiremnets
-            for field in fields:
-                field_lower = field.lower()
-                if field_lower in [f.lower() for f in CHANNEL_COUNT_FIELDS]:
-                    if field_lower in req_spec:
-                        req_info = req_spec[field_lower]
-                        req_value = req_info.get('value') if isinstance(
-                            req_info, dict) else req_info
-                        if isinstance(req_value, (int, float)) and req_value > 0:
-                            if field_lower not in requirement_channel_counts:
-                                requirement_channel_counts[field_lower] = 0
-                            requirement_channel_counts[field_lower] = max(
-                                requirement_channel_counts[field_lower],
-                                int(req_value)
-                            )
 
-    # 构建linprog_input_data（从matched_boards中提取match_degree=100的板卡）
-    perfect_match_board_ids = all_match_ids
+        # 构建linprog_requiremnets
+        linprog_requiremnets = []
+        for field in CHANNEL_COUNT_FIELDS:
+            field_lower = field.lower()
+            value = requirement_channel_counts.get(field_lower, 0)
+            linprog_requiremnets.append(value)
 
-    board_dict = {}
-    for board in all_boards:
-        board_id = str(board.get('id', ''))
-        if board_id and board_id in perfect_match_board_ids:
-            board_dict[board_id] = board
+        summary = {
+            'type': 'summary',
+            'timestamp': datetime.now().isoformat(),
+            'linprog_input_data': linprog_input_data,
+            'linprog_requiremnets': linprog_requiremnets,
+            'total_candidates': len(all_candidate_ids),
+            'total_matches': len(all_match_ids),
+            'processing_info': {
+                'requirements_processed': len(require),
+                'boards_found': len(linprog_input_data),
+                'matches_made': total_records,
+                'matched_boards_returned': boards_returned,
+                'requirements_from_cache': cached_requirements
+            },
+            'unsatisfied_requirements': unsatisfied_requirements
+        }
+        if top_k is not None:
+            summary['next_cursor'] = encode_cursor(next_positions) if next_positions else None
 
-    for board_id, board in board_dict.items():
-        matrix = processor.build_matrix_channel_count(board)
-        original_list = board_original_map.get(board_id, [])
+        yield processor.convert_decimal_to_float(summary)
+    finally:
+        # 关闭数据库连接（包括客户端断开导致生成器提前关闭的情况；进程池为常驻进程池，不在此关闭）
+        processor.close_connection()
 
-        linprog_input_data.append({
-            'id': board_id,
-            'matrix_channel_count': matrix,
-            'model': board.get('model', ''),
-            'price_cny': board.get('price_cny'),
-            'original': original_list
-        })
 
-    # 构建linprog_requiremnets
-    linprog_requiremnets = []
-    for field in CHANNEL_COUNT_FIELDS:
-        field_lower = field.lower()
-        value = requirement_channel_counts.get(field_lower, 0)
-        linprog_requiremnets.append(value)
+def process_dnf_requirements_core(
+    require: List[Dict[str, Any]],
+    pushdown: bool = False,
+    trace: bool = False,
+    top_k: Optional[int] = None,
+    cursor: Optional[str] = None,
+    parallel: bool = False
+    ) -> Dict[str, Any]:
+    """
+    处理DNF逻辑表达式，查询数据库，生成板卡匹配结果（核心逻辑）
+    
+    Args:
+        require: 需求列表，每个需求包含：
+            - id: 可选的需求ID
+            - original: 原始需求描述
+            - DNF: DNF逻辑表达式
+        pushdown: 是否将过滤下推到数据库（只查询候选行和所需列，不加载全表）
+        trace: 是否返回结构化追踪信息（结果中的 trace 字段，每个需求一条记录）
+        top_k: 每个需求最多返回的 matched_boards 条数（按 match_degree 降序、价格升序），None 表示全部返回
+        cursor: 上一页返回的 next_cursor，用于继续获取每个需求的后续候选板卡（仅在指定 top_k 时有效）
+        parallel: 是否用进程池并行评分（仅快照模式；待评分需求数少于 DNF_PARALLEL_MIN_REQUIREMENTS 时仍逐个处理），
+                  结果与逐个处理完全一致
+    
+    Returns:
+        包含处理结果的字典，格式与 ProcessDNFResponse 对应
+    """
+    matched_boards = []
+    trace_events = []
+    summary = {}
+    for record in iter_dnf_requirements(require, pushdown=pushdown, trace=trace,
+                                        top_k=top_k, cursor=cursor, parallel=parallel):
+        if record['type'] == 'summary':
+            summary = record
+            continue
+        matched_boards.extend(record['matched_boards'])
+        if trace:
+            trace_events.append(record['trace'])
 
     # 构建输出数据
     output_data = {
-        'timestamp': datetime.now().isoformat(),
-        'linprog_input_data': linprog_input_data,
-        'linprog_requiremnets': linprog_requiremnets,
+        'timestamp': summary['timestamp'],
+        'linprog_input_data': summary['linprog_input_data'],
+        'linprog_requiremnets': summary['linprog_requiremnets'],
         'matched_boards': matched_boards,
-        'total_candidates': len(all_candidate_ids),
-        'total_matches': len(all_match_ids),
-        'processing_info': {
-            'requirements_processed': len(require),
-            'boards_found': len(linprog_input_data),
-            'matches_made': len(matched_boards)
-        },
-        'unsatisfied_requirements': unsatisfied_requirements
+        'total_candidates': summary['total_candidates'],
+        'total_matches': summary['total_matches'],
+        'processing_info': summary['processing_info'],
+        'unsatisfied_requirements': summary['unsatisfied_requirements']
     }
-
-    # 转换 Decimal 为 float
-    output_data = processor.convert_decimal_to_float(output_data)
-
-    # 关闭数据库连接
-    processor.close_connection()
+    if top_k is not None:
+        output_data['next_cursor'] = summary['next_cursor']
+    if trace:
+        output_data['trace'] = trace_events
 
     return output_data
 
@@ -10,6 +10,7 @@ import psycopg2
 import re
 from typing import List, Dict, Any
 from decimal import Decimal
+from board_catalog import convert_unit
 
 # 数据库配置（参考process_dnf.py）
 DB_CONFIG = {
@@ -35,6 +36,36 @@ def convert_decimal_to_float(obj: Any) -> Any:
         return obj
 
 
+def frequency_in_ghz(value: Any, unit: Any) -> Any:
+    """主频换算为GHz（单位缺省或无法识别时按GHz处理）"""
+    if value is None:
+        return None
+    ghz = convert_unit(value, unit or 'GHz', 'GHz')
+    return ghz if ghz is not None else float(value)
+
+
+def cpu_frequency_ghz(record: Dict[str, Any]) -> Any:
+    """仿真机或需求属性的主频（GHz），优先使用已预先换算的 cpu_frequency_ghz"""
+    if 'cpu_frequency_ghz' in record:
+        return record['cpu_frequency_ghz']
+    return frequency_in_ghz(record.get('cpu_frequency_value'), record.get('cpu_frequency_unit'))
+
+
+def normalize_requirement_units(requirements: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    为每个需求预先换算主频（写入 attribute 的 cpu_frequency_ghz），
+    与各仿真机比较时不再逐次做单位换算；返回新列表，不修改传入的需求
+    """
+    normalized = []
+    for req in requirements:
+        attr = req.get('attribute') or {}
+        if 'cpu_frequency_value' in attr:
+            attr = dict(attr, cpu_frequency_ghz=cpu_frequency_ghz(attr))
+            req = dict(req, attribute=attr)
+        normalized.append(req)
+    return normalized
+
+
 def evaluate_condition(machine: Dict[str, Any], field: str, operator: str, value: Any) -> bool:
     """
     评估单个条件是否满足
@@ -114,25 +145,11 @@ def calculate_match_degree(machine: Dict[str, Any], requirements: List[Dict[str,
         # CPU主频
         if 'cpu_frequency_value' in attr:
             total_conditions += 1
-            freq_value = attr['cpu_frequency_value']
-            freq_unit = attr.get('cpu_frequency_unit', 'GHz')
-            machine_freq_value = machine.get('cpu_frequency_value')
-            machine_freq_unit = machine.get('cpu_frequency_unit', 'GHz')
-            
-            if machine_freq_value is not None:
-                # 统一转换为GHz进行比较
-                if machine_freq_unit.upper() == 'MHZ':
-                    machine_freq_ghz = float(machine_freq_value) / 1000.0
-                else:
-                    machine_freq_ghz = float(machine_freq_value)
-                
-                if freq_unit.upper() == 'GHZ':
-                    req_freq_ghz = float(freq_value)
-                else:
-                    req_freq_ghz = float(freq_value) / 1000.0
-                
-                if machine_freq_ghz >= req_freq_ghz:
-                    satisfied_conditions += 1
+            # 主频已统一换算为GHz（见 normalize_requirement_units / query_all_sim_machines）
+            machine_freq_ghz = cpu_frequency_ghz(machine)
+            req_freq_ghz = cpu_frequency_ghz(attr)
+            if machine_freq_ghz is not None and req_freq_ghz is not None and machine_freq_ghz >= req_freq_ghz:
+                satisfied_conditions += 1
         
         # CPU品牌
         if 'cpu_brand' in attr:
@@ -227,6 +244,10 @@ def query_all_sim_machines() -> List[Dict[str, Any]]:
         # 转换Decimal为float
         result = convert_decimal_to_float(result)
         
+        # 主频在加载时统一换算为GHz，评分时直接比较
+        for machine in result:
+            machine['cpu_frequency_ghz'] = cpu_frequency_ghz(machine)
+        
         return result
         
     except Exception as e:
@@ -256,6 +277,7 @@ def query_sim_machines_with_scoring(requirements: List[Dict[str, Any]]) -> List[
     
     # 为每个仿真机计算匹配度
     print("计算匹配度...")
+    requirements = normalize_requirement_units(requirements)
     machines_with_score = []
     for machine in all_machines:
         match_degree = calculate_match_degree(machine, requirements)
@@ -315,14 +337,15 @@ def calculate_requirement_score(machine: Dict[str, Any], requirement: Dict[str,
         # CPU评分逻辑
         cpu_cores_req = attr.get('cpu_cores')
         cpu_freq_req = attr.get('cpu_frequency_value')
-        cpu_freq_unit_req = attr.get('cpu_frequency_unit', 'GHz')
         cpu_brand_req = attr.get('cpu_brand')
         cpu_series_req = attr.get('cpu_series')
         cpu_model_req = attr.get('cpu_model_code')
         
         machine_cores = machine.get('cpu_cores')
         machine_freq = machine.get('cpu_frequency_value')
-        machine_freq_unit = machine.get('cpu_frequency_unit', 'GHz')
+        # 主频统一换算为GHz
+        machine_freq_ghz = cpu_frequency_ghz(machine)
+        req_freq_ghz = cpu_frequency_ghz(attr)
         machine_brand = machine.get('cpu_brand')
         machine_series = machine.get('cpu_series')
         machine_model = machine.get('cpu_model_code', '')
@@ -342,9 +365,6 @@ def calculate_requirement_score(machine: Dict[str, Any], requirement: Dict[str,
         
         # 主频
         if cpu_freq_req and machine_freq:
-            machine_freq_ghz = float(machine_freq) if machine_freq_unit.upper() == 'GHZ' else float(machine_freq) / 1000.0
-            req_freq_ghz = float(cpu_freq_req) if cpu_freq_unit_req.upper() == 'GHZ' else float(cpu_freq_req) / 1000.0
-            
             if machine_freq_ghz >= req_freq_ghz:
                 scores.append(1.0)
                 reasons.append(f"主频{machine_freq_ghz}GHz满足≥{req_freq_ghz}GHz")
@@ -414,8 +434,6 @@ def calculate_requirement_score(machine: Dict[str, Any], requirement: Dict[str,
                     reason_parts.append(f"型号为{machine_model}，不包含{cpu_model_req}")
             
             if machine_freq and cpu_freq_req:
-                machine_freq_ghz = float(machine_freq) if machine_freq_unit.upper() == 'GHZ' else float(machine_freq) / 1000.0
-                req_freq_ghz = float(cpu_freq_req) if cpu_freq_unit_req.upper() == 'GHZ' else float(cpu_freq_req) / 1000.0
                 if machine_freq_ghz >= req_freq_ghz:
                     reason_parts.append(f"主频{machine_freq_ghz}GHz满足≥{req_freq_ghz}GHz要求")
                 else:
@@ -441,8 +459,6 @@ def calculate_requirement_score(machine: Dict[str, Any], requirement: Dict[str,
                         unsatisfied_summary.append(f"非i9系列（为{machine_model}）")
                 
                 if machine_freq and cpu_freq_req:
-                    machine_freq_ghz = float(machine_freq) if machine_freq_unit.upper() == 'GHZ' else float(machine_freq) / 1000.0
-                    req_freq_ghz = float(cpu_freq_req) if cpu_freq_unit_req.upper() == 'GHZ' else float(cpu_freq_req) / 1000.0
                     if machine_freq_ghz >= req_freq_ghz:
                         satisfied_summary.append(f"主频{machine_freq_ghz}GHz满足要求")
                     else:
@@ -462,8 +478,6 @@ def calculate_requirement_score(machine: Dict[str, Any], requirement: Dict[str,
                 if machine_cores and cpu_cores_req and machine_cores < cpu_cores_req:
                     problem_list.append(f"仅{machine_cores}核，远低于八核要求")
                 if machine_freq and cpu_freq_req:
-                    machine_freq_ghz = float(machine_freq) if machine_freq_unit.upper() == 'GHZ' else float(machine_freq) / 1000.0
-                    req_freq_ghz = float(cpu_freq_req) if cpu_freq_unit_req.upper() == 'GHZ' else float(cpu_freq_req) / 1000.0
                     if machine_freq_ghz < req_freq_ghz:
                         problem_list.append(f"主频{machine_freq_ghz}GHz远低于{req_freq_ghz}GHz")
                 if not brand_series_ok:
@@ -591,13 +605,14 @@ def generate_output_format(all_machines: List[Dict[str, Any]], all_requirements:
     
     # 1. 为每个仿真机计算每个需求的评分
     machine_scores = {}  # {machine_id: {req_index: score}}
+    normalized_requirements = normalize_requirement_units(all_requirements)
     
     for machine in all_machines:
         machine_id = str(machine.get('id', ''))
         machine_scores[machine_id] = {}
         total_score = 0.0
         
-        for req_idx, req in enumerate(all_requirements):
+        for req_idx, req in enumerate(normalized_requirements):
             original = req.get('original', '')
             # 判断需求类别
             if 'CPU' in original or 'cpu' in original.lower():
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+进程内结果缓存：按字节数限制容量的 LRU 缓存
+
+缓存项绑定板卡目录版本号，目录版本变化时整体失效（旧版本的结果不会再被命中）
+"""
+
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+import numpy as np
+
+
+def estimate_size(obj: Any) -> int:
+    """
+    粗略估算对象占用的字节数（递归统计容器及其元素，numpy 数组按数据大小计，共享对象只计一次）
+    """
+    seen = set()
+    total = 0
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        if isinstance(item, np.ndarray):
+            # 拥有数据的数组 getsizeof 已包含数据大小，视图只计数组头，另加数据大小
+            total += sys.getsizeof(item) + (item.nbytes if item.base is not None else 0)
+            continue
+        total += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+        elif hasattr(item, '__slots__'):
+            stack.extend(getattr(item, name) for name in item.__slots__ if hasattr(item, name))
+    return total
+
+
+class LRUCache:
+    """
+    按字节数限制容量的 LRU 缓存（线程安全）
+        max_bytes: 容量上限（估算值），为 0 时不缓存任何内容
+        version: 当前绑定的目录版本号，bind_version() 传入新版本时清空缓存
+        hits / misses / evictions: 命中、未命中、淘汰次数
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.total_bytes = 0
+        self._entries: 'OrderedDict[Hashable, Tuple[Any, int]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        """是否存在缓存项（不计入命中/未命中次数，也不调整淘汰顺序）"""
+        return key in self._entries
+
+    def bind_version(self, version: int):
+        """绑定目录版本号：版本变化时清空所有缓存项"""
+        with self._lock:
+            if version != self.version:
+                self._entries.clear()
+                self.total_bytes = 0
+                self.version = version
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """取缓存项（命中时移到最近使用的位置），不存在时返回None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any, size: Optional[int] = None):
+        """
+        写入缓存项（已存在时替换并重新计算大小），超出容量时淘汰最久未使用的项
+        单个缓存项超过容量上限时不缓存
+        """
+        if size is None:
+            size = estimate_size(value)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.total_bytes -= old[1]
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, size)
+            self.total_bytes += size
+            while self.total_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.total_bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        """清空缓存项（保留统计计数）"""
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计信息"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'version': self.version,
+                'entries': len(self._entries),
+                'bytes': self.total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }